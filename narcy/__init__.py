@@ -1,6 +1,7 @@
 from .nlp import spacy_ext
-from .nlp.utils import document_factory
+from .nlp.utils import document_factory, pipe_factory
 from .processors import doc_to_relations_df, doc_to_svos_df, doc_to_tokens_df
+from .pipeline import NarcyComponent
 
 __author__ = 'Szymon Talaga'
 __email__ = 'stalaga@protonmail.com'
@@ -0,0 +1,180 @@
+"""Output backends of data processors.
+
+Records are converted to data frames of one of the supported backends:
+
+``'pandas'``
+    :py:class:`pandas.DataFrame` (default).
+``'arrow'``
+    :py:class:`pyarrow.Table` built directly from columnar buffers.
+    Categorical columns (tenses, modes, relation types, POS and dependency
+    tags, entity labels and string ids) are dictionary-encoded
+    and vector columns are fixed-size lists of 32-bit floats
+    (or 16-bit floats, see :py:mod:`narcy.vectors`).
+``'polars'``
+    :py:class:`polars.DataFrame` converted from the *Arrow* table
+    without copying, so categorical columns become ``Categorical``
+    and vector columns become ``Array``.
+
+*PyArrow* and *Polars* are optional dependencies and are imported
+only when their backends are used.
+"""
+# pylint: disable=C0415
+from itertools import chain
+from operator import attrgetter
+import numpy as np
+import pandas as pd
+
+
+BACKENDS = ('pandas', 'arrow', 'polars')
+
+CATEGORICAL = frozenset([
+    'tense', 'mode', 'rtype', 'pos', 'dep', 'ent_label',
+    'head_tense', 'head_mode', 'sub_tense', 'sub_mode',
+    'head_pos', 'head_dep', 'sub_pos', 'sub_dep',
+    'head_ent_label', 'sub_ent_label', 'subj_ent_label', 'obj_ent_label',
+    'docid', 'sentid'
+])
+
+
+def _import(backend):
+    package = 'polars' if backend == 'polars' else 'pyarrow'
+    try:
+        if backend == 'polars':
+            import polars
+            return polars
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise ImportError(f"'{backend}' backend requires '{package}' package")
+
+def check_backend(backend):
+    """Check if backend name is valid."""
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend '{backend}'")
+
+def unique_records(records, subset):
+    """Skip records duplicated on a subset of fields.
+
+    First occurrences are kept as in
+    :py:meth:`pandas.DataFrame.drop_duplicates`.
+
+    Parameters
+    ----------
+    records : iterable of namedtuple
+        Records.
+    subset : iterable of str
+        Field names.
+    """
+    seen = set()
+    for record in records:
+        key = tuple(getattr(record, f) for f in subset)
+        if key not in seen:
+            seen.add(key)
+            yield record
+
+def _vector_array(pa, values):
+    if values:
+        matrix = np.stack(values)
+        if matrix.dtype != np.float16:
+            matrix = matrix.astype(np.float32, copy=False)
+    else:
+        matrix = np.empty((0, 0), dtype=np.float32)
+    dtype = pa.from_numpy_dtype(matrix.dtype)
+    size = matrix.shape[1]
+    if not size:
+        # Models without vectors yield empty vectors.
+        return pa.array([ [] for _ in values ], type=pa.list_(dtype))
+    return pa.FixedSizeListArray.from_arrays(
+        pa.array(matrix.ravel(), type=dtype), size
+    )
+
+def _arrow_array(pa, name, values):
+    if name.endswith('vector'):
+        return _vector_array(pa, values)
+    if name.endswith('terms'):
+        return pa.array([ list(v) for v in values ], type=pa.list_(pa.string()))
+    if name in CATEGORICAL:
+        if values and not isinstance(values[0], str):
+            # Integer keys (see `narcy.processors.use_int_ids`).
+            dtype = pa.int32() if name == 'sentid' else pa.int64()
+            return pa.array(values, type=dtype)
+        return pa.array(values, type=pa.string()).dictionary_encode()
+    return pa.array(values)
+
+def records_to_arrow(records, columns):
+    """Convert records to an *Arrow* table.
+
+    Parameters
+    ----------
+    records : iterable of namedtuple
+        Records.
+    columns : sequence of str
+        Field names.
+    """
+    pa = _import('arrow')
+    records = list(records)
+    arrays = [
+        _arrow_array(pa, name, [ getattr(r, name) for r in records ])
+        for name in columns
+    ]
+    return pa.Table.from_arrays(arrays, names=list(columns))
+
+def _project(records, columns):
+    # Records are reduced to tuples of values of columns
+    # if only some of their fields are used.
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return []
+    records = chain([ first ], records)
+    columns = tuple(columns)
+    if columns == first._fields:
+        return records
+    if len(columns) == 1:
+        return ( (getattr(r, columns[0]),) for r in records )
+    getter = attrgetter(*columns)
+    return map(getter, records)
+
+def records_to_frame(records, columns, backend='pandas', **kwds):
+    """Convert records to a data frame.
+
+    Parameters
+    ----------
+    records : iterable of namedtuple
+        Records.
+    columns : sequence of str
+        Field names.
+    backend : str
+        Backend name (see :py:data:`BACKENDS`).
+    **kwds :
+        Keyword arguments passed to :py:meth:`pandas.DataFrame.from_records`
+        when the ``'pandas'`` backend is used.
+    """
+    check_backend(backend)
+    if backend == 'pandas':
+        return pd.DataFrame.from_records(
+            _project(records, columns), columns=columns, **kwds
+        )
+    table = records_to_arrow(records, columns)
+    if backend == 'polars':
+        return _import('polars').from_arrow(table)
+    return table
+
+def concat_frames(frames, backend='pandas'):
+    """Concatenate data frames of the same backend.
+
+    Parameters
+    ----------
+    frames : iterable
+        Data frames.
+    backend : str
+        Backend name (see :py:data:`BACKENDS`).
+    """
+    check_backend(backend)
+    frames = list(frames)
+    if backend == 'pandas':
+        return pd.concat(frames, ignore_index=True)
+    nonempty = [ f for f in frames if len(f) ] or frames[:1]
+    if backend == 'polars':
+        return _import('polars').concat(nonempty, how='vertical')
+    return _import('arrow').concat_tables(nonempty).unify_dictionaries()
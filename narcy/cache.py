@@ -0,0 +1,129 @@
+"""Sentence-level extraction cache.
+
+Corpora often repeat identical sentences across many documents
+(disclaimers, bylines, retweets etc.). The cache stores records extracted
+from a sentence in a sentence-relative form and rebases them onto
+the current document on a hit, so repeated sentences skip relation
+extraction, tense detection and sentiment analysis entirely.
+
+Note that a cache hit reuses vectors computed in the context of the first
+occurrence of a sentence, which may differ slightly for models with
+context-sensitive token vectors.
+
+A cache may be shared by threads extracting records from different
+documents (see :py:mod:`narcy.service`). Records are extracted outside
+of the lock, so a sentence may occasionally be extracted twice.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+OFFSET_FIELDS = ('head_start', 'head_end', 'sub_start', 'sub_end', 'start', 'end')
+
+
+class SentenceCache:
+    """Bounded LRU cache of records extracted from sentences.
+
+    Records are keyed by record kind, model name and version
+    and a hash of the sentence text.
+
+    Attributes
+    ----------
+    nlp : spacy.language.Language or None
+        Language object used for deriving model identifier
+        from its name and version.
+    maxsize : int
+        Maximum number of cached entries.
+    model : str or None
+        Model identifier. Used if ``nlp`` is ``None``.
+    hits : int
+        Number of cache hits.
+    misses : int
+        Number of cache misses.
+    """
+    def __init__(self, nlp=None, maxsize=100000, model=None):
+        if nlp is not None:
+            meta = nlp.meta
+            model = f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}"
+        self.model = model
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        """Clear cache and counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_records(self, sent, kind, func):
+        """Get records for a sentence.
+
+        Parameters
+        ----------
+        sent : spacy.tokens.Span
+            Sentence.
+        kind : hashable
+            Kind of records (e.g. ``'relations'``). Extraction filters
+            are passed together with kinds (e.g. ``('svos', filters)``).
+        func : callable
+            Function returning iterable of records for a sentence.
+            Records are namedtuples with ``docid`` and ``sentid`` fields
+            and optional document offsets (see :py:data:`OFFSET_FIELDS`).
+
+        Returns
+        -------
+        list
+            Records rebased onto the sentence.
+        """
+        digest = hashlib.blake2b(sent.text.encode(), digest_size=16).digest()
+        key = (kind, self.model, digest)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+        if entry is not None:
+            return self._rebase(entry, sent)
+        records = list(func(sent))
+        entry = self._relativize(records, sent)
+        with self._lock:
+            self._data[key] = entry
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return records
+
+    @staticmethod
+    def _relativize(records, sent):
+        if not records:
+            return records
+        start = sent.start
+        fields = [ f for f in records[0]._fields if f in OFFSET_FIELDS ]
+        return [
+            r._replace(docid=None, sentid=None,
+                       **{ f: getattr(r, f) - start for f in fields })
+            for r in records
+        ]
+
+    @staticmethod
+    def _rebase(records, sent):
+        if not records:
+            return []
+        start = sent.start
+        docid = sent.doc._.id
+        sentid = sent._.id
+        fields = [ f for f in records[0]._fields if f in OFFSET_FIELDS ]
+        return [
+            r._replace(docid=docid, sentid=sentid,
+                       **{ f: getattr(r, f) + start for f in fields })
+            for r in records
+        ]
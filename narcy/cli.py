@@ -0,0 +1,263 @@
+"""Command line interface.
+
+Examples
+--------
+Extract relation reducts and *SVOs* from a JSON lines corpus
+in four worker processes::
+
+    narcy process corpus.jsonl output/ -m en_core_web_sm -o reduced svos -w 4
+
+Run eight worker threads sharing a single model instead::
+
+    narcy process corpus.jsonl output/ -w 8 --executor thread
+
+Process the second of four shards of a corpus (for instance on one
+of four machines) and merge outputs of all shards afterwards::
+
+    narcy process corpus.jsonl output/ --shard 1/4
+    narcy merge output/ merged/
+
+Extract only future subject-verb and verb-object relations
+with named entities (and future *SVOs* of all types with named entities)::
+
+    narcy process corpus.jsonl output/ -o reduced svos \
+        --rtypes subject-verb verb-object --tenses FUTURE --ents
+
+Write vectors as 16-bit floats projected to 64 dimensions::
+
+    narcy process corpus.jsonl output/ --vector-dtype float16 --vector-dim 64
+
+Write only lemmas of relations and skip model components
+which are not needed for them, including the entity recognizer
+(so named entities are not merged into compound tokens)::
+
+    narcy process corpus.jsonl output/ --prune --allow-ner-pruning \
+        --columns docid sentid rtype head_lemma sub_lemma
+"""
+import os
+import sys
+import codecs
+import argparse
+from glob import glob
+from .corpus import READERS, detect_format, read_corpus
+from .filters import OUTPUT_RTYPES, Filters
+from .jobs import FORMATS, Progress, process_corpus, merge_outputs
+from .jobs import check_shards
+from .processors import OUTPUTS, OUTPUT_COLUMNS
+from .service import EXECUTORS
+from .vectors import VectorTransform
+
+
+def _read_corpus(args):
+    fmt = args.corpus_format or detect_format(args.corpus)
+    if fmt == 'dir':
+        kwds = { 'pattern': args.pattern }
+    elif fmt == 'text':
+        kwds = { 'delimiter': args.delimiter }
+    else:
+        kwds = { 'text_field': args.text_field, 'id_field': args.id_field }
+    return read_corpus(args.corpus, fmt=fmt, **kwds)
+
+def _filters(args):
+    kwds = {
+        'rtypes': args.rtypes,
+        'tenses': args.tenses,
+        'modes': args.modes,
+        'ents': args.ents,
+        'lemmas': args.lemmas
+    }
+    if not any(kwds.values()):
+        return None
+    return Filters(**kwds)
+
+def _columns(args):
+    if not args.columns:
+        return None
+    unknown = set(args.columns).difference(*[
+        OUTPUT_COLUMNS[name] for name in args.outputs
+    ])
+    if unknown:
+        raise ValueError(f"unknown columns: {', '.join(sorted(unknown))}")
+    return {
+        name: [ c for c in OUTPUT_COLUMNS[name] if c in args.columns ]
+        for name in args.outputs
+    }
+
+def _vectors(args):
+    if args.vector_dtype == 'float32' and args.vector_dim is None:
+        return None
+    return VectorTransform.random(
+        k=args.vector_dim,
+        dtype=args.vector_dtype,
+        seed=args.vector_seed
+    )
+
+def process(args):
+    """Run ``process`` command."""
+    items = _read_corpus(args)
+    progress = Progress(stream=None if args.quiet else sys.stderr)
+    manifest = process_corpus(
+        items,
+        model=args.model,
+        output_dir=args.output_dir,
+        outputs=tuple(args.outputs),
+        n_workers=args.workers,
+        partition_size=args.partition_size,
+        fmt=args.format,
+        normalize_unicode=not args.no_normalize,
+        progress=progress,
+        resume=not args.restart,
+        max_failures=args.max_failures,
+        shard=args.shard,
+        filters=_filters(args),
+        columns=_columns(args),
+        prune=args.prune,
+        vectors=_vectors(args),
+        executor=args.executor,
+        allow_ner_pruning=args.allow_ner_pruning
+    )
+    for docid, message in manifest.errors.items():
+        print(f"{docid}: {message}", file=sys.stderr)
+    for docid, message in manifest.quarantined.items():
+        print(f"{docid}: quarantined after crashes ({message})", file=sys.stderr)
+    if not args.quiet:
+        print(
+            f"Processed {progress.n_docs} documents in {progress.elapsed:.1f}s "
+            f"({progress.throughput:.1f} docs/s)", file=sys.stderr
+        )
+    return 0
+
+def merge(args):
+    """Run ``merge`` command."""
+    input_dirs = []
+    for path in args.input_dirs:
+        shards = sorted(glob(os.path.join(path, 'shard-*-of-*')))
+        input_dirs.extend(shards or [ path ])
+    missing = check_shards(input_dirs)
+    if missing and args.partial:
+        print(f"Missing shards: {', '.join(map(str, missing))}", file=sys.stderr)
+    manifest = merge_outputs(input_dirs, args.output_dir,
+                             single_file=args.single_file,
+                             partial=args.partial)
+    print(
+        f"Merged {len(manifest.done)} documents from {len(input_dirs)} jobs",
+        file=sys.stderr
+    )
+    return 0
+
+def _escaped(value):
+    value = codecs.decode(value, 'unicode_escape')
+    if not value:
+        raise argparse.ArgumentTypeError("delimiter cannot be empty")
+    return value
+
+def _shard(value):
+    try:
+        index, count = map(int, value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError("shard has to be 'INDEX/COUNT'")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError("shard index has to be in [0, COUNT)")
+    return index, count
+
+def make_parser():
+    """Make argument parser."""
+    parser = argparse.ArgumentParser(
+        prog='narcy',
+        description="Narrative analysis of text corpora."
+    )
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    cmd = commands.add_parser('process', help="Extract data frames from a corpus.")
+    cmd.set_defaults(func=process)
+    cmd.add_argument('corpus', help="Directory or JSON lines / CSV / text file.")
+    cmd.add_argument('output_dir', help="Output directory.")
+    cmd.add_argument('-m', '--model', default='en_core_web_sm',
+                     help="Spacy model name or path.")
+    cmd.add_argument('-o', '--outputs', nargs='+', default=['reduced'],
+                     choices=list(OUTPUTS), help="Outputs to extract.")
+    cmd.add_argument('-w', '--workers', type=int, default=1,
+                     help="Number of workers.")
+    cmd.add_argument('--executor', default='process', choices=EXECUTORS,
+                     help="Run workers in processes, each with its own model, "
+                     "or in threads sharing a single model.")
+    cmd.add_argument('-p', '--partition-size', type=int, default=1000,
+                     help="Number of documents in an output partition.")
+    cmd.add_argument('-f', '--format', default='parquet', choices=FORMATS,
+                     help="Output format.")
+    cmd.add_argument('--corpus-format', choices=list(READERS),
+                     help="Corpus format (detected from the path by default).")
+    cmd.add_argument('--text-field', default='text',
+                     help="Name of the text field of JSON lines / CSV corpora.")
+    cmd.add_argument('--id-field', default='id',
+                     help="Name of the id field of JSON lines / CSV corpora.")
+    cmd.add_argument('--pattern', default='*.txt',
+                     help="Glob pattern of files in directory corpora.")
+    cmd.add_argument('--delimiter', default='\n\n', type=_escaped,
+                     help="Delimiter of documents in text file corpora "
+                     "(backslash escapes are allowed).")
+    cmd.add_argument('--no-normalize', action='store_true',
+                     help="Do not normalize unicode.")
+    cmd.add_argument('--restart', action='store_true',
+                     help="Discard the manifest and outputs of a previous run.")
+    cmd.add_argument('--max-failures', type=int, default=3,
+                     help="Number of worker crashes or failures after which "
+                     "a document is quarantined.")
+    cmd.add_argument('--shard', type=_shard,
+                     help="Process only shard 'INDEX/COUNT' of the corpus "
+                     "(0-based index) and write outputs to a shard subdirectory.")
+    cmd.add_argument('--rtypes', nargs='+',
+                     choices=sorted(set().union(*OUTPUT_RTYPES.values())),
+                     metavar='RTYPE',
+                     help="Keep only rows with these relation types "
+                     "('svo' or 'svc' for SVOs). Outputs without "
+                     "any of the types are not filtered by types.")
+    cmd.add_argument('--tenses', nargs='+',
+                     help="Keep only rows with these tenses.")
+    cmd.add_argument('--modes', nargs='+',
+                     help="Keep only rows with these modes.")
+    cmd.add_argument('--ents', action='store_true',
+                     help="Keep only rows with named entities.")
+    cmd.add_argument('--lemmas', nargs='+',
+                     help="Keep only rows with these lemmas.")
+    cmd.add_argument('--columns', nargs='+',
+                     help="Write only these columns of outputs.")
+    cmd.add_argument('--prune', action='store_true',
+                     help="Disable model components not needed for "
+                     "the outputs, columns and filters.")
+    cmd.add_argument('--allow-ner-pruning', action='store_true',
+                     help="Let --prune disable the entity recognizer "
+                     "if no entity columns or filters need it. Named "
+                     "entities are then not merged into compound tokens.")
+    cmd.add_argument('--vector-dtype', default='float32',
+                     choices=['float32', 'float16'],
+                     help="Data type of written vectors.")
+    cmd.add_argument('--vector-dim', type=int,
+                     help="Project vectors to this number of dimensions "
+                     "with a fixed random projection.")
+    cmd.add_argument('--vector-seed', type=int, default=0,
+                     help="Seed of the random projection of vectors.")
+    cmd.add_argument('-q', '--quiet', action='store_true',
+                     help="Do not report progress.")
+
+    cmd = commands.add_parser('merge', help="Merge outputs of shards or jobs.")
+    cmd.set_defaults(func=merge)
+    cmd.add_argument('input_dirs', nargs='+',
+                     help="Output directories of jobs or directories "
+                     "with shard subdirectories.")
+    cmd.add_argument('output_dir', help="Output directory.")
+    cmd.add_argument('--single-file', action='store_true',
+                     help="Write every output to a single file.")
+    cmd.add_argument('--partial', action='store_true',
+                     help="Merge even if some shards are missing.")
+    return parser
+
+def main(argv=None):
+    """Run command line interface."""
+    args = make_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,320 @@
+"""Corpus readers.
+
+Readers yield ``(id, text, metadata)`` tuples. Ids are ``None``
+if a corpus does not provide them, so documents are identified by hashes
+of their texts (see :py:func:`narcy.nlp.utils.set_doc_id`).
+
+Readers are lazy and JSON lines and text files are memory-mapped,
+so corpora never have to fit in memory. Memory-mapped files are split
+on encoded delimiters, so text files have to be in ASCII-compatible
+encodings (e.g. UTF-8 or Latin-1). JSON lines files in other encodings
+(e.g. UTF-16) are read in text mode. Line breaks in delimiters
+match both ``\\n`` and ``\\r\\n``.
+
+:py:func:`pipe_corpus` reads a corpus in a background thread
+while documents are parsed in batches.
+
+Examples
+--------
+>>> items = read_corpus('corpus.jsonl')                 # doctest: +SKIP
+>>> for doc, metadata in pipe_corpus(nlp, items):       # doctest: +SKIP
+...     df = doc_to_relations_df(doc)
+"""
+import os
+import re
+import csv
+import json
+import mmap
+import threading
+from queue import Queue
+from glob import glob
+from itertools import tee
+from contextlib import contextmanager
+from .nlp.utils import pipe_factory
+
+
+def read_directory(path, pattern='*.txt', encoding='utf-8'):
+    """Read plain text files from a directory.
+
+    Parameters
+    ----------
+    path : str
+        Directory path.
+    pattern : str
+        Glob pattern of file names (searched recursively).
+    encoding : str
+        Text encoding.
+
+    Yields
+    ------
+    tuple
+        Ids are file paths relative to the directory
+        and metadata are empty dictionaries.
+    """
+    filepaths = glob(os.path.join(path, '**', pattern), recursive=True)
+    for filepath in sorted(filepaths):
+        with open(filepath, encoding=encoding) as stream:
+            text = stream.read().strip()
+        yield os.path.relpath(filepath, path), text, {}
+
+@contextmanager
+def _map_file(path):
+    with open(path, 'rb') as stream:
+        if os.fstat(stream.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+_ASCII = bytes(range(128))
+
+def _is_ascii_compatible(encoding):
+    try:
+        return _ASCII.decode('ascii').encode(encoding) == _ASCII
+    except UnicodeError:
+        return False
+
+def _delimiter_pattern(delimiter, encoding):
+    if not delimiter:
+        raise ValueError("delimiter cannot be empty")
+    if not _is_ascii_compatible(encoding):
+        raise ValueError(f"encoding '{encoding}' is not ASCII-compatible")
+    parts = [ re.escape(p.encode(encoding)) for p in delimiter.split('\n') ]
+    return re.compile(b'\r?\n'.join(parts))
+
+def _iter_chunks(path, pattern):
+    """Iterate over ``(offset, chunk)`` pairs of a file split on a pattern."""
+    with _map_file(path) as mm:
+        start = 0
+        size = len(mm)
+        while start < size:
+            match = pattern.search(mm, start)
+            if match is None:
+                end = next_start = size
+            else:
+                end, next_start = match.span()
+            yield start, mm[start:end]
+            start = next_start
+
+def _split_record(record, text_field, id_field):
+    record = dict(record)
+    text = record.pop(text_field)
+    docid = record.pop(id_field, None)
+    if docid is not None:
+        docid = str(docid)
+    return docid, text, record
+
+def read_jsonl(path, text_field='text', id_field='id', encoding='utf-8'):
+    """Read JSON lines file.
+
+    Parameters
+    ----------
+    path : str
+        File path.
+    text_field : str
+        Name of the text field.
+    id_field : str
+        Name of the id field. Ids are ``None`` if it is missing.
+    encoding : str
+        Text encoding. Files in encodings which are not
+        ASCII-compatible are read in text mode instead of being mapped.
+
+    Yields
+    ------
+    tuple
+        Metadata are all other fields of records.
+    """
+    if _is_ascii_compatible(encoding):
+        pattern = _delimiter_pattern('\n', encoding)
+        lines = (
+            line.decode(encoding) for _, line in _iter_chunks(path, pattern)
+        )
+    else:
+        lines = _read_lines(path, encoding)
+    for line in lines:
+        if line.strip():
+            record = json.loads(line)
+            yield _split_record(record, text_field, id_field)
+
+def _read_lines(path, encoding):
+    with open(path, encoding=encoding) as stream:
+        yield from stream
+
+def read_text(path, delimiter='\n\n', encoding='utf-8'):
+    """Read documents from a single text file.
+
+    Parameters
+    ----------
+    path : str
+        File path.
+    delimiter : str
+        Delimiter of documents. Empty documents are skipped.
+        Line breaks in the delimiter also match ``\\r\\n``.
+    encoding : str
+        ASCII-compatible text encoding.
+
+    Yields
+    ------
+    tuple
+        Ids are ``None`` and metadata are dictionaries
+        with byte offsets of documents in the file.
+
+    Raises
+    ------
+    ValueError
+        If the delimiter is empty or the encoding is not ASCII-compatible.
+    """
+    pattern = _delimiter_pattern(delimiter, encoding)
+    return _read_text(path, pattern, encoding)
+
+def _read_text(path, pattern, encoding):
+    for offset, chunk in _iter_chunks(path, pattern):
+        text = chunk.decode(encoding).strip()
+        if text:
+            yield None, text, { 'offset': offset }
+
+def read_csv(path, text_field='text', id_field='id', encoding='utf-8', **kwds):
+    """Read CSV file.
+
+    Parameters
+    ----------
+    path : str
+        File path.
+    text_field : str
+        Name of the text column.
+    id_field : str
+        Name of the id column. Ids are ``None`` if it is missing.
+    encoding : str
+        Text encoding.
+    **kwds :
+        Passed to :py:class:`csv.DictReader`.
+
+    Yields
+    ------
+    tuple
+        Metadata are all other columns of rows.
+    """
+    with open(path, encoding=encoding, newline='') as stream:
+        for row in csv.DictReader(stream, **kwds):
+            yield _split_record(row, text_field, id_field)
+
+READERS = {
+    'dir': read_directory,
+    'jsonl': read_jsonl,
+    'csv': read_csv,
+    'text': read_text
+}
+
+def detect_format(path):
+    """Detect corpus format from a path."""
+    if os.path.isdir(path):
+        return 'dir'
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.json', '.ndjson'):
+        return 'jsonl'
+    if ext in ('.csv', '.tsv'):
+        return 'csv'
+    if ext == '.txt':
+        return 'text'
+    raise ValueError(f"cannot detect corpus format of '{path}'")
+
+def read_corpus(path, fmt=None, **kwds):
+    """Read corpus.
+
+    Parameters
+    ----------
+    path : str
+        Directory or file path.
+    fmt : str or None
+        Corpus format. Key of :py:data:`READERS`.
+        Detected from the path if ``None``.
+    **kwds :
+        Passed to the reader.
+    """
+    if fmt is None:
+        fmt = detect_format(path)
+    if fmt == 'csv' and path.lower().endswith('.tsv'):
+        kwds.setdefault('delimiter', '\t')
+    return READERS[fmt](path, **kwds)
+
+def prefetch(items, size=1000):
+    """Read items in a background thread.
+
+    Parameters
+    ----------
+    items : iterable
+        Items, for instance corpus tuples.
+    size : int
+        Maximum number of items read ahead.
+
+    Yields
+    ------
+    object
+        Items in the original order. Exceptions raised when reading
+        are re-raised in the consuming thread.
+    """
+    queue = Queue(maxsize=size)
+    done = object()
+    stop = threading.Event()
+    def read():
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                queue.put((item, None))
+        except Exception as exc:    # pylint: disable=broad-except
+            queue.put((done, exc))
+            return
+        queue.put((done, None))
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, exc = queue.get()
+            if item is done:
+                if exc is not None:
+                    raise exc
+                return
+            yield item
+    finally:
+        stop.set()
+        while thread.is_alive():
+            while not queue.empty():
+                queue.get_nowait()
+            thread.join(.01)
+
+def pipe_corpus(nlp, items, normalize_unicode=True, buffer_size=1000, **kwds):
+    """Make documents from a corpus in batches.
+
+    Items are read in a background thread (see :py:func:`prefetch`),
+    so reading a corpus overlaps with parsing.
+
+    Parameters
+    ----------
+    nlp : spacy.language.Language
+        Language object.
+    items : iterable of tuple
+        ``(id, text, metadata)`` tuples.
+    normalize_unicode : bool
+        Should texts be unicode-normalized.
+    buffer_size : int
+        Maximum number of items read ahead.
+    **kwds :
+        Passed to :py:meth:`spacy.language.Language.pipe`
+        (e.g. ``batch_size``).
+
+    Yields
+    ------
+    tuple
+        ``(doc, metadata)`` pairs.
+    """
+    make_docs = pipe_factory(nlp)
+    texts, ids, metadata = tee(prefetch(items, buffer_size), 3)
+    docs = make_docs(
+        (item[1] for item in texts),
+        ids=(item[0] for item in ids),
+        normalize_unicode=normalize_unicode,
+        **kwds
+    )
+    for doc, item in zip(docs, metadata):
+        yield doc, item[2]
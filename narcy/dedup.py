@@ -0,0 +1,174 @@
+"""Near-duplicate document detection before parsing.
+
+Documents are represented by *MinHash* signatures of word shingles
+and indexed with *locality-sensitive hashing* (LSH) over signature bands.
+Candidates sharing at least one band are verified by estimating
+Jaccard similarity of their signatures.
+
+Only a bounded number of the most recent canonical documents is indexed,
+so detection runs in a streaming fashion with bounded memory.
+"""
+import re
+import zlib
+from collections import OrderedDict
+import numpy as np
+
+
+_PRIME = (1 << 31) - 1
+_RX_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class NearDuplicateDetector:
+    """Streaming near-duplicate detector.
+
+    Attributes
+    ----------
+    num_perm : int
+        Number of hash permutations (signature length).
+    bands : int
+        Number of LSH bands. Must divide ``num_perm``.
+    shingle_size : int
+        Number of words in a shingle.
+    threshold : float
+        Minimum estimated Jaccard similarity of near-duplicates.
+    maxsize : int
+        Maximum number of indexed canonical documents.
+        The oldest documents are evicted first.
+    seed : int
+        Random seed for hash permutations.
+    """
+    def __init__(self, num_perm=128, bands=32, shingle_size=5,
+                 threshold=.8, maxsize=100000, seed=1010):
+        if num_perm % bands:
+            raise ValueError("'bands' must divide 'num_perm'")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.seed = seed
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _PRIME, size=(num_perm, 1)).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=(num_perm, 1)).astype(np.uint64)
+        self._buckets = [ {} for _ in range(bands) ]
+        self._signatures = OrderedDict()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def shingles(self, text):
+        """Get hashed word shingles of a text."""
+        words = _RX_WORD.findall(text.lower())
+        k = self.shingle_size
+        n = max(len(words) - k + 1, 1 if words else 0)
+        return np.unique(np.array([
+            zlib.crc32(' '.join(words[i:i+k]).encode()) for i in range(n)
+        ], dtype=np.uint64))
+
+    def signature(self, text):
+        """Get *MinHash* signature of a text.
+
+        Returns
+        -------
+        numpy.ndarray or None
+            Signature array or ``None`` if the text has no words.
+        """
+        shingles = self.shingles(text)
+        if not shingles.size:
+            return None
+        hashes = (self._a * (shingles % _PRIME) + self._b) % _PRIME
+        return hashes.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        rows = self.num_perm // self.bands
+        return [
+            signature[i*rows:(i+1)*rows].tobytes() for i in range(self.bands)
+        ]
+
+    def query(self, signature):
+        """Find canonical near-duplicate of a signature.
+
+        Returns
+        -------
+        hashable or None
+            Id of the most similar indexed document
+            or ``None`` if there is no near-duplicate.
+        """
+        best, best_sim = None, self.threshold
+        seen = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            for docid in bucket.get(key, ()):
+                if docid in seen:
+                    continue
+                seen.add(docid)
+                sim = np.mean(self._signatures[docid] == signature)
+                if sim >= best_sim:
+                    best, best_sim = docid, sim
+        return best
+
+    def add(self, docid, signature):
+        """Index canonical document."""
+        if docid in self._signatures:
+            return
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(key, []).append(docid)
+        self._signatures[docid] = signature
+        if len(self._signatures) > self.maxsize:
+            self._evict()
+
+    def _evict(self):
+        docid, signature = self._signatures.popitem(last=False)
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            docids = bucket[key]
+            docids.remove(docid)
+            if not docids:
+                del bucket[key]
+
+    def check(self, docid, text):
+        """Check if document is a near-duplicate and index it if it is not.
+
+        Parameters
+        ----------
+        docid : hashable
+            Document id.
+        text : str
+            Document text.
+
+        Returns
+        -------
+        hashable or None
+            Id of the canonical document or ``None``
+            if the document is not a near-duplicate.
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        canonical = self.query(signature)
+        if canonical is None:
+            self.add(docid, signature)
+        return canonical
+
+
+def deduplicate(items, detector=None, link=False):
+    """Filter or link near-duplicates in a stream of documents.
+
+    Parameters
+    ----------
+    items : iterable of tuple
+        Tuples starting with document id and text,
+        e.g. ``(id, text, metadata)``.
+    detector : NearDuplicateDetector or None
+        Detector object. If ``None``, then a default one is used.
+    link : bool
+        If ``False``, then near-duplicates are skipped.
+        Otherwise all items are yielded with an additional last element
+        with id of the canonical document (``None`` for canonical documents).
+    """
+    if detector is None:
+        detector = NearDuplicateDetector()
+    for item in items:
+        canonical = detector.check(item[0], item[1])
+        if link:
+            yield (*item, canonical)
+        elif canonical is None:
+            yield item
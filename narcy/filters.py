@@ -0,0 +1,154 @@
+"""Row filters pushed down into extraction of relations, *SVOs* and tokens.
+
+Filters are checked on relations, *SVOs* and tokens before their records
+are built, so rejected rows never compute sentiment, vectors
+or any other record fields.
+
+Examples
+--------
+>>> filters = Filters(rtypes=('subject-verb', 'verb-object'), ents=True)
+>>> df = doc_to_relations_df(doc, filters=filters)      # doctest: +SKIP
+
+Batch processing (see :py:mod:`narcy.service` and :py:mod:`narcy.jobs`)
+accepts filters of all outputs or mappings from output names to filters,
+like mappings of columns (see :py:func:`get_filters`).
+"""
+from collections import namedtuple
+from .nlp.rtypes import RTYPES
+
+
+#: Relation types of rows of outputs. Tokens have no types.
+OUTPUT_RTYPES = {
+    'relations': RTYPES,
+    'reduced': RTYPES,
+    'svos': ('svo', 'svc'),
+    'tokens': ()
+}
+
+
+def _lemma(term):
+    return term._.lead._.lemma
+
+
+class Filters(namedtuple('Filters', [
+        'rtypes', 'tenses', 'modes', 'ents', 'lemmas'
+    ])):
+    """Row filters.
+
+    Filters are hashable, so they are also used as parts
+    of sentence cache keys (see :py:mod:`narcy.cache`).
+
+    Attributes
+    ----------
+    rtypes : frozenset or None
+        Accepted relation types. Relation types of *SVOs* are ``'svo'``
+        and ``'svc'`` and tokens have no types. All types are accepted
+        if ``None``.
+    tenses : frozenset or None
+        Accepted tenses of relations, *SVO* verbs or tokens.
+        All tenses are accepted if ``None``.
+    modes : frozenset or None
+        Accepted modes. All modes are accepted if ``None``.
+    ents : bool
+        Accept only rows with at least one named entity
+        among heads and subs, subjects and objects or tokens.
+    lemmas : frozenset or None
+        Accept only rows with at least one of lead lemmas of heads
+        and subs, subjects, verbs and objects or tokens in the set.
+        All lemmas are accepted if ``None``.
+    """
+    __slots__ = ()
+
+    def __new__(cls, rtypes=None, tenses=None, modes=None, ents=False,
+                lemmas=None):
+        def _set(values):
+            return None if values is None else frozenset(values)
+        if rtypes is not None:
+            unknown = set(rtypes).difference(*OUTPUT_RTYPES.values())
+            if unknown:
+                raise ValueError(
+                    f"unknown relation types: {', '.join(sorted(unknown))}"
+                )
+        return super().__new__(
+            cls, _set(rtypes), _set(tenses), _set(modes),
+            bool(ents), _set(lemmas)
+        )
+
+    def for_output(self, output):
+        """Get filters of an output.
+
+        Relation types are checked only for outputs with some of
+        the accepted types, so for instance ``rtypes=('subject-verb',)``
+        keeps all *SVOs* and tokens.
+
+        Parameters
+        ----------
+        output : str
+            Output name. Key of :py:data:`OUTPUT_RTYPES`.
+        """
+        if self.rtypes is None \
+        or self.rtypes.intersection(OUTPUT_RTYPES[output]):
+            return self
+        return self._replace(rtypes=None)
+
+    def accept_rtype(self, rtype):
+        """Check relation type."""
+        return self.rtypes is None or rtype in self.rtypes
+
+    def accept_tense(self, tense, mode):
+        """Check tense and mode."""
+        if self.tenses is not None and tense not in self.tenses:
+            return False
+        if self.modes is not None and mode not in self.modes:
+            return False
+        return True
+
+    def accept_terms(self, terms, lemma=_lemma):
+        """Check entities and lemmas of terms.
+
+        Parameters
+        ----------
+        terms : sequence of spacy.tokens.Span
+            Terms of a row.
+        lemma : callable
+            Function getting lemmas of terms.
+        """
+        if self.ents and not any(t._.is_ent for t in terms):
+            return False
+        if self.lemmas is not None \
+        and not any(lemma(t) in self.lemmas for t in terms):
+            return False
+        return True
+
+    def accept_relation(self, relation):
+        """Check relation.
+
+        Cheap checks go first, so tenses and lemmas
+        are resolved only for relations of accepted types.
+        """
+        return self.accept_rtype(relation.rtype) \
+            and self.accept_tense(relation.tense, relation.mode) \
+            and self.accept_terms((relation.head, relation.sub))
+
+
+def get_filters(filters, output):
+    """Get filters of an output.
+
+    Parameters
+    ----------
+    filters : Filters or dict or None
+        Filters of all outputs or mapping from output names to filters.
+        Rows of outputs which are not in the mapping are not filtered.
+    output : str
+        Output name.
+
+    Returns
+    -------
+    Filters or None
+        Filters of the output (see :py:meth:`Filters.for_output`).
+    """
+    if isinstance(filters, dict):
+        filters = filters.get(output)
+    if filters is None:
+        return None
+    return filters.for_output(output)
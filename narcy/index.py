@@ -0,0 +1,290 @@
+"""Inverted index of lemmas and entities in relations.
+
+The index maps lemmas (``head_lemma`` and ``sub_lemma``) and entity labels
+(``head_ent_label`` and ``sub_ent_label``) of relations data frames
+(see :py:func:`narcy.processors.doc_to_relations_df`) to posting lists
+of ``(docid, sentid, row)`` with roles (head or sub), tenses, modes
+and entity labels of the indexed terms. Rows are positions of relations
+in the concatenation of all indexed data frames.
+
+Postings are stored in *NumPy* arrays sorted by keys together with
+offsets of keys, so lookups are array slices. New postings are appended to a small unsorted
+buffer which is scanned on lookups and merged into the sorted arrays
+when it grows large.
+
+Examples
+--------
+>>> index = RelationIndex()
+>>> for df in frames:                                   # doctest: +SKIP
+...     index.add(df)
+>>> index.lookup(lemma='apple', ent_label='ORG', tense='FUTURE')  # doctest: +SKIP
+>>> index.save('relations.idx.npz')                     # doctest: +SKIP
+"""
+import json
+import numpy as np
+import pandas as pd
+
+
+ROLES = ('head', 'sub')
+
+_VOCABS = ('key', 'docid', 'sentid', 'tense', 'mode', 'label')
+_COLUMNS = ('key', 'docid', 'sentid', 'row', 'role', 'tense', 'mode', 'label')
+_DTYPES = {
+    'key': np.int32,
+    'docid': np.int32,
+    'sentid': np.int32,
+    'row': np.int64,
+    'role': np.int8,
+    'tense': np.int8,
+    'mode': np.int8,
+    'label': np.int32
+}
+
+
+class RelationIndex:
+    """Inverted index of lemmas and entities in relations.
+
+    Attributes
+    ----------
+    n_rows : int
+        Number of indexed relations.
+    max_buffer : int
+        Maximum number of unsorted postings.
+    """
+    def __init__(self, max_buffer=1000000):
+        self.n_rows = 0
+        self.max_buffer = max_buffer
+        self._vocabs = { name: {} for name in _VOCABS }
+        self._values = { name: [] for name in _VOCABS }
+        self._postings = _empty()
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._buffer = []
+
+    def __len__(self):
+        return len(self._postings['key']) + self._buffered
+
+    def _intern(self, name, values):
+        vocab = self._vocabs[name]
+        known = self._values[name]
+        inverse, uniques = pd.factorize(np.asarray(values, dtype=object))
+        codes = np.empty(len(uniques), dtype=_DTYPES[name])
+        for i, value in enumerate(uniques.tolist()):
+            code = vocab.get(value)
+            if code is None:
+                code = vocab[value] = len(known)
+                known.append(value)
+            codes[i] = code
+        return codes[inverse]
+
+    def merge(self, other):
+        """Merge postings of other index.
+
+        Rows of the other index are shifted after rows of this index,
+        so they are positions of relations in the concatenation of data
+        frames indexed by this index and then by the other one
+        (for instance outputs of shards merged with
+        :py:func:`narcy.jobs.merge_outputs`).
+
+        Parameters
+        ----------
+        other : RelationIndex
+            Other index.
+        """
+        other.compact()
+        postings = dict(other._postings)
+        for name in _VOCABS:
+            mapping = self._intern(name, other._values[name])
+            postings[name] = mapping[postings[name]]
+        postings['row'] = postings['row'] + self.n_rows
+        self.n_rows += other.n_rows
+        self._buffer.append(postings)
+        if self._buffered > self.max_buffer:
+            self.compact()
+        return self
+
+    def _code(self, name, value):
+        return self._vocabs[name].get(value, -1)
+
+    def add(self, df):
+        """Index relations data frame.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            Relations data frame with ``docid``, ``sentid``,
+            ``head_lemma``, ``sub_lemma``, ``head_ent_label``,
+            ``sub_ent_label``, ``head_tense``, ``sub_tense``,
+            ``head_mode`` and ``sub_mode`` columns.
+
+        Returns
+        -------
+        numpy.ndarray
+            Rows assigned to relations of the data frame.
+        """
+        rows = np.arange(self.n_rows, self.n_rows + len(df), dtype=np.int64)
+        self.n_rows += len(df)
+        docids = self._intern('docid', df['docid'])
+        sentids = self._intern('sentid', df['sentid'])
+        for role, prefix in enumerate(ROLES):
+            labels = df[prefix+'_ent_label'].fillna('').to_numpy(dtype=object)
+            columns = {
+                'docid': docids,
+                'sentid': sentids,
+                'row': rows,
+                'role': np.full(len(df), role, dtype=np.int8),
+                'tense': self._intern('tense', df[prefix+'_tense']),
+                'mode': self._intern('mode', df[prefix+'_mode']),
+                'label': self._intern('label', labels)
+            }
+            lemmas = df[prefix+'_lemma'].to_numpy(dtype=object)
+            self._append(lemmas, 'l:', columns)
+            has_label = labels != ''
+            self._append(labels[has_label], 'e:', {
+                k: v[has_label] for k, v in columns.items()
+            })
+        if self._buffered > self.max_buffer:
+            self.compact()
+        return rows
+
+    @property
+    def _buffered(self):
+        return sum(len(b['key']) for b in self._buffer)
+
+    def _append(self, keys, prefix, columns):
+        keys = np.array([ prefix + str(k) for k in keys ], dtype=object)
+        postings = { 'key': self._intern('key', keys), **columns }
+        self._buffer.append(postings)
+
+    def compact(self):
+        """Merge buffered postings into sorted arrays."""
+        if not self._buffer:
+            return
+        postings = {
+            c: np.concatenate([ self._postings[c], *[ b[c] for b in self._buffer ] ])
+            for c in _COLUMNS
+        }
+        order = np.argsort(postings['key'], kind='stable')
+        self._postings = { c: v[order] for c, v in postings.items() }
+        self._offsets = np.searchsorted(
+            self._postings['key'],
+            np.arange(len(self._vocabs['key']) + 1)
+        ).astype(np.int64)
+        self._buffer = []
+
+    def _find(self, key):
+        code = self._code('key', key)
+        if code < 0:
+            return _empty()
+        postings = {}
+        if code + 1 < len(self._offsets):
+            i, j = self._offsets[code], self._offsets[code+1]
+            postings = { c: v[i:j] for c, v in self._postings.items() }
+        parts = [ postings ] if postings else []
+        for buffer in self._buffer:
+            mask = buffer['key'] == code
+            if mask.any():
+                parts.append({ c: v[mask] for c, v in buffer.items() })
+        if not parts:
+            return _empty()
+        return { c: np.concatenate([ p[c] for p in parts ]) for c in _COLUMNS }
+
+    def lookup(self, lemma=None, ent_label=None, role=None, tense=None,
+               mode=None):
+        """Find relations with a lemma and/or an entity label.
+
+        Parameters
+        ----------
+        lemma : str or None
+            Lemma of a head or a sub.
+        ent_label : str or None
+            Entity label of a head or a sub.
+            If ``lemma`` is also given, then only entities
+            with the lemma are found. Empty label means no entity,
+            so it finds terms which are not entities only together
+            with ``lemma`` (terms are not indexed by empty labels).
+        role : {'head', 'sub'} or None
+            Role of the term in relations.
+        tense : str or None
+            Tense of the term.
+        mode : str or None
+            Mode of the term.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Postings with ``docid``, ``sentid``, ``row``, ``role``,
+            ``tense``, ``mode`` and ``ent_label`` columns
+            ordered by rows.
+        """
+        if lemma is not None:
+            postings = self._find('l:' + str(lemma))
+        elif ent_label is not None:
+            postings = self._find('e:' + str(ent_label))
+        else:
+            raise ValueError("'lemma' or 'ent_label' has to be provided")
+        mask = np.ones(len(postings['key']), dtype=bool)
+        filters = (
+            ('label', ent_label if lemma is not None else None),
+            ('tense', tense),
+            ('mode', mode)
+        )
+        for name, value in filters:
+            if value is not None:
+                mask &= postings[name] == self._code(name, value)
+        if role is not None:
+            mask &= postings['role'] == ROLES.index(role)
+        postings = { c: v[mask] for c, v in postings.items() }
+        order = np.lexsort((postings['role'], postings['row']))
+        postings = { c: v[order] for c, v in postings.items() }
+        return pd.DataFrame({
+            'docid': self._decode('docid', postings['docid']),
+            'sentid': self._decode('sentid', postings['sentid']),
+            'row': postings['row'],
+            'role': np.array(ROLES, dtype=object)[postings['role']],
+            'tense': self._decode('tense', postings['tense']),
+            'mode': self._decode('mode', postings['mode']),
+            'ent_label': self._decode('label', postings['label'])
+        })
+
+    def _decode(self, name, codes):
+        values = self._values[name]
+        return [ values[c] for c in codes.tolist() ]
+
+    def save(self, path):
+        """Save index to a ``.npz`` file."""
+        self.compact()
+        np.savez(
+            path,
+            n_rows=np.int64(self.n_rows),
+            offsets=self._offsets,
+            vocabs=np.array(json.dumps(self._values)),
+            **self._postings
+        )
+
+    @classmethod
+    def load(cls, path, **kwds):
+        """Load index from a ``.npz`` file.
+
+        Parameters
+        ----------
+        path : str
+            File path.
+        **kwds :
+            Passed to the constructor.
+        """
+        index = cls(**kwds)
+        with np.load(path) as data:
+            index.n_rows = int(data['n_rows'])
+            index._offsets = data['offsets']
+            index._postings = { c: data[c] for c in _COLUMNS }
+            vocabs = json.loads(str(data['vocabs']))
+        index._values = vocabs
+        index._vocabs = {
+            name: { v: i for i, v in enumerate(values) }
+            for name, values in vocabs.items()
+        }
+        return index
+
+
+def _empty():
+    return { c: np.empty(0, dtype=_DTYPES[c]) for c in _COLUMNS }
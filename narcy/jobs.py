@@ -0,0 +1,631 @@
+"""Corpus processing jobs.
+
+A corpus is split into partitions of consecutive documents and partitions
+are processed in a pool of worker processes, each with its own language
+model (see :py:func:`narcy.service.init_worker`), or in a pool of threads
+sharing a single model (see :py:func:`narcy.service.make_pool`).
+Workers write outputs of every partition to separate files::
+
+    <output_dir>/<output>/part-00000.<format>
+
+Progress of a job is recorded in an append-only manifest
+(``<output_dir>/manifest.jsonl``) with ids of documents in completed
+partitions, so a restarted job skips finished work. Partitions
+of crashed workers and partitions failing with exceptions (for instance
+on texts longer than ``nlp.max_length``) are retried document by document
+and documents which repeatedly crash workers or fail are quarantined.
+
+Corpora may be split into shards processed independently (for instance
+on different machines) by hashing document ids. Outputs of shards
+are combined with :py:func:`merge_outputs`. Jobs do not write aggregates,
+but aggregates built from outputs of shards can be merged in the same
+order (see :py:meth:`narcy.matrices.RelationCounter.merge`
+and :py:meth:`narcy.index.RelationIndex.merge`).
+"""
+import os
+import re
+import sys
+import time
+import json
+import shutil
+import unicodedata
+from collections import namedtuple, deque, Counter
+from concurrent.futures import wait
+from concurrent.futures import FIRST_COMPLETED, ALL_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from glob import glob
+from itertools import islice
+import numpy as np
+import pandas as pd
+from .nlp.utils import make_hash, make_key
+from .processors import OUTPUTS
+from .service import EXECUTORS, make_pool, process_batch, check_pipeline
+
+
+FORMATS = ('parquet', 'csv', 'pickle')
+
+Partition = namedtuple('Partition', [
+    'part', 'docids', 'errors', 'paths'
+])
+
+
+def iter_partitions(items, size):
+    """Split stream of items into lists."""
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+def partition_path(output_dir, output, part, fmt='parquet'):
+    """Get path of an output partition file."""
+    return os.path.join(output_dir, output, f'part-{part:05d}.{fmt}')
+
+def write_frame(df, path, fmt='parquet'):
+    """Write data frame to a file.
+
+    Vector columns are written as lists in *Parquet* files
+    (of half-precision floats if vectors are ``float16`` arrays,
+    see :py:mod:`narcy.vectors`) and are dropped from *CSV* files.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if fmt == 'parquet':
+        df = df.assign(**{
+            c: df[c].map(_vector_list)
+            for c in df.columns if c.endswith('vector')
+        })
+        df.to_parquet(path, index=False)
+    elif fmt == 'csv':
+        df = df[[ c for c in df.columns if not c.endswith('vector') ]]
+        df.to_csv(path, index=False)
+    elif fmt == 'pickle':
+        df.to_pickle(path)
+    else:
+        raise ValueError(f"unknown format '{fmt}'")
+
+def _vector_list(vector):
+    # Half-precision arrays are written as they are,
+    # since Python floats would be stored as doubles.
+    if vector.dtype == np.float16:
+        return vector
+    return vector.tolist()
+
+def read_frame(path):
+    """Read data frame written with :py:func:`write_frame`."""
+    fmt = os.path.splitext(path)[1][1:]
+    if fmt == 'parquet':
+        return pd.read_parquet(path)
+    if fmt == 'csv':
+        return pd.read_csv(path)
+    return pd.read_pickle(path)
+
+def _ping():
+    return True
+
+def process_partition(part, items, outputs, output_dir, fmt='parquet',
+                      normalize_unicode=True, filters=None, columns=None,
+                      prune=False, vectors=None, worker=None,
+                      allow_ner_pruning=False):
+    """Process partition of a corpus in a worker.
+
+    Parameters
+    ----------
+    part : int
+        Partition number.
+    items : list of tuple
+        ``(id, text, metadata)`` tuples.
+    outputs : tuple of str
+        Names of outputs. Keys of :py:data:`narcy.processors.OUTPUTS`.
+    output_dir : str
+        Output directory.
+    fmt : str
+        Output format (see :py:data:`FORMATS`).
+    normalize_unicode : bool
+        Should texts be unicode-normalized.
+    filters : narcy.filters.Filters or dict or None
+        Filters of rows of all outputs or mapping from output names
+        to filters (see :py:func:`narcy.filters.get_filters`).
+    columns : dict or None
+        Mapping from output names to columns.
+    prune : bool
+        Should pipeline components which are not needed
+        for outputs be disabled.
+    vectors : narcy.vectors.VectorTransform or None
+        Transformation of vectors in outputs.
+    worker : narcy.service.Worker or None
+        Worker shared by threads (see :py:func:`narcy.service.make_pool`).
+    allow_ner_pruning : bool
+        Can the entity recognizer be disabled when pruning
+        (see :py:func:`narcy.service.check_pipeline`).
+
+    Returns
+    -------
+    Partition
+        Errors are ``(id, message)`` tuples of failed documents
+        and paths are relative to the output directory.
+    """
+    ids = [ item[0] for item in items ]
+    texts = [ item[1] for item in items ]
+    results = process_batch(texts, outputs, ids=ids,
+                            normalize_unicode=normalize_unicode,
+                            filters=filters, columns=columns, prune=prune,
+                            vectors=vectors, worker=worker,
+                            allow_ner_pruning=allow_ner_pruning)
+    frames = { name: [] for name in outputs }
+    errors = []
+    for item, result in zip(items, results):
+        if isinstance(result, Exception):
+            errors.append((item[0], repr(result)))
+            continue
+        for name, df in result.items():
+            frames[name].append(df)
+    paths = {}
+    for name, dfs in frames.items():
+        if dfs:
+            path = partition_path(output_dir, name, part, fmt)
+            write_frame(pd.concat(dfs, ignore_index=True), path, fmt)
+            paths[name] = os.path.relpath(path, output_dir)
+    return Partition(part, ids, errors, paths)
+
+
+class Manifest:
+    """Append-only manifest of a corpus job.
+
+    Every line of the manifest file is a JSON object describing
+    a completed partition, a worker crash or a quarantined document.
+    Incomplete last lines (left by interrupted writes) are ignored.
+
+    Attributes
+    ----------
+    path : str
+        Manifest file path.
+    partitions : dict
+        Mapping from numbers to completed partitions.
+        Output paths are relative to the manifest directory.
+    done : set
+        Ids of documents in completed partitions.
+    errors : dict
+        Mapping from ids of documents which failed with exceptions
+        to error messages.
+    failures : collections.Counter
+        Numbers of worker crashes and failed partitions of documents.
+    quarantined : dict
+        Mapping from ids of quarantined documents to error messages.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.partitions = {}
+        self.done = set()
+        self.errors = {}
+        self.failures = Counter()
+        self.quarantined = {}
+        if os.path.exists(path):
+            with open(path) as stream:
+                for line in stream:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        continue
+
+    def __contains__(self, docid):
+        return docid in self.done or docid in self.quarantined
+
+    @property
+    def next_part(self):
+        """Number of the next partition."""
+        return max(self.partitions, default=-1) + 1
+
+    def _apply(self, entry):
+        event = entry['event']
+        if event == 'partition':
+            partition = Partition(
+                entry['part'], entry['docids'],
+                [ tuple(e) for e in entry['errors'] ], entry['paths']
+            )
+            self.partitions[partition.part] = partition
+            self.done.update(partition.docids)
+            self.errors.update(partition.errors)
+        elif event == 'failure':
+            self.failures[entry['docid']] += 1
+        elif event == 'quarantine':
+            self.quarantined[entry['docid']] = entry['error']
+
+    def _write(self, **entry):
+        with open(self.path, 'a') as stream:
+            stream.write(json.dumps(entry) + '\n')
+            stream.flush()
+            os.fsync(stream.fileno())
+        self._apply(entry)
+
+    def add_partition(self, partition):
+        """Record completed partition."""
+        self._write(event='partition', part=partition.part,
+                    docids=partition.docids, paths=partition.paths,
+                    errors=partition.errors)
+
+    def add_failure(self, docid, error):
+        """Record failure and get number of failures of a document."""
+        self._write(event='failure', docid=docid, error=error)
+        return self.failures[docid]
+
+    def quarantine(self, docid, error):
+        """Record quarantined document."""
+        self._write(event='quarantine', docid=docid, error=error)
+
+    def remove_orphans(self, output_dir, outputs=tuple(OUTPUTS),
+                       fmt='parquet'):
+        """Remove partition files not recorded in the manifest.
+
+        Such files are left by jobs interrupted before
+        their partitions were recorded. Only partition files
+        of the given outputs and format numbered from
+        :py:attr:`next_part` are removed, so other files
+        in the output directory are never touched.
+        """
+        pattern = re.compile(r'part-(\d+)\.' + re.escape(fmt))
+        for output in outputs:
+            dirname = os.path.join(output_dir, output)
+            if not os.path.isdir(dirname):
+                continue
+            for name in os.listdir(dirname):
+                match = pattern.fullmatch(name)
+                if not match:
+                    continue
+                part = int(match.group(1))
+                path = os.path.join(dirname, name)
+                if part >= self.next_part \
+                and path == partition_path(output_dir, output, part, fmt):
+                    os.remove(path)
+
+
+def in_shard(docid, shard_index, shard_count):
+    """Check if a document belongs to a shard.
+
+    Documents are assigned to shards by 64-bit *BLAKE2b* hashes
+    of their ids, so the assignment is deterministic
+    and does not depend on the order of documents.
+    """
+    return make_key(docid) % shard_count == shard_index
+
+def shard_dirname(shard_index, shard_count):
+    """Get name of a shard output directory."""
+    return f'shard-{shard_index:05d}-of-{shard_count:05d}'
+
+def check_shards(input_dirs):
+    """Check shard output directories of a corpus.
+
+    Directories which are not named with :py:func:`shard_dirname`
+    are not checked.
+
+    Parameters
+    ----------
+    input_dirs : iterable of str
+        Output directories of jobs.
+
+    Returns
+    -------
+    list of int
+        Indexes of missing shards.
+
+    Raises
+    ------
+    ValueError
+        If shards disagree on the number of shards
+        or a shard is given more than once.
+    """
+    shards = []
+    for input_dir in input_dirs:
+        match = re.fullmatch(r'shard-(\d+)-of-(\d+)',
+                             os.path.basename(os.path.normpath(input_dir)))
+        if match:
+            shards.append((int(match.group(1)), int(match.group(2))))
+    if not shards:
+        return []
+    counts = sorted(set(count for _, count in shards))
+    if len(counts) > 1:
+        raise ValueError(
+            f"shards disagree on the number of shards: {counts}"
+        )
+    indexes = Counter(index for index, _ in shards)
+    duplicates = sorted(i for i, n in indexes.items() if n > 1)
+    if duplicates:
+        raise ValueError(f"shards given more than once: {duplicates}")
+    return [ i for i in range(counts[0]) if i not in indexes ]
+
+def assign_ids(items, normalize_unicode=True):
+    """Set ids of items without ids to hashes of their texts.
+
+    Hashes are the same as ids of documents made from the texts
+    (see :py:func:`narcy.nlp.utils.set_doc_id`).
+    """
+    for docid, text, *rest in items:
+        if docid is None:
+            if normalize_unicode:
+                text = unicodedata.normalize('NFC', text)
+            docid = make_hash(text)
+        yield (docid, text, *rest)
+
+
+class Progress:
+    """Progress and throughput reporter.
+
+    Attributes
+    ----------
+    stream : file-like or None
+        Output stream. Nothing is reported if ``None``.
+    """
+    def __init__(self, stream=sys.stderr):
+        self.stream = stream
+        self.n_docs = 0
+        self.n_errors = 0
+        self.n_parts = 0
+        self.start = time.monotonic()
+
+    @property
+    def elapsed(self):
+        """Elapsed time in seconds."""
+        return time.monotonic() - self.start
+
+    @property
+    def throughput(self):
+        """Documents processed per second."""
+        return self.n_docs / max(self.elapsed, 1e-9)
+
+    def update(self, partition):
+        """Account processed partition."""
+        self.n_parts += 1
+        self.n_docs += len(partition.docids)
+        self.n_errors += len(partition.errors)
+        if self.stream is not None:
+            print(
+                f"\r{self.n_parts} partitions, {self.n_docs} documents, "
+                f"{self.n_errors} errors, {self.throughput:.1f} docs/s",
+                end='', file=self.stream, flush=True
+            )
+
+    def close(self):
+        """Finish reporting."""
+        if self.stream is not None:
+            print(file=self.stream, flush=True)
+
+
+def process_corpus(items, model, output_dir, outputs=('reduced',),
+                   n_workers=1, partition_size=1000, fmt='parquet',
+                   normalize_unicode=True, progress=None, resume=True,
+                   max_failures=3, shard=None, filters=None, columns=None,
+                   prune=False, vectors=None, executor='process',
+                   allow_ner_pruning=False):
+    """Process corpus in a pool of worker processes or threads.
+
+    Parameters
+    ----------
+    items : iterable of tuple
+        ``(id, text, metadata)`` tuples (see :py:mod:`narcy.corpus`).
+    model : str or callable or spacy.language.Language
+        Language model loaded in workers.
+        See :py:func:`narcy.service.load_model`.
+    output_dir : str
+        Output directory.
+    outputs : tuple of str
+        Names of outputs. Keys of :py:data:`narcy.processors.OUTPUTS`.
+    n_workers : int
+        Number of workers.
+    partition_size : int
+        Number of documents in a partition.
+    fmt : str
+        Output format (see :py:data:`FORMATS`).
+    normalize_unicode : bool
+        Should texts be unicode-normalized.
+    progress : Progress or None
+        Progress reporter. Nothing is reported if ``None``.
+    resume : bool
+        Should documents recorded in the manifest be skipped.
+        Otherwise the manifest and previous outputs are removed.
+    max_failures : int
+        Number of worker crashes or failed single-document partitions
+        after which a document is quarantined.
+    shard : tuple or None
+        ``(shard_index, shard_count)`` pair. If not ``None``, then only
+        documents in the shard (see :py:func:`in_shard`) are processed
+        and outputs are written to a shard subdirectory
+        (see :py:func:`shard_dirname`) of the output directory.
+    filters : narcy.filters.Filters or dict or None
+        Filters of rows of all outputs or mapping from output names
+        to filters (see :py:func:`narcy.filters.get_filters`).
+    columns : dict or None
+        Mapping from output names to columns.
+        All columns are written for outputs which are not in the mapping.
+    prune : bool
+        Should pipeline components which are not needed for outputs
+        (see :py:func:`narcy.pipeline.prune_pipeline`) be disabled.
+        Raises :py:class:`ValueError` before processing any documents
+        if outputs need a component which is missing from the model.
+    vectors : narcy.vectors.VectorTransform or None
+        Transformation of vectors in outputs (see :py:mod:`narcy.vectors`).
+        Random projections are the same in all workers.
+    executor : {'process', 'thread'}
+        Kind of the pool of workers (see :py:func:`narcy.service.make_pool`).
+        Thread workers share a single model, so they need much less memory,
+        but documents crashing the interpreter are not quarantined.
+    allow_ner_pruning : bool
+        Can the entity recognizer be disabled when pruning if no
+        entity columns or filters need it. Outputs are then made
+        without entity compounds
+        (see :py:func:`narcy.service.check_pipeline`).
+
+    Returns
+    -------
+    Manifest
+        Job manifest.
+    """
+    unknown = set(outputs).difference(OUTPUTS)
+    if unknown:
+        raise ValueError(f"unknown outputs: {', '.join(sorted(unknown))}")
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format '{fmt}'")
+    if executor not in EXECUTORS:
+        raise ValueError(f"unknown executor '{executor}'")
+    if shard is not None:
+        shard_index, shard_count = shard
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(f"invalid shard {shard_index} of {shard_count}")
+        output_dir = os.path.join(output_dir, shard_dirname(*shard))
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, 'manifest.jsonl')
+    if not resume and os.path.exists(path):
+        os.remove(path)
+    manifest = Manifest(path)
+    manifest.remove_orphans(output_dir, outputs, fmt)
+    items = (
+        item for item in assign_ids(items, normalize_unicode)
+        if item[0] not in manifest
+        and (shard is None or in_shard(item[0], *shard))
+    )
+    chunks = iter_partitions(items, partition_size)
+    suspects = deque()
+    parts = iter(range(manifest.next_part, sys.maxsize))
+    args = (tuple(outputs), output_dir, fmt, normalize_unicode,
+            filters, columns, prune, vectors)
+
+    def start_pool():
+        pool, worker = make_pool(model, n_workers, executor)
+        # Fail early if workers cannot load the model,
+        # so their crashes are not blamed on documents.
+        try:
+            pool.submit(_ping).result()
+        except BrokenProcessPool:
+            pool.shutdown(wait=True)
+            raise RuntimeError("worker processes failed to start")
+        if prune:
+            try:
+                pool.submit(check_pipeline, outputs, columns, filters, worker,
+                            allow_ner_pruning).result()
+            except Exception:
+                pool.shutdown(wait=True)
+                raise
+        return pool, worker
+
+    pending = {}
+    pool, worker = start_pool()
+    args += (worker, allow_ner_pruning)
+    try:
+        while True:
+            if suspects:
+                # Documents from crashed pools are processed one at a time,
+                # so crashes can be attributed to single documents.
+                if not pending:
+                    chunk = suspects.popleft()
+                    pending[pool.submit(process_partition, next(parts), chunk, *args)] = chunk
+            else:
+                while len(pending) < 2 * n_workers:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    pending[pool.submit(process_partition, next(parts), chunk, *args)] = chunk
+            if not pending:
+                break
+            isolated = len(pending) == 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            if any(isinstance(f.exception(), BrokenProcessPool) for f in done):
+                # Other pending partitions of a broken pool fail too.
+                done, _ = wait(pending, return_when=ALL_COMPLETED)
+                pool.shutdown(wait=True)
+                # Only process pools break, so workers are not shared.
+                pool, _ = start_pool()
+            for future in done:
+                chunk = pending.pop(future)
+                try:
+                    partition = future.result()
+                except Exception as exc:    # pylint: disable=broad-except
+                    # Crashes are blamed on documents only if their partitions
+                    # were processed alone, but exceptions always come
+                    # from documents of their own partitions.
+                    crashed = isinstance(exc, BrokenProcessPool)
+                    if len(chunk) > 1 or (crashed and not isolated):
+                        suspects.extend([ item ] for item in chunk)
+                        continue
+                    docid = chunk[0][0]
+                    if manifest.add_failure(docid, repr(exc)) >= max_failures:
+                        manifest.quarantine(docid, repr(exc))
+                    else:
+                        suspects.append(chunk)
+                    continue
+                manifest.add_partition(partition)
+                if progress is not None:
+                    progress.update(partition)
+    finally:
+        pool.shutdown(wait=True)
+    if progress is not None:
+        progress.close()
+    return manifest
+
+
+def merge_outputs(input_dirs, output_dir, single_file=False, partial=False):
+    """Merge outputs of several jobs (for instance shards) into one dataset.
+
+    Only partitions recorded in manifests are merged. By default
+    partition files are copied and renumbered and a merged manifest
+    is written, so the merged dataset has the same layout as outputs
+    of a single job. Rows of merged outputs follow the order of input
+    directories, so aggregates of jobs merged in the same order
+    (see :py:mod:`narcy.jobs`) refer to rows of the merged dataset.
+
+    Parameters
+    ----------
+    input_dirs : iterable of str
+        Output directories of jobs.
+    output_dir : str
+        Output directory of the merged dataset.
+    single_file : bool
+        Should every output be concatenated into a single
+        ``<output_dir>/<output>.<format>`` file instead.
+    partial : bool
+        Should outputs be merged even if some shards are missing
+        (see :py:func:`check_shards`).
+
+    Returns
+    -------
+    Manifest
+        Merged manifest.
+
+    Raises
+    ------
+    ValueError
+        If shards are missing and ``partial=False``, shards disagree
+        on the number of shards or a shard is given more than once.
+    """
+    input_dirs = list(input_dirs)
+    missing = check_shards(input_dirs)
+    if missing and not partial:
+        raise ValueError(f"missing shards: {missing}")
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, 'manifest.jsonl')
+    if os.path.exists(path):
+        os.remove(path)
+    merged = Manifest(path)
+    sources = {}
+    for input_dir in input_dirs:
+        manifest = Manifest(os.path.join(input_dir, 'manifest.jsonl'))
+        for docid, error in manifest.quarantined.items():
+            merged.quarantine(docid, error)
+        for _, partition in sorted(manifest.partitions.items()):
+            paths = {}
+            for name, relpath in partition.paths.items():
+                src = os.path.join(input_dir, relpath)
+                sources.setdefault(name, []).append(src)
+                if not single_file:
+                    fmt = os.path.splitext(relpath)[1][1:]
+                    dst = partition_path(output_dir, name, merged.next_part, fmt)
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    shutil.copyfile(src, dst)
+                    paths[name] = os.path.relpath(dst, output_dir)
+            merged.add_partition(partition._replace(
+                part=merged.next_part, paths=paths
+            ))
+    if single_file:
+        for name, srcs in sources.items():
+            fmt = os.path.splitext(srcs[0])[1][1:]
+            df = pd.concat([ read_frame(p) for p in srcs ], ignore_index=True)
+            write_frame(df, os.path.join(output_dir, f'{name}.{fmt}'), fmt)
+    return merged
@@ -0,0 +1,212 @@
+"""Sparse lemma co-occurrence and document-term matrices.
+
+Matrices are built directly from relations (or relation reducts)
+of documents, without intermediate data frames. Lemmas are interned
+in a growing vocabulary and counts are accumulated as coordinate
+arrays, so partial matrices built in parallel workers can be merged.
+
+Examples
+--------
+>>> counter = RelationCounter(rtypes=('subject-verb', 'verb-object'))
+>>> for doc in docs:                                    # doctest: +SKIP
+...     counter.update(doc)
+>>> X = counter.cooccurrence_matrix()                   # doctest: +SKIP
+>>> D = counter.doc_term_matrix()                       # doctest: +SKIP
+"""
+from array import array
+import numpy as np
+from scipy.sparse import coo_matrix
+from .processors import reduce_relations
+
+
+class Vocabulary:
+    """Growing vocabulary of interned lemmas.
+
+    Attributes
+    ----------
+    index : dict
+        Mapping from lemmas to integer ids.
+    lemmas : list
+        Lemmas ordered by their ids.
+    """
+    def __init__(self, lemmas=()):
+        self.index = {}
+        self.lemmas = []
+        for lemma in lemmas:
+            self.add(lemma)
+
+    def __len__(self):
+        return len(self.lemmas)
+
+    def __contains__(self, lemma):
+        return lemma in self.index
+
+    def __getitem__(self, lemma):
+        return self.index[lemma]
+
+    def add(self, lemma):
+        """Get id of a lemma and add it if it is new."""
+        try:
+            return self.index[lemma]
+        except KeyError:
+            i = self.index[lemma] = len(self.lemmas)
+            self.lemmas.append(lemma)
+            return i
+
+    def merge(self, other):
+        """Add lemmas of other vocabulary.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array mapping ids in the other vocabulary to ids in this one.
+        """
+        return np.array([ self.add(l) for l in other.lemmas ], dtype=np.int64)
+
+
+class RelationCounter:
+    """Counter of lemma relations in a corpus.
+
+    Attributes
+    ----------
+    vocab : Vocabulary
+        Lemma vocabulary. A new one is created if ``None``.
+    rtypes : iterable of str or None
+        Relation types to count. All types are counted if ``None``.
+    tenses : iterable of str or None
+        Relation tenses to count. All tenses are counted if ``None``.
+    modes : iterable of str or None
+        Relation modes to count. All modes are counted if ``None``.
+    reduced : bool
+        Should relation reducts be used.
+    docids : list
+        Ids of counted documents (rows of document-term matrices).
+    """
+    def __init__(self, vocab=None, rtypes=None, tenses=None, modes=None,
+                 reduced=True):
+        self.vocab = Vocabulary() if vocab is None else vocab
+        self.rtypes = None if rtypes is None else frozenset(rtypes)
+        self.tenses = None if tenses is None else frozenset(tenses)
+        self.modes = None if modes is None else frozenset(modes)
+        self.reduced = reduced
+        self.docids = []
+        self._heads = array('q')
+        self._subs = array('q')
+        self._docs = array('q')
+
+    def __len__(self):
+        return len(self._heads)
+
+    def accept(self, relation):
+        """Check if relation passes filters."""
+        if self.rtypes is not None and relation.rtype not in self.rtypes:
+            return False
+        if self.tenses is not None and relation.tense not in self.tenses:
+            return False
+        if self.modes is not None and relation.mode not in self.modes:
+            return False
+        return True
+
+    def update(self, doc):
+        """Count relations of a document.
+
+        Parameters
+        ----------
+        doc : spacy.tokens.Doc
+            Document object.
+        """
+        relations = doc._.relations
+        if self.reduced:
+            relations = reduce_relations(relations)
+        i = len(self.docids)
+        self.docids.append(doc._.id)
+        add = self.vocab.add
+        seen = set()
+        for relation in relations:
+            # Duplicates are skipped as in `narcy.processors.relations_to_df`.
+            head, sub = relation.head, relation.sub
+            key = (relation.rtype, head.start, head.end, sub.start, sub.end)
+            if key in seen or not self.accept(relation):
+                continue
+            seen.add(key)
+            self._heads.append(add(head._.lead._.lemma))
+            self._subs.append(add(sub._.lead._.lemma))
+            self._docs.append(i)
+
+    def merge(self, other):
+        """Merge partial counts of other counter.
+
+        Lemma ids of the other counter are remapped to this vocabulary
+        and its documents are appended after documents of this counter.
+        """
+        if other.vocab is self.vocab:
+            mapping = np.arange(len(self.vocab), dtype=np.int64)
+        else:
+            mapping = self.vocab.merge(other.vocab)
+        offset = len(self.docids)
+        self.docids.extend(other.docids)
+        heads, subs, docs = other.coords()
+        self._heads.extend(mapping[heads].tolist())
+        self._subs.extend(mapping[subs].tolist())
+        self._docs.extend((docs + offset).tolist())
+        return self
+
+    def coords(self):
+        """Get coordinate arrays of heads, subs and documents.
+
+        Arrays are copies, since views would prevent the counter
+        from growing while they are alive.
+        """
+        return (
+            np.frombuffer(self._heads, dtype=np.int64).copy(),
+            np.frombuffer(self._subs, dtype=np.int64).copy(),
+            np.frombuffer(self._docs, dtype=np.int64).copy()
+        )
+
+    def cooccurrence_matrix(self, symmetric=False, dtype=np.int32):
+        """Get lemma co-occurrence matrix.
+
+        Parameters
+        ----------
+        symmetric : bool
+            If ``False``, then rows are heads and columns are subs.
+            Otherwise relation directions are ignored.
+        dtype : numpy.dtype
+            Data type of counts.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            Square matrix with the size of the vocabulary.
+        """
+        heads, subs, _ = self.coords()
+        if symmetric:
+            heads, subs = np.concatenate([heads, subs]), \
+                np.concatenate([subs, heads])
+        n = len(self.vocab)
+        data = np.ones(len(heads), dtype=dtype)
+        return coo_matrix((data, (heads, subs)), shape=(n, n)).tocsr()
+
+    def doc_term_matrix(self, dtype=np.int32):
+        """Get document-term matrix.
+
+        Lemmas are counted once for every relation
+        in which they are a head or a sub.
+
+        Parameters
+        ----------
+        dtype : numpy.dtype
+            Data type of counts.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            Matrix with rows corresponding to :py:attr:`docids`
+            and columns to lemmas in the vocabulary.
+        """
+        heads, subs, docs = self.coords()
+        rows = np.concatenate([docs, docs])
+        cols = np.concatenate([heads, subs])
+        shape = (len(self.docids), len(self.vocab))
+        data = np.ones(len(rows), dtype=dtype)
+        return coo_matrix((data, (rows, cols)), shape=shape).tocsr()
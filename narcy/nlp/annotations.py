@@ -0,0 +1,266 @@
+"""Precomputed annotations stored in ``Doc.user_data``.
+
+Annotations are compact *NumPy* arrays stored under ``('narcy', name)``
+keys of ``doc.user_data``. Extension getters read them when present,
+so documents annotated in a pipeline component (possibly in another
+process) do not recompute anything.
+
+Span-level annotations (tenses and modes, polarity scores,
+drive tokens and lead spans) are stored as sorted arrays of span keys
+(``start * (len(doc) + 1) + end``) and arrays of encoded values.
+
+All annotations are plain *NumPy* arrays, so they survive
+``Doc.to_bytes``, pickling and :py:class:`spacy.tokens.DocBin`
+(with ``store_user_data=True``). ``DocBin`` does not store document
+tensors, so tensors of models without static vectors (from which token
+and span vectors are computed) are stored too (see :py:func:`pack_tensor`).
+"""
+# pylint: disable=E0611
+from contextlib import contextmanager
+import numpy as np
+from spacy.tokens import Span
+from .tenses import PRESENT, PAST, FUTURE, NORMAL, MODAL
+from .rtypes import RTYPES
+
+
+TENSES = (PRESENT, PAST, FUTURE)
+MODES = (NORMAL, MODAL)
+POLARITY = ('neg', 'neu', 'pos', 'compound')
+SPAN_ANNOTATIONS = ('tense', 'polarity', 'drive', 'lead')
+
+_RECORDING = ('narcy', '_recording')
+
+
+def _encode_lead(value, span):
+    if value is span:
+        return (-1, -1)
+    return (value.start, value.end)
+
+def _decode_lead(value, span):
+    start, end = value.tolist()
+    if start < 0:
+        return span
+    return span.doc[start:end]
+
+# Encoders, decoders and dtypes of span annotations.
+_CODECS = {
+    'tense': (
+        lambda v, _: (TENSES.index(v[0]), MODES.index(v[1])),
+        lambda v, _: (TENSES[v[0]], MODES[v[1]]),
+        np.int8
+    ),
+    'polarity': (
+        lambda v, _: tuple(v[k] for k in POLARITY),
+        lambda v, _: dict(zip(POLARITY, v.tolist())),
+        np.float64
+    ),
+    'drive': (
+        lambda v, _: (v.i,),
+        lambda v, span: span.doc[int(v[0])],
+        np.int32
+    ),
+    'lead': (_encode_lead, _decode_lead, np.int32)
+}
+
+
+def get_annotation(doc, name):
+    """Get annotation array (or ``None``) of a document."""
+    return doc.user_data.get(('narcy', name))
+
+def set_annotation(doc, name, value):
+    """Set annotation array of a document."""
+    doc.user_data[('narcy', name)] = value
+
+def span_key(span):
+    """Get integer key of a span."""
+    return span.start * (len(span.doc) + 1) + span.end
+
+def get_span_annotation(span, name):
+    """Get precomputed span annotation.
+
+    Parameters
+    ----------
+    span : spacy.tokens.Span
+        Span object.
+    name : str
+        Annotation name (see :py:data:`SPAN_ANNOTATIONS`).
+
+    Returns
+    -------
+    object
+        Decoded value or ``None`` if it is not available.
+    """
+    store = get_annotation(span.doc, name)
+    if store is None:
+        return None
+    keys = store['keys']
+    key = span_key(span)
+    i = np.searchsorted(keys, key)
+    if i < len(keys) and keys[i] == key:
+        decode = _CODECS[name][1]
+        return decode(store['values'][i], span)
+    return None
+
+def span_annotation(span, name, func):
+    """Get precomputed span annotation or compute it.
+
+    Computed values are recorded if the document is being annotated
+    (see :py:func:`recording`).
+
+    Parameters
+    ----------
+    span : spacy.tokens.Span
+        Span object.
+    name : str
+        Annotation name (see :py:data:`SPAN_ANNOTATIONS`).
+    func : callable
+        Function computing annotation value from a span.
+    """
+    value = get_span_annotation(span, name)
+    if value is None:
+        value = func(span)
+        recorded = span.doc.user_data.get(_RECORDING)
+        if recorded is not None:
+            encode = _CODECS[name][0]
+            recorded[name][span.start, span.end] = encode(value, span)
+    return value
+
+def _pack_span_annotation(doc, name, values):
+    dtype = _CODECS[name][2]
+    items = sorted(values.items())
+    n = len(doc) + 1
+    arr = np.array([ v for _, v in items ], dtype=dtype)
+    return {
+        'keys': np.array([ s*n + e for (s, e), _ in items ], dtype=np.int64),
+        'values': arr.reshape(len(items), -1) if items else arr.reshape(0, 0)
+    }
+
+@contextmanager
+def recording(doc):
+    """Record span annotations computed within a context.
+
+    Recorded values are packed into arrays and stored
+    in ``doc.user_data`` when the context exits.
+    """
+    recorded = { name: {} for name in SPAN_ANNOTATIONS }
+    doc.user_data[_RECORDING] = recorded
+    try:
+        yield recorded
+    finally:
+        del doc.user_data[_RECORDING]
+    for name, values in recorded.items():
+        store = get_annotation(doc, name)
+        if store is not None:
+            n = len(doc) + 1
+            for key, value in zip(store['keys'], store['values']):
+                values.setdefault(divmod(int(key), n), tuple(value.tolist()))
+        set_annotation(doc, name, _pack_span_annotation(doc, name, values))
+
+def pack_compounds(doc, compounds):
+    """Pack compounds of all tokens into arrays.
+
+    Parameters
+    ----------
+    doc : spacy.tokens.Doc
+        Document object.
+    compounds : iterable
+        Compound spans (or ``None``) of all tokens.
+    """
+    spans = np.full((len(doc), 2), -1, dtype=np.int32)
+    labels = np.zeros(len(doc), dtype=np.uint64)
+    for i, compound in enumerate(compounds):
+        if compound is not None:
+            spans[i] = compound.start, compound.end
+            labels[i] = compound.label
+    return { 'spans': spans, 'labels': labels }
+
+def pack_tensor(doc):
+    """Get document tensor if token vectors are computed from it.
+
+    Returns
+    -------
+    numpy.ndarray or None
+        Tensor or ``None`` if the model has static vectors
+        or the document has no tensor.
+    """
+    if doc.vocab.vectors.size or not doc.tensor.size:
+        return None
+    return np.asarray(doc.tensor)
+
+def restore_tensor(doc):
+    """Restore stored tensor of a document loaded without it.
+
+    Returns
+    -------
+    spacy.tokens.Doc
+        The same document.
+    """
+    tensor = get_annotation(doc, 'tensor')
+    if tensor is not None and not doc.tensor.size and len(tensor) == len(doc):
+        doc.tensor = tensor
+    return doc
+
+def get_compound(token, compounds):
+    """Get precomputed compound of a token.
+
+    Parameters
+    ----------
+    token : spacy.tokens.Token
+        Token object.
+    compounds : dict
+        Compounds arrays (see :py:func:`pack_compounds`).
+    """
+    start, end = compounds['spans'][token.i].tolist()
+    if start < 0:
+        return None
+    label = int(compounds['labels'][token.i])
+    return Span(token.doc, start, end, label=label)
+
+def pack_relations(doc):
+    """Pack relations of all sentences into edge list arrays.
+
+    Edges are ``(sentence start, head start, head end,
+    sub start, sub end, rtype code)`` and labels are entity labels
+    of heads and subs.
+    """
+    edges = []
+    labels = []
+    for sent in doc.sents:
+        for r in sent._.relations:
+            edges.append((sent.start, r.head.start, r.head.end,
+                          r.sub.start, r.sub.end, RTYPES.index(r.rtype)))
+            labels.append((r.head.label, r.sub.label))
+    return {
+        'edges': np.array(edges, dtype=np.int32).reshape(len(edges), 6),
+        'labels': np.array(labels, dtype=np.uint64).reshape(len(labels), 2)
+    }
+
+def iter_relations(sent, relations, factory, rtypes=None):
+    """Iterate over precomputed relations in a sentence.
+
+    Parameters
+    ----------
+    sent : spacy.tokens.Span
+        Sentence.
+    relations : dict
+        Relations arrays (see :py:func:`pack_relations`).
+    factory : callable
+        Called with ``rtype``, ``head`` and ``sub`` keyword arguments
+        (e.g. :py:class:`narcy.nlp.utils.Relation`).
+    rtypes : iterable of str or None
+        Relation types to iterate over. All types if ``None``.
+        Other relations are skipped before creating any spans.
+    """
+    doc = sent.doc
+    edges = relations['edges']
+    labels = relations['labels']
+    i, j = np.searchsorted(edges[:, 0], [sent.start, sent.start + 1])
+    edges, labels = edges[i:j], labels[i:j]
+    if rtypes is not None:
+        mask = np.isin(edges[:, 5], [ RTYPES.index(r) for r in rtypes ])
+        edges, labels = edges[mask], labels[mask]
+    rows = zip(edges.tolist(), labels.tolist())
+    for (_, hs, he, ss, se, rtype), (hl, sl) in rows:
+        head = Span(doc, hs, he, label=hl)
+        sub = Span(doc, ss, se, label=sl)
+        yield factory(rtype=RTYPES[rtype], head=head, sub=sub)
@@ -0,0 +1,210 @@
+"""Table-driven classification of relation types.
+
+Every token is described by a small bitmask computed once per document
+from its POS, DEP and TAG. Relation types are then resolved from
+a lookup table indexed by masks of the head and sub drives.
+Flags mirror the corresponding token extension predicates
+(e.g. ``Token._.is_verb``).
+"""
+# pylint: disable=E0611
+from spacy.symbols import NOUN, PROPN, VERB, ADP, ADJ, ADV
+
+
+NOUN_FLAG = 1 << 0
+SUBJ_DEP_FLAG = 1 << 1
+VERB_FLAG = 1 << 2
+COMP_DEP_FLAG = 1 << 3
+ADJ_VERB_FLAG = 1 << 4
+OBJ_DEP_FLAG = 1 << 5
+ADP_FLAG = 1 << 6
+IN_COMPOUND_NOUN_FLAG = 1 << 7
+DESCRIPTION_FLAG = 1 << 8
+
+RTYPES = (
+    'verb-verb', 'subject-verb', 'complement-verb', 'verb-object',
+    'verb-complement', 'left_adposition', 'right_adposition',
+    'compound', 'noun-noun', 'description', 'misc'
+)
+
+_NOUN = (NOUN, PROPN)
+_DESCRIPTION = (ADJ, ADV)
+_SUBJ = ('nsubj', 'nsubjpass', 'csubj')
+_NONVERB_DEP = ('acl', 'acomp', 'amod', 'advmod')
+_ADJECTIVAL = ('acl', 'amod')
+_OBJ = ('obj', 'pobj', 'dobj')
+_COMPOUND = ('compound',)
+_COMPLEMENT = ('acomp',)
+_TAGS_PART = ('VBN', 'VBD', 'VBG')
+
+_TABLE = {}
+
+
+def token_mask(token, has_compound_child=False):
+    """Get token bitmask.
+
+    Parameters
+    ----------
+    token : spacy.tokens.Token
+        Token object.
+    has_compound_child : bool
+        Does the token have a compound dependent.
+    """
+    pos = token.pos
+    dep = token.dep_
+    mask = 0
+    is_adj_verb = dep in _ADJECTIVAL and token.tag_ in _TAGS_PART
+    if pos in _NOUN:
+        mask |= NOUN_FLAG
+    if dep in _SUBJ:
+        mask |= SUBJ_DEP_FLAG
+    if pos == VERB and dep not in _NONVERB_DEP \
+    and dep not in _SUBJ and not is_adj_verb:
+        mask |= VERB_FLAG
+    if dep in _COMPLEMENT:
+        mask |= COMP_DEP_FLAG
+    if is_adj_verb:
+        mask |= ADJ_VERB_FLAG
+    if dep in _OBJ:
+        mask |= OBJ_DEP_FLAG
+    if pos == ADP:
+        mask |= ADP_FLAG
+    if dep in _COMPOUND or has_compound_child:
+        mask |= IN_COMPOUND_NOUN_FLAG
+    if pos in _DESCRIPTION or is_adj_verb:
+        mask |= DESCRIPTION_FLAG
+    return mask
+
+def get_token_masks(doc):
+    """Get bitmasks of all tokens in a document.
+
+    Masks are computed once and cached in ``doc.user_data``.
+
+    Parameters
+    ----------
+    doc : spacy.tokens.Doc
+        Document object.
+    """
+    key = ('narcy', 'rmasks')
+    try:
+        return doc.user_data[key]
+    except KeyError:
+        pass
+    has_compound_child = [ False ] * len(doc)
+    for token in doc:
+        if token.dep_ in _COMPOUND and token.head.i != token.i:
+            has_compound_child[token.head.i] = True
+    masks = [ token_mask(t, c) for t, c in zip(doc, has_compound_child) ]
+    doc.user_data[key] = masks
+    return masks
+
+def get_subject_verb_counts(doc):
+    """Get prefix counts of tokens which may drive subject-verb relations.
+
+    Counts are computed once and cached in ``doc.user_data``.
+
+    Parameters
+    ----------
+    doc : spacy.tokens.Doc
+        Document object.
+
+    Returns
+    -------
+    verbs : list of int
+        Numbers of tokens with the verb flag before every position.
+    subjects : list of int
+        Numbers of tokens with the noun or the subject flag
+        before every position.
+    """
+    key = ('narcy', 'svcounts')
+    try:
+        return doc.user_data[key]
+    except KeyError:
+        pass
+    verbs = [ 0 ]
+    subjects = [ 0 ]
+    for mask in get_token_masks(doc):
+        verbs.append(verbs[-1] + bool(mask & VERB_FLAG))
+        subjects.append(subjects[-1] + bool(mask & (NOUN_FLAG | SUBJ_DEP_FLAG)))
+    counts = doc.user_data[key] = (verbs, subjects)
+    return counts
+
+def maybe_subject_verb(counts, head, sub):
+    """Check if a pair of spans may form a subject-verb relation.
+
+    Drives of spans are some of their tokens, so a subject-verb relation
+    is possible only if one span contains a verb and the other one
+    contains a noun or a subject. The check does not resolve drives.
+
+    Parameters
+    ----------
+    counts : tuple
+        Prefix counts (see :py:func:`get_subject_verb_counts`).
+    head : spacy.tokens.Span
+        Head span.
+    sub : spacy.tokens.Span
+        Sub span.
+    """
+    verbs, subjects = counts
+    hs, he, ss, se = head.start, head.end, sub.start, sub.end
+    return (verbs[he] > verbs[hs] and subjects[se] > subjects[ss]) \
+        or (verbs[se] > verbs[ss] and subjects[he] > subjects[hs])
+
+def _classify(hmask, smask, same_compound):
+    if hmask & VERB_FLAG and smask & VERB_FLAG:
+        return 'verb-verb'
+    if hmask & (NOUN_FLAG | SUBJ_DEP_FLAG) and smask & VERB_FLAG:
+        return 'subject-verb'
+    if hmask & COMP_DEP_FLAG and smask & VERB_FLAG:
+        return 'complement-verb'
+    if hmask & (VERB_FLAG | ADJ_VERB_FLAG) \
+    and smask & (NOUN_FLAG | OBJ_DEP_FLAG):
+        return 'verb-object'
+    if hmask & VERB_FLAG and smask & COMP_DEP_FLAG:
+        return 'verb-complement'
+    if hmask & ADP_FLAG:
+        return 'left_adposition'
+    if smask & ADP_FLAG:
+        return 'right_adposition'
+    if hmask & IN_COMPOUND_NOUN_FLAG and same_compound:
+        return 'compound'
+    if hmask & NOUN_FLAG and smask & NOUN_FLAG:
+        return 'noun-noun'
+    if smask & DESCRIPTION_FLAG:
+        return 'description'
+    return 'misc'
+
+def lookup_rtype(hmask, smask):
+    """Look up relation type for a pair of drive masks.
+
+    Parameters
+    ----------
+    hmask : int
+        Mask of the head drive.
+    smask : int
+        Mask of the sub drive.
+
+    Returns
+    -------
+    swap : bool
+        Should head and sub be swapped.
+    rtype : str
+        Relation type.
+    compound_rtype : str
+        Relation type if head and sub drives belong
+        to the same compound token.
+    """
+    key = (hmask, smask)
+    try:
+        return _TABLE[key]
+    except KeyError:
+        pass
+    swap = bool(smask & SUBJ_DEP_FLAG) \
+        and bool(smask & NOUN_FLAG or hmask & VERB_FLAG)
+    if swap:
+        hmask, smask = smask, hmask
+    entry = _TABLE[key] = (
+        swap,
+        _classify(hmask, smask, False),
+        _classify(hmask, smask, True)
+    )
+    return entry
@@ -7,6 +7,7 @@ from . import getters
 from ..utils import make_hash
 
 Doc.set_extension('_id', default=None)
+Doc.set_extension('_key', default=None)
 Doc.set_extension('_polarity', default=None)
 Span.set_extension('_polarity', default=None)
 
@@ -8,10 +8,17 @@ from spacy.symbols import ADV, ADJ, ADP
 from spacy.symbols import SPACE, PUNCT
 import nltk
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from ..utils import get_compound_verb, get_compound_noun, get_entity_from_span
-from ..utils import get_relation, detect_tense, make_hash
+from ..utils import get_compound_verb, get_compound_noun, get_entity
+from ..utils import Relation, get_relation, detect_tense, make_hash
+from ..utils import make_key, get_subtrees, get_entity_index
 from ..tenses import PRESENT, NORMAL
+from ..rtypes import get_subject_verb_counts, maybe_subject_verb
+from ..annotations import get_annotation, span_annotation
+from ..annotations import get_compound, iter_relations
+from ...profiling import profiled
 
+# The analyzer keeps no state between calls and polarity scores are memoized
+# on documents, so it is shared by threads processing different documents.
 try:
     vader = SentimentIntensityAnalyzer()
 except LookupError:
@@ -110,10 +117,14 @@ def is_desc_verb_t_g(token):
         previous_token = None
     return token._.is_clause_verb and previous_token and previous_token._.is_auxpart
 
+@profiled
 def compound_t_g(token):
-    compound = token.sent[token._.si:token._.si+1]
-    if compound._.is_ent:
-        return get_entity_from_span(compound)
+    compounds = get_annotation(token.doc, 'compounds')
+    if compounds is not None:
+        return get_compound(token, compounds)
+    if get_entity_index(token.doc)['start'][token.i] >= 0:
+        return get_entity(token)
+    compound = None
     if token._.is_verblike:
         compound = get_compound_verb(token)
         if compound:
@@ -133,6 +144,7 @@ def conjuncts_t_g(token):
 def si_t_g(token):
     return token.i - token.sent.start
 
+@profiled
 def relations_t_g(token):
     token_c = token._.compound
     if not token._.is_verblike and token._.is_drive and token_c._.is_compound:
@@ -157,10 +169,67 @@ def relations_t_g(token):
             yield get_relation(token_c, child_c)
         yield from child._.relations
 
+def _subject_verb(counts, head, sub):
+    if maybe_subject_verb(counts, head, sub):
+        relation = get_relation(head, sub)
+        if relation.rtype == 'subject-verb':
+            return relation
+    return None
+
+def _iter_subject_verbs(token, compound, counts):
+    # Mirrors `relations_t_g` (so relations come in the same order),
+    # but pairs which cannot be subject-verb relations are skipped
+    # before resolving drives and relation types
+    # and compounds are computed only once for every token.
+    token_c = compound(token)
+    if not token._.is_verblike and token._.is_drive and token_c._.is_compound:
+        for t1, t2 in product(token_c, token_c):
+            if t1 == t2 or not t1._.is_wordlike or not t2._.is_wordlike:
+                continue
+            sent = token.sent
+            i = t1.i - sent.start
+            j = t2.i - sent.start
+            relation = _subject_verb(counts, sent[i:i+1], sent[j:j+1])
+            if relation:
+                yield relation
+    for child in token.children:
+        if not child._.is_wordlike:
+            continue
+        child_c = compound(child)
+        if not child._.is_conj_dep:
+            for conjunct in child._.conjuncts:
+                relation = _subject_verb(counts, token_c, compound(conjunct))
+                if relation:
+                    yield relation
+                for conj_child in conjunct.children:
+                    if conj_child._.is_obj_dep:
+                        relation = _subject_verb(
+                            counts, child_c, compound(conj_child)
+                        )
+                        if relation:
+                            yield relation
+        if token_c != child_c and not child._.is_conj_dep:
+            relation = _subject_verb(counts, token_c, child_c)
+            if relation:
+                yield relation
+        yield from _iter_subject_verbs(child, compound, counts)
+
 def subterms_t_g(token):
-    for st in token.subtree:
-        if st._.is_term and st not in token._.compound:
-            yield st._.compound
+    subtrees = get_subtrees(token.doc)
+    compound = token._.compound
+    if not subtrees['contiguous'][token.i]:
+        for st in token.subtree:
+            if st._.is_term and st not in compound:
+                yield st._.compound
+        return
+    terms = subtrees['terms']
+    left = subtrees['left'][token.i]
+    right = subtrees['right'][token.i]
+    i, j = terms.searchsorted([left, right + 1])
+    doc = token.doc
+    for k in terms[i:j].tolist():
+        if not compound.start <= k < compound.end:
+            yield doc[k]._.compound
 
 def lemma_t_g(token):
     if token._.is_verb:
@@ -209,7 +278,11 @@ def nouns_s_g(span):
         if token._.is_noun and token._.is_drive:
             yield token._.compound
 
+@profiled
 def tense_s_g(span):
+    return span_annotation(span, 'tense', _get_tense)
+
+def _get_tense(span):
     if span.root._.is_verb:
         if span.root._.is_desc_verb or span.root._.is_conj_dep:
             return span.root.head._.compound._.tense
@@ -243,12 +316,16 @@ def is_compound_s_g(span):
     return len(span) > 1
 
 def is_ent_s_g(span):
-    return any(t.ent_iob_ in _ENT for t in span)
+    starts = get_entity_index(span.doc)['start']
+    return bool((starts[span.start:span.end] >= 0).any())
 
 def is_neg_s_g(span):
     return any(t._.is_neg_dep for t in span)
 
 def drive_s_g(span):
+    return span_annotation(span, 'drive', _get_drive)
+
+def _get_drive(span):
     if span.root._.is_verb:
         for token in reversed(span):
             if token._.is_verb:
@@ -256,6 +333,9 @@ def drive_s_g(span):
     return span.root
 
 def lead_s_g(span):
+    return span_annotation(span, 'lead', _get_lead)
+
+def _get_lead(span):
     drive = span._.drive
     if drive._.is_verb:
         try:
@@ -285,22 +365,55 @@ def lead_lemma_s_g(span):
     return lemma
 
 def relations_s_g(span):
+    relations = get_annotation(span.doc, 'relations')
+    if relations is not None:
+        sent = span.sent
+        if span.start == sent.start and span.end == sent.end:
+            yield from iter_relations(span, relations, Relation)
+            return
     root = span._.root
     if not root:
         return
     yield from root._.relations
 
+def subject_verbs_s_g(span):
+    relations = get_annotation(span.doc, 'relations')
+    if relations is not None:
+        sent = span.sent
+        if span.start == sent.start and span.end == sent.end:
+            yield from iter_relations(span, relations, Relation,
+                                      rtypes=('subject-verb',))
+            return
+    counts = get_subject_verb_counts(span.doc)
+    if not maybe_subject_verb(counts, span, span):
+        return
+    root = span._.root
+    if not root:
+        return
+    compounds = {}
+    def compound(token):
+        try:
+            return compounds[token.i]
+        except KeyError:
+            value = compounds[token.i] = token._.compound
+            return value
+    yield from _iter_subject_verbs(root, compound, counts)
+
 def id_s_g(span):
     return span.doc._.id+'__'+str(span.start)+'__'+str(span.end)
 
 def lang_s_g(span):
     return span.doc.vocab.lang
 
+@profiled
 def polarity_s_g(span):
+    return span_annotation(span, 'polarity', _get_polarity)
+
+def _get_polarity(span):
     _polarity = span._._polarity
     if not _polarity:
         _polarity = vader.polarity_scores(span.text)
-        span._.set('polarity', _polarity)
+        span._.set('_polarity', _polarity)
     return _polarity
 
 def valence_s_g(span):
@@ -332,20 +445,31 @@ def lemma_s_g(span):
 
 def id_d_g(doc):
     _id = doc._._id
-    if not _id:
+    if _id is None:
         _id = make_hash(doc.text)
-        doc._.set('id', _id)
+        doc._.set('_id', _id)
     return _id
 
+def key_d_g(doc):
+    _key = doc._._key
+    if _key is None:
+        _key = make_key(doc._.id)
+        doc._.set('_key', _key)
+    return _key
+
 def relations_d_g(doc):
     for sent in doc.sents:
         yield from sent._.relations
 
+def subject_verbs_d_g(doc):
+    for sent in doc.sents:
+        yield from sent._.subject_verbs
+
 def polarity_d_g(doc):
     _polarity = doc._._polarity
     if not _polarity:
         _polarity = vader.polarity_scores(doc.text)
-        doc._.set('polarity', _polarity)
+        doc._.set('_polarity', _polarity)
     return _polarity
 
 def valence_d_g(doc):
@@ -2,16 +2,152 @@
 # pylint: disable=E0611
 # pylint: disable=R0911,R0912,R0914
 # pylint: disable=inconsistent-return-statements
-from collections import namedtuple
+from itertools import zip_longest
 import unicodedata
 import hashlib
+import numpy as np
+from spacy.tokens import Span
 from .en.tenses import detect_tense as detect_tense_en
 from .tenses import PRESENT, NORMAL
+from .rtypes import VERB_FLAG, get_token_masks, lookup_rtype
 
 
-Relation = namedtuple('Relation', [
-    'tense', 'mode', 'rel', 'rtype', 'head', 'sub'
-])
+HASH_NAME = 'blake2b'
+
+_MISSING = object()
+
+
+class Relation:
+    """Dependency relation.
+
+    Relations behave like named tuples of
+    ``(tense, mode, rel, rtype, head, sub)`` (unpacking, indexing, equality,
+    hashing, :py:attr:`_fields`, :py:meth:`_asdict` and :py:meth:`_replace`).
+    Fields which are ``None`` are resolved lazily, so relations created
+    by :py:func:`get_relation` compute only their types and relations
+    that are filtered out cost almost nothing.
+
+    Attributes
+    ----------
+    tense : str
+        Relation tense.
+    mode : str
+        Relation mode.
+    rel : str
+        Relation string (``HEAD_POS.HEAD_DEP=>SUB_POS.SUB_DEP``).
+    rtype : str
+        Relation type.
+    head : spacy.tokens.Span
+        Head in the compound form.
+    sub : spacy.tokens.Span
+        Sub in the compound form.
+    """
+    _fields = ('tense', 'mode', 'rel', 'rtype', 'head', 'sub')
+    __slots__ = ('_tense', '_rel', 'rtype', 'head', 'sub')
+
+    def __init__(self, tense=None, mode=None, rel=None, rtype=None,
+                 head=None, sub=None):
+        self._tense = None if tense is None and mode is None else (tense, mode)
+        self._rel = rel
+        self.rtype = rtype
+        self.head = head
+        self.sub = sub
+
+    @classmethod
+    def _make(cls, iterable):
+        return cls(*iterable)
+
+    def _asdict(self):
+        return dict(zip(self._fields, self))
+
+    def _replace(self, **kwds):
+        unknown = set(kwds).difference(self._fields)
+        if unknown:
+            raise ValueError(f"Got unexpected field names: {sorted(unknown)}")
+        return self.__class__(**{ **self._asdict(), **kwds })
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self)[index]
+        return getattr(self, self._fields[index])
+
+    def __eq__(self, other):
+        if isinstance(other, (Relation, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __reduce__(self):
+        return (self.__class__, tuple(self))
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={value!r}" for name, value
+                           in zip(self._fields, self))
+        return f"{self.__class__.__name__}({fields})"
+
+    def _get_tense(self):
+        if self._tense is None:
+            masks = get_token_masks(self.head.doc)
+            if masks[self.head.root.i] & VERB_FLAG \
+            or not masks[self.sub.root.i] & VERB_FLAG:
+                self._tense = self.head._.tense
+            else:
+                self._tense = self.sub._.tense
+        return self._tense
+
+    @property
+    def tense(self):
+        """Relation tense."""
+        return self._get_tense()[0]
+
+    @property
+    def mode(self):
+        """Relation mode."""
+        return self._get_tense()[1]
+
+    @property
+    def rel(self):
+        """Relation string (``HEAD_POS.HEAD_DEP=>SUB_POS.SUB_DEP``)."""
+        if self._rel is None:
+            hroot = self.head.root
+            sroot = self.sub.root
+            self._rel = f"{hroot.pos_}.{hroot.dep_}=>{sroot.pos_}.{sroot.dep_}"
+        return self._rel
+
+    @property
+    def head_pos(self):
+        """POS id of the head root."""
+        return self.head.root.pos
+
+    @property
+    def head_dep(self):
+        """DEP id of the head root."""
+        return self.head.root.dep
+
+    @property
+    def sub_pos(self):
+        """POS id of the sub root."""
+        return self.sub.root.pos
+
+    @property
+    def sub_dep(self):
+        """DEP id of the sub root."""
+        return self.sub.root.dep
+
+    @property
+    def span(self):
+        """Span covering both head and sub."""
+        head = self.head
+        sub = self.sub
+        return head.doc[min(head.start, sub.start):max(head.end, sub.end)]
 
 
 def get_relation(head, sub):
@@ -77,47 +213,16 @@ def get_relation(head, sub):
         They can be safely ignored in most cases.
     """
 
-    def _get_rtype(head, sub):
-        ht = head._.drive
-        st = sub._.drive
-        if (st._.is_noun and st._.is_subj_dep) \
-        or (ht._.is_verb and st._.is_subj_dep):
-            head, sub = sub, head
-            ht, st = st, ht
-        if ht._.is_verb and st._.is_verb:
-            rtype = 'verb-verb'
-        elif (ht._.is_noun or ht._.is_subj_dep) and st._.is_verb:
-            rtype = 'subject-verb'
-        elif ht._.is_comp_dep and st._.is_verb:
-            rtype = 'complement-verb'
-        elif (ht._.is_verb or ht._.is_adj_verb) \
-        and (st._.is_noun or st._.is_obj_dep):
-            rtype = 'verb-object'
-        elif ht._.is_verb and st._.is_comp_dep:
-            rtype = 'verb-complement'
-        elif ht._.is_adp:
-            rtype = 'left_adposition'
-        elif st._.is_adp:
-            rtype = 'right_adposition'
-        elif ht._.is_in_compound_noun and ht._.compound == st._.compound:
-            rtype = 'compound'
-        elif ht._.is_noun and st._.is_noun:
-            rtype = 'noun-noun'
-        elif st._.is_description:
-            rtype = 'description'
-        else:
-            rtype = 'misc'
-        return head, sub, rtype
-
-    head, sub, rtype = _get_rtype(head, sub)
-    hpos, hdep = head.root.pos_, head.root.dep_
-    spos, sdep = sub.root.pos_, sub.root.dep_
-    rel = f"{hpos}.{hdep}=>{spos}.{sdep}"
-    if head.root._.is_verb or not sub.root._.is_verb:
-        tense, mode = head._.tense
-    else:
-        tense, mode = sub._.tense
-    return Relation(tense, mode, rel, rtype, head, sub)
+    hd = head._.drive
+    sd = sub._.drive
+    masks = get_token_masks(hd.doc)
+    swap, rtype, compound_rtype = lookup_rtype(masks[hd.i], masks[sd.i])
+    if swap:
+        head, sub = sub, head
+        hd, sd = sd, hd
+    if rtype != compound_rtype and hd._.compound == sd._.compound:
+        rtype = compound_rtype
+    return Relation(rtype=rtype, head=head, sub=sub)
 
 def get_compound_verb(token):
     """Get compound verb from a verb token."""
@@ -167,36 +272,118 @@ def get_compound_noun(token):
         start += 1
     return token.sent[start:end]
 
-def get_entity_from_span(span):
-    """Get entity from a span by shrinking and/or expanding."""
+def get_entity_index(doc):
+    """Get index of entities of all tokens in a document.
+
+    The index is built once from ``doc.ents`` and cached
+    in ``doc.user_data``.
+
+    Parameters
+    ----------
+    doc : spacy.tokens.Doc
+        Document object.
+
+    Returns
+    -------
+    dict
+        Per-token arrays of ``start`` and ``end`` positions
+        (``-1`` for tokens outside entities), ``label`` and ``kb_id``
+        hashes of entities.
+    """
+    key = ('narcy', 'ents')
     try:
-        start_token = next(t for t in span if t._.is_ent)
-    except StopIteration:
+        return doc.user_data[key]
+    except KeyError:
+        pass
+    starts = np.full(len(doc), -1, dtype=np.int32)
+    ends = np.full(len(doc), -1, dtype=np.int32)
+    labels = np.zeros(len(doc), dtype=np.uint64)
+    kb_ids = np.zeros(len(doc), dtype=np.uint64)
+    for ent in doc.ents:
+        starts[ent.start:ent.end] = ent.start
+        ends[ent.start:ent.end] = ent.end
+        labels[ent.start:ent.end] = ent.label
+        kb_ids[ent.start:ent.end] = ent.kb_id
+    index = { 'start': starts, 'end': ends, 'label': labels, 'kb_id': kb_ids }
+    doc.user_data[key] = index
+    return index
+
+def get_entity(token):
+    """Get entity of a token or ``None``.
+
+    Entities crossing sentence boundaries are ignored.
+    """
+    index = get_entity_index(token.doc)
+    i = token.i
+    start = int(index['start'][i])
+    if start < 0:
         return None
-    start = start_token.i
-    end = start_token.i
-    token = start_token
-    if start_token.ent_iob_ in ('B', 'I'):
-        try:
-            token = start_token.nbor(1)
-        except IndexError:
-            token = start_token
-        while token.ent_iob_ == 'I':
-            end = token.i
-            try:
-                token = token.nbor(1)
-            except IndexError:
-                break
-    if start_token.ent_iob_ == 'I':
-        token = start_token
+    end = int(index['end'][i])
+    sent = token.sent
+    if start < sent.start or end > sent.end:
+        return None
+    return Span(token.doc, start, end,
+                label=int(index['label'][i]), kb_id=int(index['kb_id'][i]))
+
+def get_entity_from_span(span):
+    """Get entity of the first entity token in a span."""
+    index = get_entity_index(span.doc)
+    for i in range(span.start, span.end):
+        if index['start'][i] >= 0:
+            return get_entity(span.doc[i])
+    return None
+
+def get_subtrees(doc):
+    """Get subtree intervals and term positions of a document.
+
+    Subtrees of tokens in projective parts of parse trees are
+    contiguous intervals from ``left_edge`` to ``right_edge``
+    and are iterated in document order.
+    Intervals and positions of term tokens are computed once
+    and cached in ``doc.user_data``.
+
+    Parameters
+    ----------
+    doc : spacy.tokens.Doc
+        Document object.
+
+    Returns
+    -------
+    dict
+        ``left`` and ``right`` edges (inclusive), ``contiguous`` flags
+        of subtrees with no gaps (also in nested subtrees) and sorted ``terms`` positions.
+    """
+    key = ('narcy', 'subtrees')
+    try:
+        return doc.user_data[key]
+    except KeyError:
+        pass
+    n = len(doc)
+    heads = np.array([ t.head.i for t in doc ], dtype=np.int64)
+    left = np.array([ t.left_edge.i for t in doc ], dtype=np.int64)
+    right = np.array([ t.right_edge.i for t in doc ], dtype=np.int64)
+    # Subtree sizes are counted by walking all tokens up to their roots
+    # at once, so there are as many steps as levels of the deepest tree.
+    def count(values):
+        counts = values.copy()
+        current = np.arange(n)
         while True:
-            token = token.nbor(-1)
-            if token.ent_iob_ == 'B':
-                start = token.i
-                break
-    for ent in span.sent.ents:
-        if ent.start == start and ent.end == end + 1:
-            return ent
+            parents = heads[current]
+            active = parents != current
+            if not active.any():
+                return counts
+            current = np.where(active, parents, current)
+            np.add.at(counts, current[active], values[active])
+    sizes = count(np.ones(n, dtype=np.int64))
+    gaps = count((sizes != right - left + 1).astype(np.int64))
+    subtrees = {
+        'left': left,
+        'right': right,
+        'contiguous': gaps == 0,
+        'terms': np.array([ t.i for t in doc if t._.is_term ], dtype=np.int64)
+    }
+    doc.user_data[key] = subtrees
+    return subtrees
 
 def detect_tense(verb):
     """Detect tense of a verb."""
@@ -204,27 +391,103 @@ def detect_tense(verb):
         return detect_tense_en(verb)
     return PRESENT, NORMAL
 
-def make_hash(*args):
-    md5 = hashlib.md5()
-    string = '___'.join(map(str, args))
-    md5.update(string.encode())
-    return md5.hexdigest()
+def make_hash(*args, hash_name=HASH_NAME):
+    """Make hex digest of string representations of arguments.
+
+    Parameters
+    ----------
+    *args :
+        Values to hash.
+    hash_name : str
+        Name of a :py:mod:`hashlib` algorithm.
+        ``blake2b`` digests are 16 bytes long.
+    """
+    string = '___'.join(map(str, args)).encode()
+    if hash_name == 'blake2b':
+        return hashlib.blake2b(string, digest_size=16).hexdigest()
+    return hashlib.new(hash_name, string).hexdigest()
+
+def make_key(string):
+    """Make signed 64-bit integer key from a string."""
+    digest = hashlib.blake2b(string.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
 
-def document_factory(nlp):
+def set_doc_id(doc, docid=None, hash_name=HASH_NAME):
+    """Set document id.
+
+    Parameters
+    ----------
+    doc : spacy.tokens.Doc
+        Document object.
+    docid : str or None
+        External document id.
+        If ``None``, then id is a hash of the document text.
+    hash_name : str
+        Name of a :py:mod:`hashlib` algorithm.
+    """
+    if docid is None:
+        docid = make_hash(doc.text, hash_name=hash_name)
+    doc._.set('_id', docid)
+    return doc
+
+def document_factory(nlp, hash_name=HASH_NAME):
     """Make document with normalized text.
 
     Parameters
     ----------
     nlp : spacy.lang
         Language object.
+    hash_name : str
+        Name of a :py:mod:`hashlib` algorithm used for document ids.
     text : str
         Document text.
     normalize_unicode : bool
         Should string be unicode-normalized.
+    docid : str or None
+        External document id.
+        If ``None``, then id is a hash of the document text.
     """
-    def make_doc(text, normalize_unicode=True):
+    def make_doc(text, normalize_unicode=True, docid=None):
         if normalize_unicode:
             text = unicodedata.normalize('NFC', text)
         doc = nlp(text)
-        return doc
+        return set_doc_id(doc, docid, hash_name=hash_name)
     return make_doc
+
+def pipe_factory(nlp, hash_name=HASH_NAME):
+    """Make documents with normalized texts in batches.
+
+    Parameters
+    ----------
+    nlp : spacy.lang
+        Language object.
+    hash_name : str
+        Name of a :py:mod:`hashlib` algorithm used for document ids.
+    texts : iterable of str
+        Document texts.
+    ids : iterable of str or None
+        External document ids.
+        If ``None``, then ids are hashes of document texts.
+    normalize_unicode : bool
+        Should strings be unicode-normalized.
+    **kwds :
+        Passed to :py:meth:`spacy.language.Language.pipe`.
+
+    Raises
+    ------
+    ValueError
+        If numbers of texts and ids differ.
+    """
+    def make_docs(texts, ids=None, normalize_unicode=True, **kwds):
+        if normalize_unicode:
+            texts = (unicodedata.normalize('NFC', t) for t in texts)
+        docs = nlp.pipe(texts, **kwds)
+        if ids is None:
+            for doc in docs:
+                yield set_doc_id(doc, hash_name=hash_name)
+            return
+        for doc, docid in zip_longest(docs, ids, fillvalue=_MISSING):
+            if doc is _MISSING or docid is _MISSING:
+                raise ValueError("numbers of texts and ids differ")
+            yield set_doc_id(doc, docid, hash_name=hash_name)
+    return make_docs
@@ -0,0 +1,235 @@
+"""*Narcy* pipeline component.
+
+The component precomputes compounds, drive tokens and lead spans,
+relations, tenses and sentiment scores while documents are processed with
+:py:meth:`spacy.language.Language.pipe`, so ``n_process`` parallelism
+covers *Narcy* extraction too. Results are stored as compact arrays
+in ``doc.user_data`` (see :py:mod:`narcy.nlp.annotations`)
+and the ``doc_to_*_df`` functions read them instead of recomputing.
+
+Examples
+--------
+>>> nlp = spacy.load('en_core_web_sm')                  # doctest: +SKIP
+>>> nlp.add_pipe('narcy')                               # doctest: +SKIP
+>>> docs = nlp.pipe(texts, n_process=4)                 # doctest: +SKIP
+
+Components of a language model which are not needed for requested
+output columns can be disabled with :py:func:`prune_pipeline`.
+
+>>> disable = prune_pipeline(nlp, outputs=('svos',), columns={  # doctest: +SKIP
+...     'svos': ['subj_lemma', 'verb_lemma', 'obj_lemma']
+... })
+>>> docs = nlp.pipe(texts, disable=disable)             # doctest: +SKIP
+"""
+from spacy.language import Language
+from .filters import get_filters
+from .nlp.annotations import recording, set_annotation
+from .nlp.annotations import pack_compounds, pack_relations, pack_tensor
+from .processors import OUTPUTS, OUTPUT_COLUMNS, reduce_relations, get_svos
+
+
+#: Attributes used for all outputs (dependency trees, tags and sentences).
+BASE_ATTRS = ('token.dep', 'token.head', 'token.tag', 'doc.sents')
+
+# Attributes which are assigned by components
+# that do not declare them (e.g. POS tags set by attribute rulers).
+_UNDECLARED = ('token.pos',)
+
+
+def _annotate_relation(relation):
+    relation.tense      # pylint: disable=pointless-statement
+    relation.sub._.lead._.tense     # pylint: disable=pointless-statement
+    relation.span._.polarity        # pylint: disable=pointless-statement
+
+def annotate(doc, outputs=tuple(OUTPUTS)):
+    """Precompute *Narcy* annotations of a document.
+
+    Parameters
+    ----------
+    doc : spacy.tokens.Doc
+        Document object.
+    outputs : tuple of str
+        Names of outputs for which tenses and sentiment scores
+        are precomputed. Keys of :py:data:`narcy.processors.OUTPUTS`.
+    """
+    with recording(doc):
+        compounds = [ t._.compound for t in doc ]
+        for compound in set(filter(None, compounds)):
+            compound._.lead     # pylint: disable=pointless-statement
+        set_annotation(doc, 'compounds', pack_compounds(doc, compounds))
+        set_annotation(doc, 'relations', pack_relations(doc))
+        tensor = pack_tensor(doc)
+        if tensor is not None:
+            set_annotation(doc, 'tensor', tensor)
+        for sent in doc.sents:
+            sent._.polarity     # pylint: disable=pointless-statement
+        relations = list(doc._.relations)
+        if 'relations' in outputs:
+            for relation in relations:
+                _annotate_relation(relation)
+        if 'reduced' in outputs:
+            for relation in reduce_relations(relations):
+                _annotate_relation(relation)
+        if 'svos' in outputs:
+            for _ in get_svos(relations):
+                pass
+        if 'tokens' in outputs:
+            for token in doc._.tokens:
+                token._.tense   # pylint: disable=pointless-statement
+                token._.polarity    # pylint: disable=pointless-statement
+    return doc
+
+
+def _column_attrs(column, static_vectors):
+    if column in ('ent', 'ent_label') or column.endswith(('_ent', '_ent_label')):
+        yield 'doc.ents'
+    if column.endswith(('lemma', '_terms')):
+        yield 'token.lemma'
+    if 'vector' in column and not static_vectors:
+        yield 'doc.tensor'
+
+def required_attrs(outputs, columns=None, filters=None,
+                   allow_ner_pruning=False, static_vectors=False):
+    """Get token and document attributes needed for outputs.
+
+    Parameters
+    ----------
+    outputs : tuple of str
+        Names of outputs. Keys of :py:data:`narcy.processors.OUTPUTS`.
+    columns : dict or None
+        Mapping from output names to requested columns.
+        All columns are used for outputs which are not in the mapping.
+    filters : narcy.filters.Filters or dict or None
+        Filters of rows of all outputs or mapping from output names
+        to filters (see :py:func:`narcy.filters.get_filters`).
+    allow_ner_pruning : bool
+        Are named entities needed only for entity columns and filters.
+        Entities found by the entity recognizer are always merged into
+        compound tokens, so they change heads, subs, lemmas etc.
+        of all outputs. Hence they are needed for all outputs unless
+        outputs without entity compounds are acceptable.
+    static_vectors : bool
+        Does the language model have static word vectors.
+        Otherwise vectors are computed from document tensors.
+
+    Returns
+    -------
+    dict
+        Mapping from attributes (e.g. ``'doc.ents'``) to lists
+        of reasons (e.g. ``'reduced.head_ent'``).
+    """
+    reasons = { attr: [ 'parsing' ] for attr in BASE_ATTRS }
+    if not allow_ner_pruning:
+        reasons['doc.ents'] = [ 'compounds' ]
+    columns = columns or {}
+    for output in outputs:
+        for column in columns.get(output) or OUTPUT_COLUMNS[output]:
+            for attr in _column_attrs(column, static_vectors):
+                reasons.setdefault(attr, []).append(f"{output}.{column}")
+        output_filters = get_filters(filters, output)
+        if output_filters is None:
+            continue
+        if output_filters.ents:
+            reasons.setdefault('doc.ents', []).append(f"{output}.filters.ents")
+        if output_filters.lemmas is not None:
+            reasons.setdefault('token.lemma', []) \
+                .append(f"{output}.filters.lemmas")
+    return reasons
+
+def prune_pipeline(nlp, outputs=('reduced',), columns=None, filters=None,
+                   allow_ner_pruning=False):
+    """Get names of pipeline components which are not needed for outputs.
+
+    Components are needed if they assign attributes needed for outputs
+    (see :py:func:`required_attrs`) or for other needed components
+    or if other needed components listen to them (e.g. ``tok2vec``).
+    Components which do not declare assigned attributes are always kept.
+
+    Parameters
+    ----------
+    nlp : spacy.language.Language
+        Language object.
+    outputs, columns, filters, allow_ner_pruning :
+        See :py:func:`required_attrs`.
+
+    Returns
+    -------
+    tuple of str
+        Names of components which can be disabled,
+        for instance with :py:meth:`spacy.language.Language.pipe`.
+
+    Raises
+    ------
+    ValueError
+        If an attribute needed for outputs is not assigned
+        by any enabled component.
+    """
+    required = required_attrs(
+        outputs, columns, filters,
+        allow_ner_pruning=allow_ner_pruning,
+        static_vectors=len(nlp.vocab.vectors) > 0
+    )
+    names = nlp.pipe_names
+    metas = { name: nlp.get_pipe_meta(name) for name in names }
+    listeners = {
+        name: getattr(nlp.get_pipe(name), 'listening_components', [])
+        for name in names
+    }
+    needed = set(required)
+    keep = set()
+    changed = True
+    while changed:
+        changed = False
+        for name in names:
+            assigns = set(metas[name].assigns)
+            if name in keep or not (
+                not assigns or assigns & needed
+                or keep.intersection(listeners[name])
+            ):
+                continue
+            keep.add(name)
+            needed.update(metas[name].requires)
+            changed = True
+    for attr, reasons in required.items():
+        if attr in _UNDECLARED:
+            continue
+        if not any(attr in metas[name].assigns for name in keep):
+            raise ValueError(
+                f"'{attr}' is needed for {', '.join(reasons)}, "
+                "but no enabled pipeline component assigns it"
+            )
+    return tuple(name for name in names if name not in keep)
+
+
+class NarcyComponent:
+    """*Narcy* pipeline component.
+
+    Attributes
+    ----------
+    outputs : tuple of str
+        Names of outputs for which annotations are precomputed.
+        Keys of :py:data:`narcy.processors.OUTPUTS`.
+    """
+    def __init__(self, outputs=tuple(OUTPUTS)):
+        unknown = set(outputs).difference(OUTPUTS)
+        if unknown:
+            raise ValueError(f"unknown outputs: {', '.join(sorted(unknown))}")
+        self.outputs = tuple(outputs)
+
+    def __call__(self, doc):
+        return annotate(doc, self.outputs)
+
+    def pipe(self, docs, batch_size=128):   # pylint: disable=unused-argument
+        """Annotate stream of documents."""
+        for doc in docs:
+            yield self(doc)
+
+
+if hasattr(Language, 'factory'):
+    @Language.factory('narcy', default_config={ 'outputs': list(OUTPUTS) })
+    def make_narcy_component(nlp, name, outputs):   # pylint: disable=unused-argument
+        """Make *Narcy* pipeline component."""
+        return NarcyComponent(outputs=outputs)
+else:
+    Language.factories['narcy'] = \
+        lambda nlp, **cfg: NarcyComponent(**cfg)
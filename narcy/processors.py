@@ -2,9 +2,15 @@
 # pylint: disable=E0611,W0640
 # pylint: disable=R0914
 from collections import namedtuple
+from functools import partial
 from itertools import takewhile
+import numpy as np
 import pandas as pd
 from .nlp.utils import get_relation
+from .nlp.annotations import restore_tensor
+from .profiling import profiled, timer
+from .backends import check_backend, records_to_frame, unique_records
+from .backends import concat_frames
 
 
 Record = namedtuple('Record', [
@@ -53,13 +59,39 @@ Token = namedtuple('Token', [
 ])
 
 
-def relation_to_record(r):
+def _span_vector(span, vectors=None):
+    if vectors is None:
+        return span.vector, span.vector_norm
+    return vectors.span_vector(span)
+
+def _transform_vectors(records, fields, columns, vectors):
+    """Project and cast vector fields of records in batch."""
+    if vectors is None:
+        return records
+    fields = [ f for f in fields if not columns or f in columns ]
+    records = list(records)
+    if not records or not fields:
+        return records
+    matrices = [
+        vectors.transform(np.stack([ getattr(r, f) for r in records ]))
+        for f in fields
+    ]
+    return [
+        r._replace(**{ f: m[i] for f, m in zip(fields, matrices) })
+        for i, r in enumerate(records)
+    ]
+
+@profiled
+def relation_to_record(r, vectors=None):
     """Convert relation to record.
 
     Parameters
     ----------
     r : tuple
         Relation tuple.
+    vectors : narcy.vectors.VectorTransform or None
+        Transformation computing head and sub vectors.
+        :py:attr:`spacy.tokens.Span.vector` is used if ``None``.
     """
     head = r.head
     sub = r.sub
@@ -69,12 +101,14 @@ def relation_to_record(r):
     sentid = sent._.id
     head_text = r.head.text.lower()
     sub_text = r.sub.text.lower()
-    rel = doc[min(head.start, sub.start):max(head.end, sub.end)]
+    rel = r.span
     sub_tense, sub_mode = sub._.lead._.tense
-    head_pos, head_dep, sub_pos, sub_dep = \
-        tuple(y for x in r.rel.split('=>') for y in x.split('.'))
+    hroot = head.root
+    sroot = sub.root
     head_neg = any(t._.is_neg_dep for t in head)
     sub_neg = any(t._.is_neg_dep for t in sub)
+    head_vector, head_vector_norm = _span_vector(head, vectors)
+    sub_vector, sub_vector_norm = _span_vector(sub, vectors)
     return Record(
         head_tense=r.tense,
         head_mode=r.mode,
@@ -89,18 +123,18 @@ def relation_to_record(r):
         sub_lemma=sub._.lead._.lemma,
         head_neg=head_neg,
         sub_neg=sub_neg,
-        head_pos=head_pos,
-        head_dep=head_dep,
-        sub_pos=sub_pos,
-        sub_dep=sub_dep,
+        head_pos=hroot.pos_,
+        head_dep=hroot.dep_,
+        sub_pos=sroot.pos_,
+        sub_dep=sroot.dep_,
         head_ent=head._.is_ent,
         head_ent_label=head.label_,
         sub_ent=sub._.is_ent,
         sub_ent_label=sub.label_,
-        head_vector_norm=head.vector_norm,
-        sub_vector_norm=sub.vector_norm,
-        head_vector=head.vector,
-        sub_vector=sub.vector,
+        head_vector_norm=head_vector_norm,
+        sub_vector_norm=sub_vector_norm,
+        head_vector=head_vector,
+        sub_vector=sub_vector,
         head_start=head.start,
         head_end=head.end,
         sub_start=sub.start,
@@ -123,13 +157,16 @@ def _reduce_left_adposition(r):
     return get_relation(head._.compound, r.sub)
 
 
-def reduce_relations(relations):
+@profiled
+def reduce_relations(relations, filters=None):
     """Transform relations into relation reducts.
 
     Parameters
     ----------
     relations : iterable
         Iterable of relations.
+    filters : narcy.filters.Filters or None
+        Filters of relation reducts.
     """
     for r in relations:
         if r.rtype == 'misc':
@@ -139,10 +176,38 @@ def reduce_relations(relations):
         elif r.rtype == 'left_adposition':
             r = _reduce_left_adposition(r)
         if r and r.rtype != 'misc':
-            yield r
+            if filters is None or filters.accept_relation(r):
+                yield r
+
+def filter_relations(relations, filters=None):
+    """Filter relations.
+
+    Parameters
+    ----------
+    relations : iterable
+        Iterable of relations.
+    filters : narcy.filters.Filters or None
+        Filters of relations. All relations are kept if ``None``.
+    """
+    if filters is None:
+        return relations
+    return (r for r in relations if filters.accept_relation(r))
+
+def _get_relations(relations, reduced, filters):
+    if reduced:
+        return reduce_relations(relations, filters=filters)
+    return filter_relations(relations, filters=filters)
 
 
-def relations_to_df(relations, columns=None, **kwds):
+_RELATION_KEY = (
+    'rtype', 'head_start', 'head_end', 'sub_start', 'sub_end', 'docid', 'sentid'
+)
+_RELATION_VECTORS = ('head_vector', 'sub_vector')
+_SVO_VECTORS = ('subj_vector', 'verb_vector', 'obj_vector')
+_TOKEN_VECTORS = ('vector',)
+
+def relations_to_df(relations, columns=None, backend='pandas', vectors=None,
+                    **kwds):
     """Convert relations to a data frame.
 
     Parameters
@@ -151,21 +216,65 @@ def relations_to_df(relations, columns=None, **kwds):
         Iterable of relations.
     columns : iterable or None
         If ``None``, then ``Record`` field names are used.
+    backend : str
+        Output backend. See :py:mod:`narcy.backends`.
+    vectors : narcy.vectors.VectorTransform or None
+        Transformation of head and sub vectors.
     kwds :
         Additional keyword arguments passed to
         :py:meth:`pandas.DataFrame.from_records`.
     """
-    records = map(relation_to_record, relations)
+    records = map(partial(relation_to_record, vectors=vectors), relations)
+    records = _transform_vectors(records, _RELATION_VECTORS, columns, vectors)
+    return _relation_records_to_df(records, columns=columns,
+                                   backend=backend, **kwds)
+
+def _relation_records_to_df(records, columns=None, backend='pandas', **kwds):
     columns = Record._fields if not columns else columns
-    df = pd.DataFrame \
-        .from_records(records, columns=columns, **kwds) \
-        .drop_duplicates(subset=[
-            'rtype', 'head_start', 'head_end',
-            'sub_start', 'sub_end', 'docid', 'sentid'
-        ])
+    # Records are generated lazily, so extract them before
+    # timing conversion to data frames.
+    records = list(records)
+    with timer('dataframe'):
+        if backend == 'pandas' and set(_RELATION_KEY).issubset(columns):
+            df = records_to_frame(records, columns, backend=backend, **kwds) \
+                .drop_duplicates(subset=list(_RELATION_KEY))
+        else:
+            records = unique_records(records, _RELATION_KEY)
+            df = records_to_frame(records, columns, backend=backend, **kwds)
+    return df
+
+def _records_to_df(records, columns, doc, int_ids, backend, func=None):
+    check_backend(backend)
+    if int_ids and backend != 'pandas':
+        records = _int_id_records(records, doc)
+    if func is None:
+        records = list(records)
+        with timer('dataframe'):
+            df = records_to_frame(records, columns, backend=backend)
+    else:
+        df = func(records, columns=columns, backend=backend)
+    if int_ids and backend == 'pandas':
+        df = use_int_ids(df, doc)
     return df
 
-def doc_to_relations_df(doc, reduced=True, **kwds):
+def _sentence_records(doc, kind, func, cache, filters=None, vectors=None):
+    if filters is not None:
+        kind = (kind, filters)
+    if vectors is not None:
+        kind = (kind, vectors)
+    for sent in doc.sents:
+        yield from cache.get_records(sent, kind, func)
+
+def _sentence_relation_records(sent, reduced, filters=None, vectors=None):
+    relations = _get_relations(sent._.relations, reduced, filters)
+    return map(partial(relation_to_record, vectors=vectors), relations)
+
+def _sentence_svo_records(sent, filters=None, vectors=None):
+    svos = get_svos(sent._.subject_verbs, filters=filters)
+    return map(partial(svo_to_record, vectors=vectors), svos)
+
+def doc_to_relations_df(doc, reduced=True, int_ids=False, cache=None,
+                        backend='pandas', filters=None, vectors=None, **kwds):
     """Dump document to a relations data frame.
 
     Parameters
@@ -174,15 +283,37 @@ def doc_to_relations_df(doc, reduced=True, **kwds):
         Document object.
     reduced : bool
         Should relations reducts be used.
+    int_ids : bool
+        Should integer keys be used for ``docid`` and ``sentid``.
+        See :py:func:`doc_to_ids_df`.
+    cache : narcy.cache.SentenceCache or None
+        Sentence-level cache of extracted records.
+    backend : str
+        Output backend. See :py:mod:`narcy.backends`.
+    filters : narcy.filters.Filters or None
+        Filters applied to relations before records are built.
+    vectors : narcy.vectors.VectorTransform or None
+        Transformation of head and sub vectors applied in batch
+        to all records of the document. See :py:mod:`narcy.vectors`.
     **kwds :
         Other keyword arguments passed to :py:func:`relations_to_df`.
     """
-    relations = doc._.relations
-    if reduced:
-        relations = reduce_relations(relations)
-    return relations_to_df(relations, **kwds)
+    restore_tensor(doc)
+    if cache is not None:
+        kind = 'reduced' if reduced else 'relations'
+        func = partial(_sentence_relation_records, reduced=reduced,
+                       filters=filters, vectors=vectors)
+        records = _sentence_records(doc, kind, func, cache, filters, vectors)
+    else:
+        relations = _get_relations(doc._.relations, reduced, filters)
+        records = map(partial(relation_to_record, vectors=vectors), relations)
+    columns = kwds.pop('columns', None)
+    records = _transform_vectors(records, _RELATION_VECTORS, columns, vectors)
+    func = partial(_relation_records_to_df, **kwds)
+    return _records_to_df(records, columns, doc, int_ids, backend, func=func)
 
-def get_svos(relations):
+@profiled
+def get_svos(relations, filters=None):
     """Get subject-verb-object triplets from a relations.
 
     Relation types
@@ -193,6 +324,15 @@ def get_svos(relations):
 
     svc
         Subject-verb-complement triplet.
+
+    Parameters
+    ----------
+    relations : iterable
+        Iterable of relations. Only subject-verb relations are used,
+        so ``Doc._.subject_verbs`` (or ``Span._.subject_verbs``) gives
+        the same triplets as ``Doc._.relations`` much faster.
+    filters : narcy.filters.Filters or None
+        Filters of triplets. Tenses and modes are those of verbs.
     """
     for relation in relations:
         if relation.rtype != 'subject-verb':
@@ -201,26 +341,29 @@ def get_svos(relations):
         if not subj._.drive._.is_semantic:
             continue
         tense, mode = verb._.tense
+        if filters is not None and not filters.accept_tense(tense, mode):
+            continue
         neg = verb._.is_neg
+        sent = subj.sent
+        doc = sent.doc
+        subj_terms = None
         for obj in verb._.vobjects:
             if obj._.drive._.is_obj_dep or obj._.drive._.is_noun:
                 rtype = 'svo'
             else:
                 rtype = 'svc'
-            subj_terms = tuple(takewhile(lambda t: t != verb, subj._.drive._.subterms))
+            if filters is not None and not (
+                filters.accept_rtype(rtype)
+                and filters.accept_terms((subj, verb, obj))
+            ):
+                continue
+            if subj_terms is None:
+                subj_terms = tuple(takewhile(lambda t: t != verb, subj._.drive._.subterms))
+                subj_start = min([ subj.start, verb.start, *[ t.start for t in subj_terms ] ])
+                subj_end = max([ subj.end, verb.end, *[ t.end for t in subj_terms ] ])
             obj_terms = tuple(st for st in obj._.drive._.subterms if st != verb)
-            start = min(
-                subj.start, verb.start, obj.start,
-                *[ t.start for t in subj_terms ],
-                *[ t.start for t in obj_terms ]
-            )
-            end = max(
-                subj.end, verb.end, obj.end,
-                *[ t.end for t in subj_terms ],
-                *[ t.end for t in obj_terms ]
-            )
-            sent = subj.sent
-            doc = sent.doc
+            start = min(subj_start, obj.start, *[ t.start for t in obj_terms ])
+            end = max(subj_end, obj.end, *[ t.end for t in obj_terms ])
             rel = doc[start:end]
             yield SVO(
                 tense=tense,
@@ -238,14 +381,20 @@ def get_svos(relations):
                 sent_valence=sent._.valence
             )
 
-def svo_to_record(svo):
+def svo_to_record(svo, vectors=None):
     """Convert *SVO* object to *SVO* record.
 
     Parameters
     ----------
     svo : tuple
         SVO tuple.
+    vectors : narcy.vectors.VectorTransform or None
+        Transformation computing subject, verb and object vectors.
+        :py:attr:`spacy.tokens.Span.vector` is used if ``None``.
     """
+    subj_vector, subj_vector_norm = _span_vector(svo.subj, vectors)
+    verb_vector, verb_vector_norm = _span_vector(svo.verb, vectors)
+    obj_vector, obj_vector_norm = _span_vector(svo.obj, vectors)
     return SVORecord(
         tense=svo.tense,
         mode=svo.mode,
@@ -266,12 +415,12 @@ def svo_to_record(svo):
         obj_ent_label=svo.obj.label_,
         subj_terms=tuple(t._.lemma for t in svo.subj_terms),
         obj_terms=tuple(t._.lemma for t in svo.obj_terms),
-        subj_vector_norm=svo.subj.vector_norm,
-        verb_vector_norm=svo.verb.vector_norm,
-        obj_vector_norm=svo.obj.vector_norm,
-        subj_vector=svo.subj.vector,
-        verb_vector=svo.verb.vector,
-        obj_vector=svo.obj.vector,
+        subj_vector_norm=subj_vector_norm,
+        verb_vector_norm=verb_vector_norm,
+        obj_vector_norm=obj_vector_norm,
+        subj_vector=subj_vector,
+        verb_vector=verb_vector,
+        obj_vector=obj_vector,
         sentiment=svo.sentiment,
         sent_sentiment=svo.sent_sentiment,
         valence=svo.valence,
@@ -280,7 +429,8 @@ def svo_to_record(svo):
         sentid=svo.verb.sent._.id
     )
 
-def doc_to_svos_df(doc, columns=None):
+def doc_to_svos_df(doc, columns=None, int_ids=False, cache=None,
+                   backend='pandas', filters=None, vectors=None):
     """Dump document to a *SVOs* data frame.
 
     Parameters
@@ -289,22 +439,57 @@ def doc_to_svos_df(doc, columns=None):
         Document object.
     columns : iterable or None
         If ``None``, then ``SVORecord`` field names are used.
+    int_ids : bool
+        Should integer keys be used for ``docid`` and ``sentid``.
+        See :py:func:`doc_to_ids_df`.
+    cache : narcy.cache.SentenceCache or None
+        Sentence-level cache of extracted records.
+    backend : str
+        Output backend. See :py:mod:`narcy.backends`.
+    filters : narcy.filters.Filters or None
+        Filters applied to triplets before records are built.
+        See :py:func:`get_svos`.
+    vectors : narcy.vectors.VectorTransform or None
+        Transformation of subject, verb and object vectors applied
+        in batch to all records of the document.
+        See :py:mod:`narcy.vectors`.
     """
-    records = map(svo_to_record, get_svos(doc._.relations))
+    restore_tensor(doc)
+    if cache is not None:
+        func = partial(_sentence_svo_records, filters=filters, vectors=vectors)
+        records = _sentence_records(doc, 'svos', func, cache, filters, vectors)
+    else:
+        svos = get_svos(doc._.subject_verbs, filters=filters)
+        records = map(partial(svo_to_record, vectors=vectors), svos)
     columns = SVORecord._fields if not columns else columns
-    df = pd.DataFrame.from_records(records, columns=columns)
-    return df
+    records = _transform_vectors(records, _SVO_VECTORS, columns, vectors)
+    return _records_to_df(records, columns, doc, int_ids, backend)
+
+def _token_lemma(token):
+    return token._.lead.lemma_
 
-def get_tokens(doc):
+@profiled
+def get_tokens(doc, filters=None, vectors=None):
     """Get tokens from a document.
 
     Parameters
     ----------
-    doc : spacy.tokens.Doc
-        Document object.
+    doc : spacy.tokens.Doc or spacy.tokens.Span
+        Document object or a sentence.
+    filters : narcy.filters.Filters or None
+        Filters of tokens. Relation types are ignored.
+    vectors : narcy.vectors.VectorTransform or None
+        Transformation computing token vectors.
+        :py:attr:`spacy.tokens.Span.vector` is used if ``None``.
     """
     for token in doc._.tokens:
         tense, mode = token._.tense
+        if filters is not None and not (
+            filters.accept_tense(tense, mode)
+            and filters.accept_terms((token,), lemma=_token_lemma)
+        ):
+            continue
+        vector, vector_norm = _span_vector(token, vectors)
         yield Token(
             tense=tense,
             mode=mode,
@@ -316,8 +501,8 @@ def get_tokens(doc):
             dep=token._.drive.dep_,
             ent=token._.is_ent,
             ent_label=token.label_,
-            vector_norm=token.vector_norm,
-            vector=token.vector,
+            vector_norm=vector_norm,
+            vector=vector,
             start=token.start,
             end=token.end,
             sentiment=token._.sentiment,
@@ -328,7 +513,8 @@ def get_tokens(doc):
             sentid=token.sent._.id
         )
 
-def doc_to_tokens_df(doc, columns=None):
+def doc_to_tokens_df(doc, columns=None, int_ids=False, cache=None,
+                     backend='pandas', filters=None, vectors=None):
     """Dump document to a tokens data frame.
 
     Parameters
@@ -337,7 +523,104 @@ def doc_to_tokens_df(doc, columns=None):
         Document object.
     columns : iterable or None
         If ``None``, then ``Token`` field names are used.
+    int_ids : bool
+        Should integer keys be used for ``docid`` and ``sentid``.
+        See :py:func:`doc_to_ids_df`.
+    cache : narcy.cache.SentenceCache or None
+        Sentence-level cache of extracted records.
+    backend : str
+        Output backend. See :py:mod:`narcy.backends`.
+    filters : narcy.filters.Filters or None
+        Filters applied to tokens before records are built.
+        See :py:func:`get_tokens`.
+    vectors : narcy.vectors.VectorTransform or None
+        Transformation of token vectors applied in batch
+        to all records of the document. See :py:mod:`narcy.vectors`.
     """
+    restore_tensor(doc)
+    if cache is not None:
+        func = partial(get_tokens, filters=filters, vectors=vectors)
+        records = _sentence_records(doc, 'tokens', func, cache, filters, vectors)
+    else:
+        records = get_tokens(doc, filters=filters, vectors=vectors)
     columns = Token._fields if not columns else columns
-    df = pd.DataFrame.from_records(get_tokens(doc), columns=columns)
+    records = _transform_vectors(records, _TOKEN_VECTORS, columns, vectors)
+    return _records_to_df(records, columns, doc, int_ids, backend)
+
+def doc_to_ids_df(doc):
+    """Dump document to a lookup table of integer and string ids.
+
+    Integer document keys are 64-bit hashes of string document ids
+    (``Doc._.key``) and integer sentence keys are indexes
+    of sentences in documents, so they are unique only together
+    with document keys.
+
+    Parameters
+    ----------
+    doc : spacy.tokens.Doc
+        Document object.
+    """
+    sents = list(doc.sents)
+    return pd.DataFrame({
+        'docid': np.full(len(sents), doc._.key, dtype=np.int64),
+        'sentid': np.arange(len(sents), dtype=np.int32),
+        'docid_str': doc._.id,
+        'sentid_str': [ s._.id for s in sents ]
+    }, columns=['docid', 'sentid', 'docid_str', 'sentid_str'])
+
+def use_int_ids(df, doc):
+    """Replace string ids with integer keys in a document data frame.
+
+    See :py:func:`doc_to_ids_df` for details.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Data frame with ``docid`` and/or ``sentid`` columns.
+    doc : spacy.tokens.Doc
+        Document object.
+    """
+    if 'docid' in df.columns:
+        df['docid'] = np.full(len(df), doc._.key, dtype=np.int64)
+    if 'sentid' in df.columns:
+        keys = { s._.id: i for i, s in enumerate(doc.sents) }
+        df['sentid'] = df['sentid'].map(keys).astype(np.int32)
     return df
+
+def _int_id_records(records, doc):
+    keys = { s._.id: i for i, s in enumerate(doc.sents) }
+    key = doc._.key
+    for record in records:
+        yield record._replace(docid=key, sentid=keys[record.sentid])
+
+def docs_to_df(docs, output='reduced', backend='pandas', **kwds):
+    """Dump documents to a single data frame.
+
+    Parameters
+    ----------
+    docs : iterable of spacy.tokens.Doc
+        Document objects.
+    output : str
+        Output name. Key of :py:data:`OUTPUTS`.
+    backend : str
+        Output backend. See :py:mod:`narcy.backends`.
+    **kwds :
+        Other keyword arguments passed to the output function.
+    """
+    func = OUTPUTS[output]
+    frames = [ func(doc, backend=backend, **kwds) for doc in docs ]
+    return concat_frames(frames, backend=backend)
+
+OUTPUTS = {
+    'relations': partial(doc_to_relations_df, reduced=False),
+    'reduced': partial(doc_to_relations_df, reduced=True),
+    'svos': doc_to_svos_df,
+    'tokens': doc_to_tokens_df
+}
+
+OUTPUT_COLUMNS = {
+    'relations': Record._fields,
+    'reduced': Record._fields,
+    'svos': SVORecord._fields,
+    'tokens': Token._fields
+}
@@ -0,0 +1,209 @@
+"""Profiling hooks and timing counters.
+
+Hot extension getters and processing stages are wrapped with
+:py:func:`profiled`. Wrapped functions only check a single module-level
+variable unless profiling is enabled with :py:func:`profile`,
+so the hooks are cheap enough to be left in place.
+
+Times are cumulative, that is, they include time spent in other profiled
+functions called in between. Recursive calls are counted, but their time
+is recorded only once. Time of generator functions is the time spent
+on producing their items.
+
+Examples
+--------
+>>> with profile() as stats:                            # doctest: +SKIP
+...     df = doc_to_relations_df(doc)
+>>> stats.summary()                                     # doctest: +SKIP
+{'relations_t_g': {'calls': 42, 'time': 0.0123}, ...}
+"""
+# pylint: disable=W0603
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from inspect import isgeneratorfunction
+from time import perf_counter
+
+
+_stats = None
+
+
+class Stats:
+    """Call counts and cumulative times.
+
+    Counters are kept separately by every thread and summed
+    in :py:attr:`counters`, so functions running concurrently
+    in a thread pool (see :py:mod:`narcy.service`) may be profiled too.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._threads = []
+
+    @property
+    def counters(self):
+        """Mapping from names to lists of number of calls,
+        cumulative time and current recursion depth summed over threads.
+        """
+        counters = {}
+        with self._lock:
+            threads = list(self._threads)
+        for thread_counters in threads:
+            for name, counter in list(thread_counters.items()):
+                total = counters.setdefault(name, [0, 0.0, 0])
+                for i, value in enumerate(counter):
+                    total[i] += value
+        return counters
+
+    def _counter(self, name):
+        try:
+            counters = self._local.counters
+        except AttributeError:
+            counters = self._local.counters = {}
+            with self._lock:
+                self._threads.append(counters)
+        try:
+            return counters[name]
+        except KeyError:
+            counter = counters[name] = [0, 0.0, 0]
+            return counter
+
+    def call(self, name, func, *args, **kwds):
+        """Call function and record its time."""
+        counter = self._counter(name)
+        counter[0] += 1
+        if counter[2]:
+            return func(*args, **kwds)
+        counter[2] += 1
+        t0 = perf_counter()
+        try:
+            return func(*args, **kwds)
+        finally:
+            counter[1] += perf_counter() - t0
+            counter[2] -= 1
+
+    def iterate(self, name, iterator):
+        """Iterate and record time spent on producing items."""
+        counter = self._counter(name)
+        counter[0] += 1
+        while True:
+            outer = not counter[2]
+            counter[2] += 1
+            t0 = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                if outer:
+                    counter[1] += perf_counter() - t0
+                counter[2] -= 1
+            yield item
+
+    @contextmanager
+    def timer(self, name):
+        """Record time of a block of code."""
+        counter = self._counter(name)
+        counter[0] += 1
+        counter[2] += 1
+        t0 = perf_counter()
+        try:
+            yield
+        finally:
+            if counter[2] == 1:
+                counter[1] += perf_counter() - t0
+            counter[2] -= 1
+
+    def summary(self):
+        """Get summary dictionary.
+
+        Returns
+        -------
+        dict
+            Mapping from names to dictionaries with
+            ``calls`` and ``time`` (in seconds) keys.
+        """
+        return {
+            name: { 'calls': calls, 'time': time }
+            for name, (calls, time, _) in self.counters.items()
+        }
+
+    def to_df(self):
+        """Get summary data frame sorted by cumulative time."""
+        import pandas as pd
+        df = pd.DataFrame.from_dict(self.summary(), orient='index')
+        df.index.name = 'name'
+        return df.reindex(columns=['calls', 'time']) \
+            .sort_values('time', ascending=False)
+
+    def reset(self):
+        """Reset all counters."""
+        with self._lock:
+            self._threads = []
+        self._local = threading.local()
+
+
+@contextmanager
+def profile(stats=None):
+    """Enable profiling within a context.
+
+    Parameters
+    ----------
+    stats : Stats or None
+        Stats object to update.
+        If ``None``, then a new one is created,
+        so every batch may be profiled separately.
+
+    Yields
+    ------
+    Stats
+        Call counts and cumulative times.
+    """
+    global _stats
+    previous = _stats
+    _stats = Stats() if stats is None else stats
+    try:
+        yield _stats
+    finally:
+        _stats = previous
+
+def profiled(func=None, name=None):
+    """Decorate function so it is profiled when profiling is enabled.
+
+    Parameters
+    ----------
+    func : callable
+        Function or generator function.
+    name : str or None
+        Counter name. Defaults to the function name.
+    """
+    if func is None:
+        return lambda f: profiled(f, name=name)
+    name = name or func.__name__
+    if isgeneratorfunction(func):
+        @wraps(func)
+        def gen_wrapper(*args, **kwds):
+            stats = _stats
+            if stats is None:
+                yield from func(*args, **kwds)
+            else:
+                yield from stats.iterate(name, func(*args, **kwds))
+        return gen_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwds):
+        stats = _stats
+        if stats is None:
+            return func(*args, **kwds)
+        return stats.call(name, func, *args, **kwds)
+    return wrapper
+
+@contextmanager
+def timer(name):
+    """Record time of a block of code when profiling is enabled."""
+    stats = _stats
+    if stats is None:
+        yield
+    else:
+        with stats.timer(name):
+            yield
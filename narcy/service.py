@@ -0,0 +1,461 @@
+"""Asynchronous document processing service.
+
+Texts submitted to the service are put on a bounded queue, grouped into
+micro-batches and parsed with :py:meth:`spacy.language.Language.pipe`
+in a pool of workers (see :py:func:`make_pool`).
+
+Worker processes hold their own language models with *Narcy* extension
+attributes registered. Worker threads of a pool share a single language
+model (see :py:class:`Worker`), so many more of them fit in memory.
+Extension getters cache values only on documents and every thread works
+on its own documents, so extraction is safe in threads.
+
+Language objects are not safe for concurrent use (tokenizer caches
+and vocabularies are updated while parsing), so threads sharing a model
+parse their batches one at a time. Model layers release the GIL,
+so parsing in one thread still overlaps with extraction and data frame
+building in others.
+"""
+# pylint: disable=W0603
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import spacy
+from .filters import get_filters
+from .nlp.utils import pipe_factory
+from .pipeline import prune_pipeline
+from .processors import OUTPUTS
+from .transport import dump_frames, load_frames, release_frames
+
+
+EXECUTORS = ('process', 'thread')
+
+_worker = None
+
+
+def load_model(model):
+    """Load language model.
+
+    Parameters
+    ----------
+    model : str or callable or spacy.language.Language
+        Model name or path passed to :py:func:`spacy.load`,
+        a callable returning language object or a language object.
+    """
+    if isinstance(model, str):
+        return spacy.load(model)
+    if callable(model) and not hasattr(model, 'pipe'):
+        return model()
+    return model
+
+class Worker:
+    """Language model of workers.
+
+    Attributes
+    ----------
+    nlp : spacy.language.Language
+        Language object.
+    make_docs : callable
+        Document factory (see :py:func:`narcy.nlp.utils.pipe_factory`).
+    lock : threading.Lock
+        Lock serializing parsing in threads sharing the worker.
+    """
+    def __init__(self, model):
+        self.nlp = load_model(model)
+        self.make_docs = pipe_factory(self.nlp)
+        self.lock = threading.Lock()
+
+    def parse(self, texts, **kwds):
+        """Parse texts into a list of documents.
+
+        Parameters
+        ----------
+        texts : list of str
+            Texts to parse.
+        **kwds :
+            Passed to :py:attr:`make_docs`.
+        """
+        with self.lock:
+            return list(self.make_docs(texts, **kwds))
+
+def init_worker(model):
+    """Initialize worker process by loading language model.
+
+    Parameters
+    ----------
+    model : str or callable or spacy.language.Language
+        See :py:func:`load_model`.
+    """
+    global _worker
+    _worker = Worker(model)
+
+def _get_worker(worker):
+    if worker is not None:
+        return worker
+    if _worker is None:
+        raise RuntimeError("worker is not initialized")
+    return _worker
+
+def make_pool(model, n_workers, executor='process'):
+    """Make pool of workers with a loaded language model.
+
+    Parameters
+    ----------
+    model : str or callable or spacy.language.Language
+        See :py:func:`load_model`.
+    n_workers : int
+        Number of workers.
+    executor : {'process', 'thread'}
+        Pool of worker processes, each loading its own model,
+        or pool of threads sharing a model loaded once
+        in the current process.
+
+    Returns
+    -------
+    pool : concurrent.futures.Executor
+        Pool of workers.
+    worker : Worker or None
+        Worker shared by threads, which has to be passed
+        to :py:func:`process_batch` and :py:func:`check_pipeline`.
+        ``None`` for worker processes.
+    """
+    if executor == 'process':
+        pool = ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=init_worker,
+            initargs=(model,)
+        )
+        return pool, None
+    if executor == 'thread':
+        return ThreadPoolExecutor(max_workers=n_workers), Worker(model)
+    raise ValueError(f"unknown executor '{executor}'")
+
+def check_pipeline(outputs, columns=None, filters=None, worker=None,
+                   allow_ner_pruning=False):
+    """Get names of worker pipeline components not needed for outputs.
+
+    See :py:func:`narcy.pipeline.prune_pipeline` for details.
+    Model of the worker process is used if ``worker`` is ``None``.
+    If ``allow_ner_pruning=True``, then the entity recognizer
+    is disabled if no entity columns or filters need it. It only changes
+    pruning, so named entities are still merged into compound tokens
+    whenever the entity recognizer runs, but heads, subs, lemmas etc.
+    of outputs made without it do not include entity compounds.
+
+    Raises
+    ------
+    ValueError
+        If outputs need a component which is not enabled.
+    """
+    nlp = _get_worker(worker).nlp
+    return prune_pipeline(nlp, outputs, columns=columns, filters=filters,
+                          allow_ner_pruning=allow_ner_pruning)
+
+def process_batch(texts, outputs, ids=None, normalize_unicode=True,
+                  shared_memory=False, filters=None, columns=None,
+                  prune=False, vectors=None, worker=None,
+                  allow_ner_pruning=False):
+    """Process batch of texts in a worker.
+
+    Parameters
+    ----------
+    texts : list of str
+        Texts to process.
+    outputs : tuple of str
+        Names of outputs. Keys of :py:data:`narcy.processors.OUTPUTS`.
+    ids : list of str or None
+        External document ids. Texts are hashed if ``None``.
+    normalize_unicode : bool
+        Should texts be unicode-normalized.
+    shared_memory : bool
+        Should data frames be written to shared memory
+        and replaced with descriptors (see :py:mod:`narcy.transport`).
+    filters : narcy.filters.Filters or dict or None
+        Filters of rows of all outputs or mapping from output names
+        to filters (see :py:func:`narcy.filters.get_filters`).
+    columns : dict or None
+        Mapping from output names to columns.
+        All columns are used for outputs which are not in the mapping.
+    prune : bool
+        Should pipeline components which are not needed for outputs
+        be disabled (see :py:func:`check_pipeline`).
+    vectors : narcy.vectors.VectorTransform or None
+        Transformation of vectors in outputs.
+    worker : Worker or None
+        Worker shared by threads (see :py:func:`make_pool`).
+        Worker of the current process is used if ``None``.
+    allow_ner_pruning : bool
+        Can the entity recognizer be disabled when pruning
+        (see :py:func:`check_pipeline`).
+
+    Returns
+    -------
+    list
+        Dictionaries mapping output names to data frames
+        (or frame descriptors) or exceptions raised
+        when processing single documents.
+    """
+    results = []
+    columns = columns or {}
+    worker = _get_worker(worker)
+    disable = check_pipeline(
+        outputs, columns, filters, worker, allow_ner_pruning
+    ) if prune else ()
+    docs = worker.parse(texts, ids=ids, normalize_unicode=normalize_unicode,
+                        disable=disable)
+    for doc in docs:
+        try:
+            result = {
+                name: OUTPUTS[name](
+                    doc, filters=get_filters(filters, name),
+                    columns=columns.get(name),
+                    vectors=vectors
+                ) for name in outputs
+            }
+            if shared_memory:
+                result = dump_frames(result)
+        except Exception as exc:    # pylint: disable=broad-except
+            result = exc
+        results.append(result)
+    return results
+
+def _release_batch(future):
+    """Remove shared memory files of a batch which is not awaited."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    for result in future.result():
+        if not isinstance(result, Exception):
+            release_frames(result)
+
+
+class DocumentService:
+    """Asynchronous document processing service.
+
+    Attributes
+    ----------
+    model : str or callable or spacy.language.Language
+        Language model loaded in workers. See :py:func:`load_model`.
+        It has to be picklable if ``n_workers > 0``
+        and ``executor='process'``.
+    outputs : tuple of str
+        Names of outputs. Keys of :py:data:`narcy.processors.OUTPUTS`.
+    n_workers : int
+        Number of workers.
+        If ``0``, then documents are processed in a background thread
+        of the current process (local in-process mode).
+    batch_size : int
+        Maximum number of texts in a micro-batch.
+    max_delay : float
+        Maximum number of seconds the first text in a micro-batch
+        waits for other texts.
+    max_queue : int
+        Maximum number of queued texts.
+        Submitting waits when the queue is full.
+    timeout : float or None
+        Default per-request timeout in seconds.
+    normalize_unicode : bool
+        Should texts be unicode-normalized.
+    shared_memory : bool
+        Should workers send data frames back through shared memory
+        instead of pickling them (see :py:mod:`narcy.transport`).
+        Ignored if ``n_workers == 0`` or ``executor='thread'``.
+    filters : narcy.filters.Filters or dict or None
+        Filters of rows of all outputs or mapping from output names
+        to filters (see :py:func:`narcy.filters.get_filters`).
+    columns : dict or None
+        Mapping from output names to columns.
+    prune : bool
+        Should pipeline components which are not needed for outputs
+        be disabled (see :py:func:`check_pipeline`).
+    vectors : narcy.vectors.VectorTransform or None
+        Transformation of vectors in outputs.
+    executor : {'process', 'thread'}
+        Kind of the pool of workers (see :py:func:`make_pool`).
+    allow_ner_pruning : bool
+        Can the entity recognizer be disabled when pruning
+        (see :py:func:`check_pipeline`).
+
+    Examples
+    --------
+    >>> async def main(texts):                          # doctest: +SKIP
+    ...     async with DocumentService('en_core_web_sm') as service:
+    ...         return await asyncio.gather(*map(service.submit, texts))
+    """
+    def __init__(self, model, outputs=('reduced',), n_workers=1,
+                 batch_size=32, max_delay=.005, max_queue=1024,
+                 timeout=None, normalize_unicode=True, shared_memory=False,
+                 filters=None, columns=None, prune=False, vectors=None,
+                 executor='process', allow_ner_pruning=False):
+        unknown = set(outputs).difference(OUTPUTS)
+        if unknown:
+            raise ValueError(f"unknown outputs: {', '.join(sorted(unknown))}")
+        if executor not in EXECUTORS:
+            raise ValueError(f"unknown executor '{executor}'")
+        self.model = model
+        self.outputs = tuple(outputs)
+        self.n_workers = n_workers
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.normalize_unicode = normalize_unicode
+        self.shared_memory = shared_memory and n_workers > 0 \
+            and executor == 'process'
+        self.filters = filters
+        self.columns = columns
+        self.prune = prune
+        self.vectors = vectors
+        self.executor = executor
+        self.allow_ner_pruning = allow_ner_pruning
+        self._executor = None
+        self._worker = None
+        self._queue = None
+        self._batchers = []
+
+    @property
+    def running(self):
+        """Is service running."""
+        return self._executor is not None
+
+    async def start(self):
+        """Start workers and batchers."""
+        if self.running:
+            return
+        if self.n_workers > 0 and self.executor == 'process':
+            self._executor, _ = make_pool(self.model, self.n_workers)
+        else:
+            # The model is loaded in a worker thread,
+            # so the event loop is not blocked.
+            executor = ThreadPoolExecutor(max_workers=max(self.n_workers, 1))
+            loop = asyncio.get_event_loop()
+            try:
+                self._worker = await loop.run_in_executor(
+                    executor, Worker, self.model
+                )
+            except BaseException:
+                executor.shutdown(wait=False)
+                raise
+            self._executor = executor
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._batchers = [
+            asyncio.ensure_future(self._run_batcher())
+            for _ in range(max(self.n_workers, 1))
+        ]
+
+    async def close(self):
+        """Process pending texts and stop workers."""
+        if not self.running:
+            return
+        await self._queue.join()
+        for batcher in self._batchers:
+            batcher.cancel()
+        await asyncio.gather(*self._batchers, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        self._worker = None
+        self._queue = None
+        self._batchers = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def submit(self, text, docid=None, timeout=None):
+        """Submit text and wait for its outputs.
+
+        Parameters
+        ----------
+        text : str
+            Document text.
+        docid : str or None
+            External document id.
+            If ``None``, then id is a hash of the document text.
+        timeout : float or None
+            Timeout in seconds (including time spent in the queue).
+            If ``None``, then the service default is used.
+
+        Returns
+        -------
+        dict
+            Mapping from output names to data frames.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            If the text was not processed in time.
+        """
+        if not self.running:
+            raise RuntimeError("service is not running")
+        timeout = self.timeout if timeout is None else timeout
+        future = asyncio.get_event_loop().create_future()
+
+        async def _submit():
+            await self._queue.put((text, docid, future))
+            return await future
+
+        return await asyncio.wait_for(_submit(), timeout)
+
+    async def _get_batch(self):
+        loop = asyncio.get_event_loop()
+        batch = [ await self._queue.get() ]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.batch_size:
+            delay = deadline - loop.time()
+            if delay <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), delay)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+        return batch
+
+    async def _run_batcher(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = await self._get_batch()
+            try:
+                # Requests that already timed out are not processed at all.
+                pending = [ item for item in batch if not item[-1].done() ]
+                if not pending:
+                    continue
+                texts = [ t for t, _, _ in pending ]
+                ids = [ i for _, i, _ in pending ]
+                batch_future = self._executor.submit(
+                    process_batch,
+                    texts, self.outputs, ids, self.normalize_unicode,
+                    self.shared_memory, self.filters, self.columns,
+                    self.prune, self.vectors, self._worker,
+                    self.allow_ner_pruning
+                )
+                try:
+                    results = await asyncio.wrap_future(batch_future, loop=loop)
+                except asyncio.CancelledError:
+                    if self.shared_memory:
+                        batch_future.add_done_callback(_release_batch)
+                    raise
+                except Exception as exc:    # pylint: disable=broad-except
+                    results = [ exc ] * len(pending)
+                for (_, _, future), result in zip(pending, results):
+                    if not isinstance(result, Exception) and self.shared_memory:
+                        # Shared memory files are removed even if
+                        # requests already timed out.
+                        if future.done():
+                            release_frames(result)
+                            continue
+                        try:
+                            result = load_frames(result)
+                        except Exception as exc:    # pylint: disable=broad-except
+                            result = exc
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
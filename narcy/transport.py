@@ -0,0 +1,228 @@
+"""Shared-memory transport of data frames between processes.
+
+Worker processes write columnar content of data frames
+(numeric columns, category codes and vector matrices) into memory-mapped
+files placed in shared memory (``/dev/shm`` when available) and return
+only small picklable descriptors. The parent process maps the files
+and assembles data frames from views of the mapped buffers
+without copying data.
+
+Columns are assembled with their original dtypes, so for instance string
+columns stay object columns and missing values keep their types
+(``None`` and ``NaN`` are not merged).
+
+Files are removed when the parent loads them or releases them without
+loading (see :py:func:`release_frames`) and when writing fails. The memory
+is released when the last array viewing it is garbage-collected.
+"""
+import os
+import uuid
+import tempfile
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+
+FrameDescriptor = namedtuple('FrameDescriptor', [
+    'path', 'nbytes', 'nrows', 'columns', 'index'
+])
+
+ColumnDescriptor = namedtuple('ColumnDescriptor', [
+    'name', 'kind', 'dtype', 'offset', 'shape', 'values', 'series_dtype'
+])
+
+_ALIGN = 64
+
+
+def _default_dirpath():
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+def _codes_dtype(n):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+def _factorize(values):
+    """Factorize values keeping types of missing values."""
+    codes, uniques = pd.factorize(values)
+    uniques = list(uniques)
+    missing = {}
+    for i in np.flatnonzero(codes < 0):
+        value = values[i]
+        if type(value) not in missing:
+            missing[type(value)] = len(uniques)
+            uniques.append(value)
+        codes[i] = missing[type(value)]
+    return codes, uniques
+
+def _encode_column(name, series):
+    """Get column descriptor (without offset) and data array."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        return ColumnDescriptor(name, 'category', codes.dtype.str, None,
+                                codes.shape, None, series.dtype), codes
+    values = series.to_numpy()
+    if values.dtype.kind in 'biufmM':
+        return ColumnDescriptor(name, 'numeric', values.dtype.str, None,
+                                values.shape, None, series.dtype), values
+    if len(values) and all(isinstance(v, np.ndarray) for v in values):
+        shapes = set(v.shape for v in values)
+        if len(shapes) == 1:
+            matrix = np.stack(values)
+            return ColumnDescriptor(name, 'vector', matrix.dtype.str, None,
+                                    matrix.shape, None, series.dtype), matrix
+    codes, uniques = _factorize(values)
+    codes = codes.astype(_codes_dtype(len(uniques)))
+    return ColumnDescriptor(name, 'object', codes.dtype.str, None,
+                            codes.shape, tuple(uniques), series.dtype), codes
+
+def dump_frame(df, dirpath=None):
+    """Write data frame to a shared memory file.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Data frame.
+    dirpath : str or None
+        Directory for the file.
+        If ``None``, then ``/dev/shm`` or the temporary directory is used.
+
+    Returns
+    -------
+    FrameDescriptor
+        Small picklable descriptor of the written data.
+    """
+    dirpath = _default_dirpath() if dirpath is None else dirpath
+    columns = []
+    arrays = []
+    offset = 0
+    encoded = [ _encode_column(name, df[name]) for name in df.columns ]
+    index = df.index
+    if isinstance(index, pd.RangeIndex):
+        index = (index.start, index.stop, index.step)
+    else:
+        encoded.append(_encode_column(None, index.to_series()))
+        index = None
+    for column, array in encoded:
+        array = np.ascontiguousarray(array)
+        columns.append(column._replace(offset=offset))
+        arrays.append((offset, array))
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+    path = os.path.join(dirpath, f"narcy-{uuid.uuid4().hex}")
+    nbytes = max(offset, 1)
+    try:
+        mm = np.memmap(path, dtype=np.uint8, mode='w+', shape=(nbytes,))
+        for offset, array in arrays:
+            mm[offset:offset+array.nbytes] = array.view(np.uint8).reshape(-1)
+        mm.flush()
+        del mm
+    except BaseException:
+        _unlink(path)
+        raise
+    return FrameDescriptor(
+        path=path,
+        nbytes=nbytes,
+        nrows=len(df),
+        columns=tuple(columns),
+        index=index
+    )
+
+def _decode_column(mm, column):
+    dtype = np.dtype(column.dtype)
+    size = int(np.prod(column.shape)) * dtype.itemsize
+    array = mm[column.offset:column.offset+size] \
+        .view(dtype).reshape(column.shape)
+    if column.kind == 'numeric':
+        return array
+    if column.kind == 'vector':
+        values = np.empty(len(array), dtype=object)
+        for i, row in enumerate(array):
+            values[i] = row
+        return values
+    if column.kind == 'category':
+        return pd.Categorical.from_codes(array, dtype=column.series_dtype)
+    uniques = np.empty(len(column.values), dtype=object)
+    uniques[:] = column.values
+    return uniques[array]
+
+def load_frame(descriptor, unlink=True):
+    """Assemble data frame from a shared memory file.
+
+    Parameters
+    ----------
+    descriptor : FrameDescriptor
+        Descriptor returned by :py:func:`dump_frame`.
+    unlink : bool
+        Should the file be removed after it is mapped.
+        Memory stays valid as long as the data frame is alive.
+    """
+    mm = np.memmap(descriptor.path, dtype=np.uint8, mode='c',
+                   shape=(descriptor.nbytes,))
+    if unlink:
+        os.unlink(descriptor.path)
+    columns = list(descriptor.columns)
+    if descriptor.index is None:
+        column = columns.pop()
+        index = pd.Index(_decode_column(mm, column), dtype=column.series_dtype)
+    else:
+        index = pd.RangeIndex(*descriptor.index)
+    # Series are made with original dtypes, since otherwise
+    # for instance object columns of strings could be inferred as strings.
+    data = {
+        c.name: pd.Series(_decode_column(mm, c), index=index,
+                          dtype=c.series_dtype, copy=False)
+        for c in columns
+    }
+    return pd.DataFrame(data, index=index,
+                        columns=[ c.name for c in columns ], copy=False)
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def release_frames(descriptors):
+    """Remove shared memory files of data frames which are not loaded.
+
+    Parameters
+    ----------
+    descriptors : dict
+        Mapping to descriptors returned by :py:func:`dump_frames`.
+    """
+    for descriptor in descriptors.values():
+        _unlink(descriptor.path)
+
+def dump_frames(dfs, dirpath=None):
+    """Write dictionary of data frames to shared memory files.
+
+    Files which are already written are removed if writing fails.
+    See :py:func:`dump_frame` for details.
+    """
+    descriptors = {}
+    try:
+        for k, df in dfs.items():
+            descriptors[k] = dump_frame(df, dirpath=dirpath)
+    except BaseException:
+        release_frames(descriptors)
+        raise
+    return descriptors
+
+def load_frames(descriptors, unlink=True):
+    """Assemble dictionary of data frames from shared memory files.
+
+    Files of other data frames are removed if loading fails
+    and ``unlink=True``. See :py:func:`load_frame` for details.
+    """
+    dfs = {}
+    try:
+        for k, descriptor in descriptors.items():
+            dfs[k] = load_frame(descriptor, unlink=unlink)
+    except BaseException:
+        if unlink:
+            release_frames(descriptors)
+        raise
+    return dfs
@@ -0,0 +1,182 @@
+"""Span vectors for output records.
+
+By default vectors of heads, subs, subjects, verbs, objects and tokens
+are :py:attr:`spacy.tokens.Span.vector` arrays, which average
+token vectors one span at a time. :py:class:`VectorTransform` computes
+them from per-document prefix sums of the token vector matrix instead
+and may store them with reduced precision (e.g. ``float16``) and/or
+projected to ``k`` dimensions with a fixed random or *PCA* projection
+applied in batch to all vectors of a document.
+
+Vector norms (``*_vector_norm`` columns) are always norms
+of the original (unprojected) vectors.
+
+Examples
+--------
+>>> vectors = VectorTransform.random(k=64, dtype='float16')
+>>> df = doc_to_relations_df(doc, vectors=vectors)      # doctest: +SKIP
+"""
+import threading
+import numpy as np
+
+
+def get_token_vectors(doc):
+    """Get matrix of token vectors of a document.
+
+    Token vectors are the same as :py:attr:`spacy.tokens.Token.vector`.
+
+    Parameters
+    ----------
+    doc : spacy.tokens.Doc
+        Document object.
+
+    Returns
+    -------
+    numpy.ndarray
+        Matrix with rows corresponding to tokens.
+    """
+    vocab = doc.vocab
+    if 'vector' not in doc.user_token_hooks \
+    and vocab.vectors.size == 0 and doc.tensor.size != 0:
+        return np.asarray(doc.tensor, dtype=np.float32)
+    if not len(doc):
+        return np.zeros((0, vocab.vectors_length), dtype=np.float32)
+    return np.stack([ t.vector for t in doc ]).astype(np.float32, copy=False)
+
+
+class VectorTransform:
+    """Transformation of span vectors in output records.
+
+    Attributes
+    ----------
+    dtype : numpy.dtype
+        Data type of stored vectors.
+    k : int or None
+        Number of dimensions of projected vectors.
+        Vectors are not projected if ``None``.
+    seed : int
+        Seed of random projections.
+    projection : numpy.ndarray or None
+        ``(d, k)`` projection matrix. Random projections are generated
+        when the first vectors are transformed, so they are the same
+        in all worker processes using the same seed.
+    mean : numpy.ndarray or None
+        Vector subtracted before projecting (means of *PCA* samples).
+    """
+    def __init__(self, dtype=np.float32, k=None, seed=0, projection=None,
+                 mean=None):
+        self.dtype = np.dtype(dtype)
+        self.k = k if projection is None else projection.shape[1]
+        self.seed = seed
+        self.projection = projection
+        self.mean = mean
+        self._local = threading.local()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @classmethod
+    def random(cls, k, dtype=np.float32, seed=0):
+        """Make transformation with a Gaussian random projection.
+
+        Parameters
+        ----------
+        k : int
+            Number of dimensions.
+        dtype : numpy.dtype
+            Data type of stored vectors.
+        seed : int
+            Seed of the projection matrix.
+        """
+        return cls(dtype=dtype, k=k, seed=seed)
+
+    @classmethod
+    def pca(cls, vectors, k, dtype=np.float32):
+        """Make transformation with a *PCA* projection.
+
+        Parameters
+        ----------
+        vectors : array_like
+            ``(n, d)`` sample of vectors, for instance static vectors
+            of a language model (``nlp.vocab.vectors.data``).
+        k : int
+            Number of principal components.
+        dtype : numpy.dtype
+            Data type of stored vectors.
+        """
+        vectors = np.asarray(vectors, dtype=np.float64)
+        mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        components = vt[:k]
+        # Signs of components are fixed, so projections are reproducible.
+        signs = np.sign(components[np.arange(len(components)),
+                                   np.abs(components).argmax(axis=1)])
+        components *= signs[:, None]
+        return cls(
+            dtype=dtype,
+            projection=components.T.astype(np.float32),
+            mean=mean.astype(np.float32)
+        )
+
+    def _get_projection(self, dim):
+        if self.projection is None and self.k is not None:
+            rng = np.random.default_rng(self.seed)
+            self.projection = (
+                rng.standard_normal((dim, self.k)) / np.sqrt(self.k)
+            ).astype(np.float32)
+        return self.projection
+
+    def _prefix_sums(self, doc):
+        # Prefix sums of the last document are cached per thread.
+        local = self._local
+        if getattr(local, 'doc', None) is not doc:
+            vectors = get_token_vectors(doc)
+            sums = np.zeros((len(vectors) + 1, vectors.shape[1]), dtype=np.float64)
+            np.cumsum(vectors, axis=0, out=sums[1:])
+            local.doc, local.sums = doc, sums
+        return local.sums
+
+    def span_vector(self, span):
+        """Get vector and vector norm of a span.
+
+        Vectors are averages of token vectors computed from prefix sums
+        (see :py:attr:`spacy.tokens.Span.vector`). They are projected
+        and cast only by :py:meth:`transform`.
+        """
+        doc = span.doc
+        if 'vector' in doc.user_span_hooks:
+            return span.vector, span.vector_norm
+        sums = self._prefix_sums(doc)
+        if len(span):
+            vector = (sums[span.end] - sums[span.start]) / len(span)
+        else:
+            vector = np.zeros(sums.shape[1], dtype=np.float64)
+        vector = vector.astype(np.float32)
+        return vector, float(np.sqrt((vector*vector).sum()))
+
+    def transform(self, vectors):
+        """Project and cast vectors.
+
+        Parameters
+        ----------
+        vectors : array_like
+            ``(n, d)`` matrix of vectors.
+
+        Returns
+        -------
+        numpy.ndarray
+            ``(n, k)`` matrix of vectors with :py:attr:`dtype`.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.k is not None and vectors.shape[1]:
+            projection = self._get_projection(vectors.shape[1])
+            if self.mean is not None:
+                vectors = vectors - self.mean
+            vectors = vectors @ projection
+        return vectors.astype(self.dtype, copy=False)
@@ -50,6 +50,14 @@ setup(
         'pandas>=0.23.4',
         'nltk>=3.4'
     ],
+    extras_require={
+        'arrow': ['pyarrow'],
+        'polars': ['pyarrow', 'polars'],
+        'sparse': ['scipy']
+    },
+    entry_points={
+        'console_scripts': ['narcy=narcy.cli:main']
+    },
     license='MIT',
     zip_safe=False,
     keywords='narcy',
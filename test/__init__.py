@@ -1,5 +1,6 @@
 """Main module for tests."""
 import os
+import numpy as np
 import pandas as pd
 import en_core_web_sm
 from narcy.nlp.utils import Relation, document_factory
@@ -39,3 +40,21 @@ def _test_doc_to_tokens_df(doc):
     df = doc_to_tokens_df(doc)
     assert isinstance(df, pd.DataFrame)
     assert df.shape != (0, 0)
+
+#: Data frame functions (with keyword arguments) of all outputs.
+_doc_to_df_funcs = [
+    (doc_to_relations_df, { 'reduced': True }),
+    (doc_to_relations_df, { 'reduced': False }),
+    (doc_to_svos_df, {}),
+    (doc_to_tokens_df, {})
+]
+
+def _assert_equal_frames(x, y):
+    assert list(x.columns) == list(y.columns)
+    assert list(x.index) == list(y.index)
+    for column in x.columns:
+        for a, b in zip(x[column], y[column]):
+            if isinstance(a, np.ndarray):
+                assert np.array_equal(a, b)
+            else:
+                assert a == b
@@ -0,0 +1,44 @@
+"""Benchmarks of corpus processing in process and thread pools.
+
+Run with ``pytest test/benchmarks --benchmarks``. Times include starting
+workers, so they also cover loading a model in every worker process.
+Throughput is ``extra_info['n_docs']`` divided by the mean time.
+"""
+import os
+import pytest
+from narcy.corpus import read_corpus
+from narcy.jobs import process_corpus
+
+_dirpath = os.path.join(os.path.split(__file__)[0], '..', 'data')
+
+N_COPIES = 10
+
+
+def _items():
+    items = list(read_corpus(_dirpath, fmt='dir'))
+    return [
+        (f'{docid}-{i}', text, metadata)
+        for i in range(N_COPIES)
+        for docid, text, metadata in items
+    ]
+
+@pytest.mark.benchmark(group='executors')
+@pytest.mark.parametrize('n_workers', [2, 4])
+@pytest.mark.parametrize('executor', ['process', 'thread'])
+def test_benchmark_executors(benchmark, tmp_path, executor, n_workers):
+    items = _items()
+
+    def run():
+        return process_corpus(
+            items, 'en_core_web_sm', str(tmp_path),
+            outputs=('reduced', 'svos'),
+            n_workers=n_workers,
+            partition_size=10,
+            fmt='pickle',
+            resume=False,
+            executor=executor
+        )
+
+    manifest = benchmark.pedantic(run, rounds=3, iterations=1)
+    benchmark.extra_info['n_docs'] = len(items)
+    assert len(manifest.done) == len(items)
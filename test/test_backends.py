@@ -0,0 +1,39 @@
+"""Unit tests for output backends."""
+import pytest
+import numpy as np
+from narcy.processors import OUTPUTS, docs_to_df
+
+pa = pytest.importorskip('pyarrow')
+
+
+text = "I recon he's very angry on you. This is not a spider's web."
+
+@pytest.mark.parametrize('output', list(OUTPUTS))
+@pytest.mark.parametrize('int_ids', [False, True])
+def test_arrow_backend(output, int_ids, make_doc):
+    doc = make_doc(text)
+    df = OUTPUTS[output](doc, int_ids=int_ids)
+    table = OUTPUTS[output](doc, int_ids=int_ids, backend='arrow')
+    assert table.column_names == list(df.columns)
+    assert table.num_rows == len(df)
+    for column in df.columns:
+        expected = [ np.asarray(v).tolist() for v in df[column] ]
+        values = [ np.asarray(v).tolist() for v in table[column].to_pylist() ]
+        if column.endswith('vector') or column.endswith('vector_norm'):
+            expected = pytest.approx(np.array(expected, dtype=float))
+            values = np.array(values, dtype=float)
+        assert values == expected
+    if not int_ids:
+        assert pa.types.is_dictionary(table.schema.field('docid').type)
+
+def test_polars_backend(make_doc):
+    pl = pytest.importorskip('polars')
+    docs = [ make_doc(text), make_doc(text, docid='other') ]
+    df = docs_to_df(docs, 'tokens', backend='polars')
+    assert isinstance(df, pl.DataFrame)
+    assert df.shape == docs_to_df(docs, 'tokens').shape
+    assert df.schema['pos'] == pl.Categorical
+
+def test_unknown_backend(make_doc):
+    with pytest.raises(ValueError):
+        OUTPUTS['tokens'](make_doc(text), backend='unknown')
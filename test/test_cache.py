@@ -0,0 +1,26 @@
+"""Unit tests for sentence-level extraction cache."""
+import pytest
+from narcy.cache import SentenceCache
+from narcy.processors import doc_to_tokens_df
+from . import _doc_to_df_funcs, _assert_equal_frames
+
+
+text = "I recon he's very angry on you. This is not a spider's web."
+
+@pytest.mark.parametrize('func,kwds', _doc_to_df_funcs)
+def test_sentence_cache(func, kwds, make_doc):
+    cache = SentenceCache(model='test')
+    doc = make_doc(text)
+    other = make_doc(text, docid='other')
+    _assert_equal_frames(func(doc, **kwds), func(doc, cache=cache, **kwds))
+    assert cache.hits == 0
+    df = func(other, cache=cache, **kwds)
+    _assert_equal_frames(func(other, **kwds), df)
+    assert cache.hits == 2
+    assert (df['docid'] == 'other').all()
+
+def test_sentence_cache_maxsize(make_doc):
+    cache = SentenceCache(model='test', maxsize=1)
+    doc = make_doc(text)
+    doc_to_tokens_df(doc, cache=cache)
+    assert len(cache) == 1
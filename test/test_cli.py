@@ -0,0 +1,74 @@
+"""Unit tests for command line interface."""
+import sys
+import json
+import os
+import subprocess
+import pytest
+from narcy.cli import main
+from narcy.jobs import Manifest, read_frame, in_shard, check_shards
+
+
+texts = [
+    "I recon he's very angry on you. This is not a spider's web.",
+    "This is a great new development.",
+    "You're a fucking douchebag"
+]
+
+def test_process(tmp_path):
+    corpus = tmp_path / 'corpus.jsonl'
+    corpus.write_text('\n'.join(
+        json.dumps({ 'id': f'doc-{i}', 'text': t }) for i, t in enumerate(texts)
+    ))
+    output_dir = tmp_path / 'output'
+    assert main([
+        'process', str(corpus), str(output_dir), '-o', 'reduced', 'tokens',
+        '-w', '2', '-p', '2', '-f', 'pickle', '-q'
+    ]) == 0
+    for output in ('reduced', 'tokens'):
+        parts = sorted(os.listdir(output_dir / output))
+        assert parts == [ 'part-00000.pickle', 'part-00001.pickle' ]
+        docids = set()
+        for part in parts:
+            docids.update(read_frame(str(output_dir / output / part))['docid'])
+        assert docids == { 'doc-0', 'doc-1', 'doc-2' }
+
+def test_shards(tmp_path):
+    corpus = tmp_path / 'corpus.jsonl'
+    corpus.write_text('\n'.join(json.dumps({ 'text': t }) for t in texts))
+    output_dir = tmp_path / 'output'
+    shards = [
+        subprocess.Popen([
+            sys.executable, '-m', 'narcy.cli', 'process', str(corpus),
+            str(output_dir), '-f', 'pickle', '-q', '--shard', f'{i}/2'
+        ]) for i in range(2)
+    ]
+    assert all(p.wait() == 0 for p in shards)
+    merged_dir = tmp_path / 'merged'
+    assert main([ 'merge', str(output_dir), str(merged_dir), '--single-file' ]) == 0
+    df = read_frame(str(merged_dir / 'reduced.pickle'))
+    assert df['docid'].nunique() == len(texts)
+    for i in range(2):
+        manifest = Manifest(str(output_dir / f'shard-{i:05d}-of-00002' / 'manifest.jsonl'))
+        assert all(in_shard(docid, i, 2) for docid in manifest.done)
+
+def test_process_unknown_rtypes(tmp_path):
+    with pytest.raises(SystemExit):
+        main([
+            'process', str(tmp_path / 'corpus.jsonl'), str(tmp_path / 'output'),
+            '--rtypes', 'subject-verb', 'subject-object'
+        ])
+    assert not (tmp_path / 'output').exists()
+
+def test_merge_missing_shards(tmp_path):
+    output_dir = tmp_path / 'output'
+    for name in ('shard-00000-of-00003', 'shard-00002-of-00003'):
+        (output_dir / name).mkdir(parents=True)
+    merged_dir = str(tmp_path / 'merged')
+    with pytest.raises(ValueError, match='missing'):
+        main([ 'merge', str(output_dir), merged_dir ])
+    assert main([ 'merge', str(output_dir), merged_dir, '--partial' ]) == 0
+    assert check_shards(sorted(map(str, output_dir.iterdir()))) == [ 1 ]
+    with pytest.raises(ValueError, match='disagree'):
+        check_shards([ 'shard-00000-of-00002', 'shard-00001-of-00003' ])
+    with pytest.raises(ValueError, match='more than once'):
+        check_shards([ 'a/shard-00000-of-00002', 'b/shard-00000-of-00002' ])
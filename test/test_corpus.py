@@ -0,0 +1,100 @@
+"""Unit tests for corpus readers."""
+import json
+import pytest
+from narcy.corpus import read_corpus, prefetch, pipe_corpus
+
+
+texts = [ "This is a great new development.", "You're a fucking douchebag" ]
+
+def test_read_directory(tmp_path):
+    for i, text in enumerate(texts):
+        (tmp_path / f'{i}.txt').write_text(text)
+    items = list(read_corpus(str(tmp_path)))
+    assert items == [ ('0.txt', texts[0], {}), ('1.txt', texts[1], {}) ]
+
+def test_read_jsonl(tmp_path):
+    path = tmp_path / 'corpus.jsonl'
+    path.write_text('\n'.join(
+        json.dumps({ 'id': i, 'text': t, 'source': 'test' })
+        for i, t in enumerate(texts)
+    ))
+    items = list(read_corpus(str(path)))
+    assert items == [ ('0', texts[0], { 'source': 'test' }),
+                      ('1', texts[1], { 'source': 'test' }) ]
+
+def test_read_csv(tmp_path):
+    path = tmp_path / 'corpus.csv'
+    path.write_text('text,source\n' + '\n'.join(f'"{t}",test' for t in texts))
+    items = list(read_corpus(str(path)))
+    assert items == [ (None, t, { 'source': 'test' }) for t in texts ]
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        read_corpus(str(tmp_path / 'corpus.xml'))
+
+@pytest.mark.parametrize('delimiter,expected', [
+    ('\n\n', [ texts[0], texts[1] + '\nSecond line.' ]),
+    ('\n', [ texts[0], texts[1], 'Second line.' ])
+])
+def test_read_text(tmp_path, delimiter, expected):
+    path = tmp_path / 'corpus.txt'
+    path.write_text(f'{texts[0]}\n\n\n\n{texts[1]}\nSecond line.\n')
+    items = list(read_corpus(str(path), delimiter=delimiter))
+    assert [ text for _, text, _ in items ] == expected
+    for docid, text, metadata in items:
+        assert docid is None
+        data = path.read_bytes()[metadata['offset']:]
+        assert data.decode().startswith(text)
+
+def test_read_text_crlf(tmp_path):
+    path = tmp_path / 'corpus.txt'
+    path.write_bytes(b'one\r\n\r\ntwo\r\nlines\r\n\r\n\r\nthree')
+    items = list(read_corpus(str(path)))
+    assert [ text for _, text, _ in items ] == [ 'one', 'two\r\nlines', 'three' ]
+    assert [ m['offset'] for _, _, m in items ] == [ 0, 7, 21 ]
+
+@pytest.mark.parametrize('kwds', [
+    { 'delimiter': '' },
+    { 'encoding': 'utf-16' }
+])
+def test_read_text_errors(tmp_path, kwds):
+    path = tmp_path / 'corpus.txt'
+    path.write_text('one\n\ntwo')
+    with pytest.raises(ValueError):
+        read_corpus(str(path), **kwds)
+
+def test_read_jsonl_utf16(tmp_path):
+    path = tmp_path / 'corpus.jsonl'
+    path.write_text('\n'.join(json.dumps({ 'text': t }) for t in texts),
+                    encoding='utf-16')
+    items = list(read_corpus(str(path), encoding='utf-16'))
+    assert [ text for _, text, _ in items ] == texts
+
+def test_read_empty(tmp_path):
+    path = tmp_path / 'corpus.jsonl'
+    path.write_text('')
+    assert list(read_corpus(str(path))) == []
+
+def test_prefetch():
+    assert list(prefetch(range(100), size=10)) == list(range(100))
+    def items():
+        yield 1
+        raise KeyError
+    with pytest.raises(KeyError):
+        list(prefetch(items()))
+    stream = prefetch(range(100), size=1)
+    assert next(stream) == 0
+    stream.close()
+
+def test_pipe_corpus(tmp_path):
+    spacy = pytest.importorskip('spacy')
+    path = tmp_path / 'corpus.jsonl'
+    path.write_text('\n'.join(
+        json.dumps({ 'id': i, 'text': t, 'source': 'test' })
+        for i, t in enumerate(texts)
+    ))
+    items = read_corpus(str(path))
+    results = list(pipe_corpus(spacy.blank('en'), items, batch_size=1))
+    assert [ doc.text for doc, _ in results ] == texts
+    assert [ doc._.id for doc, _ in results ] == [ '0', '1' ]
+    assert [ metadata for _, metadata in results ] == [ { 'source': 'test' } ] * 2
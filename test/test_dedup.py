@@ -0,0 +1,35 @@
+"""Unit tests for near-duplicate detection."""
+import pytest
+from narcy.dedup import NearDuplicateDetector, deduplicate
+
+
+text = (
+    "Shares of the company rose sharply on Monday after it reported "
+    "quarterly earnings that beat analyst expectations by a wide margin, "
+    "while revenue grew for the third consecutive quarter."
+)
+items = [
+    ('a', text),
+    ('b', "Completely unrelated text about the weather in the mountains today."),
+    ('c', text + " (Reuters)"),
+    ('d', text)
+]
+
+def test_deduplicate():
+    result = list(deduplicate(items))
+    assert [ x[0] for x in result ] == ['a', 'b']
+
+def test_deduplicate_link():
+    result = list(deduplicate(items, link=True))
+    assert [ x[-1] for x in result ] == [None, None, 'a', 'a']
+
+def test_detector_maxsize():
+    detector = NearDuplicateDetector(maxsize=1)
+    assert detector.check('a', text) is None
+    assert detector.check('b', items[1][1]) is None
+    assert len(detector) == 1
+    assert detector.check('c', text) is None
+
+def test_detector_bands():
+    with pytest.raises(ValueError):
+        NearDuplicateDetector(num_perm=100, bands=32)
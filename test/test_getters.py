@@ -3,7 +3,9 @@
 import pytest
 from pytest import approx
 import en_core_web_sm
+from spacy.tokens import Doc
 from narcy import doc_to_relations_df, doc_to_svos_df
+from narcy.nlp.utils import get_subtrees, get_entity_from_span, pipe_factory
 
 
 data = [
@@ -19,3 +21,58 @@ def test_lemma(text, nrow, sentiment, make_doc):
     df = doc_to_relations_df(doc)
     assert df.shape[0] == nrow
     assert doc._.sentiment == approx(sentiment)
+
+def test_doc_id(make_doc):
+    doc = make_doc("This is a great new development.")
+    assert doc._._id is not None
+    assert doc._.id == doc._._id
+    assert len(doc._.id) == 32
+    doc = make_doc("This is a great new development.", docid='doc-1')
+    assert doc._.id == 'doc-1'
+    df = doc_to_relations_df(doc)
+    assert (df['docid'] == 'doc-1').all()
+    assert df['sentid'].str.startswith('doc-1__').all()
+
+def test_pipe_ids():
+    make_docs = pipe_factory(en_core_web_sm.load())
+    texts = [ t for t, _, _ in data ]
+    docs = list(make_docs(texts, ids=[ 'a', 'b', 'c', 'd' ]))
+    assert [ d._.id for d in docs ] == [ 'a', 'b', 'c', 'd' ]
+    with pytest.raises(ValueError):
+        list(make_docs(texts, ids=[ 'a', 'b' ]))
+    with pytest.raises(ValueError):
+        list(make_docs(texts[:2], ids=iter([ 'a', 'b', 'c' ])))
+
+def test_polarity_memo(make_doc):
+    doc = make_doc("This is a great new development.")
+    sent = next(doc.sents)
+    assert doc._.polarity == doc._._polarity
+    assert sent._.polarity == sent._._polarity
+
+@pytest.mark.parametrize('text,nrow,sentiment', data)
+def test_subterms(text, nrow, sentiment, make_doc):   # pylint: disable=unused-argument
+    doc = make_doc(text)
+    for token in doc:
+        expected = [
+            st._.compound for st in token.subtree
+            if st._.is_term and st not in token._.compound
+        ]
+        assert list(token._.subterms) == expected
+
+def test_subtrees():
+    nlp = en_core_web_sm.load()
+    doc = Doc(nlp.vocab, words=list('abcde'), heads=[2, 3, 3, 3, 3],
+              deps=['dep', 'dep', 'dep', 'ROOT', 'dep'])
+    subtrees = get_subtrees(doc)
+    assert subtrees['left'].tolist() == [0, 1, 0, 0, 4]
+    assert subtrees['contiguous'].tolist() == [True, True, False, False, True]
+
+def test_entity_index(make_doc):
+    doc = make_doc("Apple Inc. shares rose 5% in New York on Monday.")
+    for ent in doc.ents:
+        for token in ent:
+            compound = token._.compound
+            assert (compound.start, compound.end) == (ent.start, ent.end)
+            assert compound.label_ == ent.label_
+            assert compound._.is_ent
+    assert get_entity_from_span(doc[:3]) == doc.ents[0]
@@ -0,0 +1,75 @@
+"""Unit tests for inverted relation index."""
+import pandas as pd
+import pytest
+from narcy.index import RelationIndex
+from narcy.processors import doc_to_relations_df
+
+
+texts = [
+    "Apple will buy a new company. Google is not a spider's web.",
+    "This is a great new development in Apple.",
+    "You're a fucking douchebag"
+]
+
+@pytest.fixture
+def frames(make_doc):
+    return [ doc_to_relations_df(make_doc(t)) for t in texts ]
+
+def _expected(df, column, value, role=None, tense=None):
+    rows = []
+    for prefix in ('head', 'sub') if role is None else (role,):
+        mask = df[prefix+'_'+column] == value
+        if tense is not None:
+            mask &= df[prefix+'_tense'] == tense
+        rows.extend(df.index[mask].tolist())
+    return sorted(rows)
+
+@pytest.mark.parametrize('max_buffer', [0, 1000000])
+@pytest.mark.parametrize('role', [None, 'head', 'sub'])
+def test_lookup(frames, max_buffer, role):
+    index = RelationIndex(max_buffer=max_buffer)
+    for df in frames:
+        index.add(df)
+    df = pd.concat(frames, ignore_index=True)
+    assert index.n_rows == len(df)
+    for lemma in set(df['head_lemma']) | set(df['sub_lemma']):
+        result = index.lookup(lemma=lemma, role=role)
+        assert result['row'].tolist() == _expected(df, 'lemma', lemma, role)
+        assert (result['docid'] == df['docid'][result['row']].values).all()
+        for tense in set(result['tense']):
+            result = index.lookup(lemma=lemma, role=role, tense=tense)
+            assert result['row'].tolist() == \
+                _expected(df, 'lemma', lemma, role, tense)
+    labels = set(df['head_ent_label'].dropna()) | set(df['sub_ent_label'].dropna())
+    for label in labels - { '' }:
+        result = index.lookup(ent_label=label, role=role)
+        assert result['row'].tolist() == _expected(df, 'ent_label', label, role)
+    assert index.lookup(lemma='__missing__').empty
+    assert index.lookup(ent_label='').empty
+
+def test_save_load(frames, tmp_path):
+    index = RelationIndex()
+    for df in frames:
+        index.add(df)
+    path = str(tmp_path/'relations.npz')
+    index.save(path)
+    loaded = RelationIndex.load(path)
+    assert loaded.n_rows == index.n_rows
+    for lemma in set(frames[0]['head_lemma']):
+        assert loaded.lookup(lemma=lemma).equals(index.lookup(lemma=lemma))
+    loaded.add(frames[0])
+    assert loaded.n_rows == index.n_rows + len(frames[0])
+
+def test_merge(frames):
+    index = RelationIndex()
+    for df in frames:
+        index.add(df)
+    left, right = RelationIndex(), RelationIndex()
+    left.add(frames[0])
+    for df in frames[1:]:
+        right.add(df)
+    merged = left.merge(right)
+    assert merged.n_rows == index.n_rows
+    df = pd.concat(frames, ignore_index=True)
+    for lemma in set(df['head_lemma']) | set(df['sub_lemma']):
+        assert merged.lookup(lemma=lemma).equals(index.lookup(lemma=lemma))
@@ -0,0 +1,94 @@
+"""Unit tests for corpus processing jobs."""
+import os
+import en_core_web_sm
+from spacy.language import Language
+from narcy.jobs import Manifest, Partition, process_corpus, read_frame
+from narcy.jobs import partition_path
+
+
+texts = [
+    "I recon he's very angry on you. This is not a spider's web.",
+    "This is a great new development.",
+    "You're a fucking douchebag",
+    "CRASH",
+    "This is not a spider's web."
+]
+items = [ (None if i % 2 else f'doc-{i}', t, {}) for i, t in enumerate(texts) ]
+
+@Language.component('crash')
+def crash(doc):
+    if doc.text == 'CRASH':
+        os._exit(1)     # pylint: disable=protected-access
+    return doc
+
+def load_model():
+    nlp = en_core_web_sm.load()
+    nlp.add_pipe('crash', first=True)
+    return nlp
+
+def test_process_corpus(tmp_path):
+    kwds = dict(outputs=('reduced',), n_workers=2, partition_size=2,
+                fmt='pickle', max_failures=2)
+    manifest = process_corpus(items, load_model, str(tmp_path), **kwds)
+    assert len(manifest.done) == 4
+    assert len(manifest.quarantined) == 1
+    assert manifest.failures[next(iter(manifest.quarantined))] == 2
+    manifest = Manifest(str(tmp_path / 'manifest.jsonl'))
+    partitions = dict(manifest.partitions)
+    # Restarted job skips finished and quarantined documents.
+    manifest = process_corpus(items, load_model, str(tmp_path), **kwds)
+    assert manifest.partitions == partitions
+    files = os.listdir(tmp_path / 'reduced')
+    assert len(files) == len(partitions)
+
+def load_short_model():
+    nlp = en_core_web_sm.load()
+    nlp.max_length = 200
+    return nlp
+
+def test_process_corpus_errors(tmp_path):
+    ok = [ item for item in items if item[1] != 'CRASH' ]
+    corpus = ok[:2] + [ ('long', "This is a long text. " * 25, {}) ] + ok[2:]
+    kwds = dict(outputs=('reduced',), n_workers=1, partition_size=2,
+                fmt='pickle', max_failures=2)
+    manifest = process_corpus(corpus, load_short_model, str(tmp_path), **kwds)
+    assert len(manifest.done) == len(ok)
+    assert set(manifest.quarantined) == { 'long' }
+    assert manifest.failures['long'] == 2
+    # Restarted job skips the quarantined document.
+    manifest = process_corpus(corpus, load_short_model, str(tmp_path), **kwds)
+    assert manifest.failures['long'] == 2
+
+def test_process_corpus_threads(tmp_path):
+    kwds = dict(outputs=('reduced', 'tokens'), partition_size=1, fmt='pickle')
+    ok = [ item for item in items if item[1] != 'CRASH' ]
+    process_corpus(ok, 'en_core_web_sm', str(tmp_path / 'p'), **kwds)
+    manifest = process_corpus(ok, 'en_core_web_sm', str(tmp_path / 't'),
+                              n_workers=3, executor='thread', **kwds)
+    assert len(manifest.done) == len(ok)
+    for output in kwds['outputs']:
+        for part in os.listdir(tmp_path / 'p' / output):
+            expected = read_frame(str(tmp_path / 'p' / output / part))
+            df = read_frame(str(tmp_path / 't' / output / part))
+            assert df.equals(expected)
+
+def test_manifest_remove_orphans(tmp_path):
+    output_dir = str(tmp_path)
+    manifest = Manifest(os.path.join(output_dir, 'manifest.jsonl'))
+    manifest.add_partition(Partition(0, ['doc-0'], [], {
+        'reduced': os.path.join('reduced', 'part-00000.pickle')
+    }))
+    kept = [
+        partition_path(output_dir, 'reduced', 0, 'pickle'),
+        partition_path(output_dir, 'reduced', 1, 'csv'),
+        partition_path(output_dir, 'tokens', 1, 'pickle'),
+        os.path.join(output_dir, 'reduced', 'part-notes.pickle'),
+        os.path.join(output_dir, 'other', 'part-00001.pickle')
+    ]
+    orphan = partition_path(output_dir, 'reduced', 1, 'pickle')
+    for path in kept + [ orphan ]:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+    manifest.remove_orphans(output_dir, outputs=('reduced',), fmt='pickle')
+    assert all(os.path.exists(path) for path in kept)
+    assert not os.path.exists(orphan)
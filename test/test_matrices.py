@@ -0,0 +1,68 @@
+"""Unit tests for sparse relation matrices."""
+import pickle
+import pytest
+from narcy.processors import doc_to_relations_df
+
+pytest.importorskip('scipy')
+from narcy.matrices import RelationCounter, Vocabulary    # pylint: disable=C0413
+
+
+texts = [
+    "I recon he's very angry on you. This is not a spider's web.",
+    "This is a great new development.",
+    "You're a fucking douchebag"
+]
+
+@pytest.mark.parametrize('rtypes', [None, ('subject-verb', 'verb-object')])
+def test_cooccurrence_matrix(rtypes, make_doc):
+    docs = [ make_doc(t) for t in texts ]
+    counter = RelationCounter(rtypes=rtypes)
+    for doc in docs:
+        counter.update(doc)
+    X = counter.cooccurrence_matrix()
+    assert X.shape == (len(counter.vocab),) * 2
+    expected = 0
+    for doc in docs:
+        df = doc_to_relations_df(doc)
+        if rtypes:
+            df = df[df['rtype'].isin(rtypes)]
+        expected += len(df)
+        for head, sub in zip(df['head_lemma'], df['sub_lemma']):
+            assert X[counter.vocab[head], counter.vocab[sub]] > 0
+    assert X.sum() == expected
+    D = counter.doc_term_matrix()
+    assert D.shape == (len(docs), len(counter.vocab))
+    assert D.sum() == 2 * expected
+
+def test_merge(make_doc):
+    docs = [ make_doc(t) for t in texts ]
+    counter = RelationCounter()
+    for doc in docs:
+        counter.update(doc)
+    left, right = RelationCounter(), RelationCounter()
+    left.update(docs[0])
+    for doc in docs[1:]:
+        right.update(doc)
+    merged = left.merge(pickle.loads(pickle.dumps(right)))
+    assert merged.docids == counter.docids
+    idx = [ merged.vocab[l] for l in counter.vocab.lemmas ]
+    X = merged.cooccurrence_matrix()[idx][:, idx]
+    assert (X != counter.cooccurrence_matrix()).nnz == 0
+    D = merged.doc_term_matrix()[:, idx]
+    assert (D != counter.doc_term_matrix()).nnz == 0
+
+def test_coords(make_doc):
+    counter = RelationCounter()
+    counter.update(make_doc(texts[0]))
+    heads, subs, docs = counter.coords()
+    n_rows = len(counter)
+    counter.update(make_doc(texts[1]))
+    counter.merge(counter)
+    assert len(heads) == len(subs) == len(docs) == n_rows
+    assert len(counter) > 2 * n_rows
+
+def test_vocabulary():
+    vocab = Vocabulary(['a', 'b'])
+    other = Vocabulary(['b', 'c'])
+    assert vocab.merge(other).tolist() == [1, 2]
+    assert vocab.lemmas == ['a', 'b', 'c']
@@ -0,0 +1,85 @@
+"""Unit tests for *Narcy* pipeline component."""
+import pickle
+import pytest
+import spacy
+from spacy.tokens import Doc, DocBin
+from narcy.filters import Filters
+from narcy.pipeline import NarcyComponent, prune_pipeline
+from narcy.processors import doc_to_relations_df
+from . import _doc_to_df_funcs, _assert_equal_frames
+
+
+text = "I recon he's very angry on you. This is not a spider's web."
+
+@pytest.mark.parametrize('func,kwds', _doc_to_df_funcs)
+def test_narcy_component(func, kwds, make_doc):
+    expected = func(make_doc(text), **kwds)
+    doc = NarcyComponent()(make_doc(text))
+    doc = Doc(doc.vocab).from_bytes(doc.to_bytes())
+    _assert_equal_frames(expected, func(doc, **kwds))
+
+def _pickle(doc):
+    return pickle.loads(pickle.dumps(doc))
+
+def _docbin(doc):
+    docbin = DocBin(store_user_data=True)
+    docbin.add(doc)
+    return next(DocBin().from_bytes(docbin.to_bytes()).get_docs(doc.vocab))
+
+@pytest.mark.parametrize('roundtrip', [_pickle, _docbin])
+def test_narcy_component_roundtrip(roundtrip, make_doc):
+    expected = doc_to_relations_df(make_doc(text))
+    doc = roundtrip(NarcyComponent()(make_doc(text)))
+    for name in ('compounds', 'relations', 'tense', 'polarity', 'drive', 'lead',
+                 'tensor'):
+        assert ('narcy', name) in doc.user_data
+    df = doc_to_relations_df(doc)
+    assert (df['head_vector_norm'] > 0).all()
+    _assert_equal_frames(expected, df)
+
+def test_narcy_component_no_relations(make_doc):
+    doc = NarcyComponent()(make_doc("Hello!"))
+    assert not list(doc._.relations)
+    doc = Doc(doc.vocab).from_bytes(doc.to_bytes())
+    assert doc_to_relations_df(doc).empty
+
+def test_narcy_component_outputs():
+    with pytest.raises(ValueError):
+        NarcyComponent(outputs=('unknown',))
+
+
+@pytest.fixture
+def blank_nlp():
+    nlp = spacy.blank('en')
+    for name in ('tok2vec', 'tagger', 'parser', 'attribute_ruler', 'lemmatizer',
+                 'ner', 'textcat'):
+        nlp.add_pipe(name)
+    return nlp
+
+@pytest.mark.parametrize('kwds,expected', [
+    ({}, ('textcat',)),
+    ({ 'columns': { 'reduced': ['docid', 'rtype'] } },
+     ('tok2vec', 'lemmatizer', 'textcat')),
+    ({ 'columns': { 'reduced': ['docid', 'rtype'] },
+       'filters': Filters(lemmas=['be']) }, ('tok2vec', 'textcat')),
+    ({ 'columns': { 'reduced': ['docid', 'rtype'] },
+       'allow_ner_pruning': True }, ('tok2vec', 'lemmatizer', 'ner', 'textcat')),
+    ({ 'outputs': ('svos',), 'columns': { 'svos': ['subj_ent'] } },
+     ('tok2vec', 'lemmatizer', 'textcat'))
+])
+def test_prune_pipeline(blank_nlp, kwds, expected):
+    assert prune_pipeline(blank_nlp, **kwds) == expected
+
+def test_prune_pipeline_missing(blank_nlp):
+    blank_nlp.remove_pipe('ner')
+    with pytest.raises(ValueError, match='doc.ents'):
+        prune_pipeline(blank_nlp)
+    blank_nlp.remove_pipe('tok2vec')
+    with pytest.raises(ValueError, match='doc.tensor'):
+        prune_pipeline(blank_nlp, allow_ner_pruning=True, columns={
+            'reduced': ['docid', 'head_vector']
+        })
+    disable = prune_pipeline(blank_nlp, allow_ner_pruning=True, columns={
+        'reduced': ['docid', 'head_lemma']
+    })
+    assert disable == ('textcat',)
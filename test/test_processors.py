@@ -1,5 +1,9 @@
 """Unit tests for processors."""
 import pytest
+from narcy.processors import doc_to_relations_df, doc_to_svos_df
+from narcy.processors import doc_to_tokens_df, doc_to_ids_df
+from narcy.filters import Filters, get_filters
+from narcy.cache import SentenceCache
 from . import get_docs
 from . import _test_relations, _test_doc_to_relations_df
 from . import _test_doc_to_svos_df, _test_doc_to_tokens_df
@@ -25,3 +29,118 @@ def test_doc_to_svos_df(doc):
 @pytest.mark.parametrize('doc', docs)
 def test_doc_to_tokens_df(doc):
     _test_doc_to_tokens_df(doc)
+
+@pytest.mark.parametrize('doc', docs)
+def test_relations_lazy(doc):
+    for relation in doc._.relations:
+        assert relation._tense is None
+        assert (relation.tense, relation.mode) == relation._tense
+
+@pytest.mark.parametrize('doc', docs)
+def test_relations_tuples(doc):
+    for relation in doc._.relations:
+        tense, mode, rel, rtype, head, sub = relation
+        assert relation == (tense, mode, rel, rtype, head, sub)
+        assert relation._asdict()['rel'] == relation.rel
+        assert hash(relation) == hash(relation._replace(head=relation.head))
+
+@pytest.mark.parametrize('doc', docs)
+def test_subject_verbs(doc):
+    def _key(relations):
+        return [ (r.head.start, r.head.end, r.sub.start, r.sub.end)
+                 for r in relations ]
+    expected = [ r for r in doc._.relations if r.rtype == 'subject-verb' ]
+    assert _key(doc._.subject_verbs) == _key(expected)
+    for sent in doc.sents:
+        expected = [ r for r in sent._.relations if r.rtype == 'subject-verb' ]
+        assert _key(sent._.subject_verbs) == _key(expected)
+
+@pytest.mark.parametrize('doc', docs)
+def test_int_ids(doc):
+    ids = doc_to_ids_df(doc)
+    assert ids['docid'].dtype == 'int64'
+    assert (ids['docid'] == doc._.key).all()
+    for func in (doc_to_relations_df, doc_to_svos_df, doc_to_tokens_df):
+        df = func(doc)
+        df_int = func(doc, int_ids=True)
+        assert df_int['docid'].dtype == 'int64'
+        assert df_int['sentid'].dtype == 'int32'
+        merged = df_int.merge(ids, on=['docid', 'sentid'], how='left')
+        assert (merged['docid_str'].values == df['docid'].values).all()
+        assert (merged['sentid_str'].values == df['sentid'].values).all()
+
+def _drop_vectors(df):
+    return df.drop(columns=[ c for c in df.columns if c.endswith('vector') ]) \
+        .reset_index(drop=True)
+
+@pytest.mark.parametrize('doc', docs)
+@pytest.mark.parametrize('reduced', [True, False])
+@pytest.mark.parametrize('kwds,cond', [
+    ({ 'rtypes': ['subject-verb', 'verb-object'] },
+     lambda df: df['rtype'].isin(['subject-verb', 'verb-object'])),
+    ({ 'tenses': ['PAST'] }, lambda df: df['head_tense'] == 'PAST'),
+    ({ 'modes': ['MODAL'] }, lambda df: df['head_mode'] == 'MODAL'),
+    ({ 'ents': True }, lambda df: df['head_ent'] | df['sub_ent']),
+    ({ 'lemmas': ['be', 'have'] },
+     lambda df: df['head_lemma'].isin(['be', 'have'])
+        | df['sub_lemma'].isin(['be', 'have']))
+])
+def test_relations_filters(doc, reduced, kwds, cond):
+    df = doc_to_relations_df(doc, reduced=reduced)
+    expected = _drop_vectors(df[cond(df)])
+    filters = Filters(**kwds)
+    result = doc_to_relations_df(doc, reduced=reduced, filters=filters)
+    assert _drop_vectors(result).equals(expected)
+    cache = SentenceCache(model='test')
+    result = doc_to_relations_df(doc, reduced=reduced, filters=filters,
+                                 cache=cache)
+    assert _drop_vectors(result).equals(expected)
+
+@pytest.mark.parametrize('doc', docs)
+@pytest.mark.parametrize('kwds,cond', [
+    ({ 'rtypes': ['svo'] }, lambda df: df['rtype'] == 'svo'),
+    ({ 'tenses': ['PRESENT'] }, lambda df: df['tense'] == 'PRESENT'),
+    ({ 'ents': True }, lambda df: df['subj_ent'] | df['obj_ent'])
+])
+def test_svos_filters(doc, kwds, cond):
+    df = doc_to_svos_df(doc)
+    result = doc_to_svos_df(doc, filters=Filters(**kwds))
+    assert _drop_vectors(result).equals(_drop_vectors(df[cond(df)]))
+
+@pytest.mark.parametrize('doc', docs)
+@pytest.mark.parametrize('kwds,cond', [
+    ({ 'modes': ['NORMAL'] }, lambda df: df['mode'] == 'NORMAL'),
+    ({ 'ents': True, 'rtypes': ['svo'] }, lambda df: df['ent']),
+    ({ 'lemmas': ['be'] }, lambda df: df['lemma'] == 'be')
+])
+def test_tokens_filters(doc, kwds, cond):
+    df = doc_to_tokens_df(doc)
+    result = doc_to_tokens_df(doc, filters=Filters(**kwds))
+    assert _drop_vectors(result).equals(_drop_vectors(df[cond(df)]))
+
+@pytest.mark.parametrize('filters,output,expected', [
+    (None, 'reduced', None),
+    (Filters(rtypes=['subject-verb']), 'reduced', Filters(rtypes=['subject-verb'])),
+    (Filters(rtypes=['subject-verb'], ents=True), 'svos', Filters(ents=True)),
+    (Filters(rtypes=['svo']), 'tokens', Filters()),
+    ({ 'svos': Filters(rtypes=['svc']) }, 'svos', Filters(rtypes=['svc'])),
+    ({ 'svos': Filters(rtypes=['svc']) }, 'reduced', None)
+])
+def test_get_filters(filters, output, expected):
+    assert get_filters(filters, output) == expected
+
+def test_filters_unknown_rtypes():
+    with pytest.raises(ValueError, match='subject'):
+        Filters(rtypes=['subject'])
+
+@pytest.mark.parametrize('doc', docs)
+@pytest.mark.parametrize('func,columns', [
+    (doc_to_relations_df, ['rtype', 'head_lemma']),
+    (doc_to_svos_df, ['verb_lemma']),
+    (doc_to_tokens_df, ['lemma', 'docid'])
+])
+def test_columns(doc, func, columns):
+    df = func(doc, columns=columns)
+    assert list(df.columns) == columns
+    expected = func(doc)[columns].reset_index(drop=True)
+    assert df.reset_index(drop=True).equals(expected)
@@ -0,0 +1,57 @@
+"""Unit tests for profiling hooks."""
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from narcy import doc_to_relations_df, doc_to_svos_df, doc_to_tokens_df
+from narcy.profiling import Stats, profile, profiled
+
+
+@profiled
+def _recurse(n):
+    return _recurse(n - 1) if n else n
+
+@profiled
+def _generate(n):
+    yield from range(n)
+
+
+def test_profiled():
+    with profile() as stats:
+        _recurse(3)
+        assert list(_generate(3)) == [0, 1, 2]
+    _recurse(3)
+    summary = stats.summary()
+    assert summary['_recurse']['calls'] == 4
+    assert summary['_generate']['calls'] == 1
+    assert all(v['time'] >= 0 for v in summary.values())
+
+def test_profile_nested():
+    outer = Stats()
+    with profile(outer):
+        with profile() as inner:
+            _recurse(0)
+        _recurse(0)
+    assert inner.summary()['_recurse']['calls'] == 1
+    assert outer.summary()['_recurse']['calls'] == 1
+
+def test_profile_threads():
+    with profile() as stats:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(_recurse, [ 3 ] * 8))
+    assert stats.summary()['_recurse']['calls'] == 32
+    stats.reset()
+    assert stats.summary() == {}
+
+@pytest.mark.parametrize('text', [
+    "I recon he's very angry on you.",
+    "This is a great new development."
+])
+def test_profile_processors(text, make_doc):
+    doc = make_doc(text)
+    with profile() as stats:
+        doc_to_relations_df(doc)
+        doc_to_svos_df(doc)
+        doc_to_tokens_df(doc)
+    df = stats.to_df()
+    for name in ('relations_t_g', 'tense_s_g', 'relation_to_record',
+                 'reduce_relations', 'get_svos', 'get_tokens', 'dataframe'):
+        assert df.loc[name, 'calls'] > 0
@@ -0,0 +1,64 @@
+"""Unit tests for table-driven relation type classification."""
+import pytest
+from narcy.nlp import rtypes
+from narcy.nlp.utils import Relation
+from . import get_docs
+
+
+docs = get_docs()
+
+_FLAGS = [
+    (rtypes.NOUN_FLAG, 'is_noun'),
+    (rtypes.SUBJ_DEP_FLAG, 'is_subj_dep'),
+    (rtypes.VERB_FLAG, 'is_verb'),
+    (rtypes.COMP_DEP_FLAG, 'is_comp_dep'),
+    (rtypes.ADJ_VERB_FLAG, 'is_adj_verb'),
+    (rtypes.OBJ_DEP_FLAG, 'is_obj_dep'),
+    (rtypes.ADP_FLAG, 'is_adp'),
+    (rtypes.IN_COMPOUND_NOUN_FLAG, 'is_in_compound_noun'),
+    (rtypes.DESCRIPTION_FLAG, 'is_description')
+]
+
+@pytest.mark.parametrize('doc', docs)
+def test_token_masks(doc):
+    masks = rtypes.get_token_masks(doc)
+    assert len(masks) == len(doc)
+    for token, mask in zip(doc, masks):
+        for flag, attr in _FLAGS:
+            assert bool(mask & flag) == bool(token._.get(attr))
+
+def test_lookup_rtype():
+    swap, rtype, _ = rtypes.lookup_rtype(
+        rtypes.VERB_FLAG, rtypes.NOUN_FLAG | rtypes.SUBJ_DEP_FLAG
+    )
+    assert swap and rtype == 'subject-verb'
+    swap, rtype, compound_rtype = rtypes.lookup_rtype(
+        rtypes.NOUN_FLAG | rtypes.IN_COMPOUND_NOUN_FLAG, rtypes.NOUN_FLAG
+    )
+    assert not swap
+    assert rtype == 'noun-noun'
+    assert compound_rtype == 'compound'
+
+@pytest.mark.parametrize('doc', docs)
+def test_relation_rel(doc):
+    for relation in doc._.relations:
+        assert isinstance(relation, Relation)
+        head, sub = relation.rel.split('=>')
+        assert head == f"{relation.head.root.pos_}.{relation.head.root.dep_}"
+        assert sub == f"{relation.sub.root.pos_}.{relation.sub.root.dep_}"
+
+def test_relation_tuple():
+    relation = Relation('PRESENT', 'NORMAL', 'VERB.ROOT=>NOUN.dobj',
+                        'verb-object', 'buy', 'company')
+    tense, mode, rel, rtype, head, sub = relation
+    assert (tense, mode, rel, rtype, head, sub) == tuple(relation)
+    assert relation == Relation._make(relation)
+    assert relation[1:3] == ('NORMAL', 'VERB.ROOT=>NOUN.dobj')
+    assert len(relation) == len(Relation._fields) == 6
+    assert relation._asdict()['rtype'] == 'verb-object'
+    replaced = relation._replace(tense='FUTURE')
+    assert replaced.tense == 'FUTURE' and replaced[1:] == relation[1:]
+    assert replaced != relation
+    assert len({ relation, Relation(*relation) }) == 1
+    with pytest.raises(ValueError):
+        relation._replace(unknown=None)
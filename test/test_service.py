@@ -0,0 +1,69 @@
+"""Unit tests for asynchronous document processing service."""
+import asyncio
+import pytest
+import pandas as pd
+import spacy
+from narcy.service import DocumentService, Worker, check_pipeline
+
+
+texts = [
+    "I recon he's very angry on you.",
+    "This is not a spider's web.",
+    "This is a great new development."
+]
+
+def _run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+@pytest.mark.parametrize('outputs', [('reduced',), ('svos', 'tokens')])
+def test_submit(outputs):
+    async def main():
+        service = DocumentService('en_core_web_sm', outputs=outputs,
+                                  n_workers=0, batch_size=2, max_queue=2)
+        async with service:
+            return await asyncio.gather(*map(service.submit, texts))
+    results = _run(main())
+    assert len(results) == len(texts)
+    for result in results:
+        assert tuple(result) == outputs
+        assert all(isinstance(df, pd.DataFrame) for df in result.values())
+
+def test_submit_timeout():
+    async def main():
+        async with DocumentService('en_core_web_sm', n_workers=0) as service:
+            await service.submit(texts[0], timeout=0)
+    with pytest.raises(asyncio.TimeoutError):
+        _run(main())
+
+def test_submit_threads():
+    async def main():
+        service = DocumentService('en_core_web_sm', outputs=('reduced', 'svos'),
+                                  n_workers=3, batch_size=1, executor='thread')
+        async with service:
+            return await asyncio.gather(*map(service.submit, texts * 4))
+    results = _run(main())
+    for text, result in zip(texts * 4, results):
+        expected = results[texts.index(text)]
+        for name, df in result.items():
+            assert df.equals(expected[name])
+
+def test_unknown_outputs():
+    with pytest.raises(ValueError):
+        DocumentService('en_core_web_sm', outputs=('unknown',))
+    with pytest.raises(ValueError):
+        DocumentService('en_core_web_sm', executor='unknown')
+
+def test_check_pipeline_allow_ner_pruning():
+    nlp = spacy.blank('en')
+    for name in ('tok2vec', 'tagger', 'parser', 'attribute_ruler',
+                 'lemmatizer', 'ner'):
+        nlp.add_pipe(name)
+    worker = Worker(nlp)
+    columns = { 'reduced': ['docid', 'head_lemma'] }
+    assert 'ner' not in check_pipeline(('reduced',), columns, worker=worker)
+    assert 'ner' in check_pipeline(('reduced',), columns, worker=worker,
+                                   allow_ner_pruning=True)
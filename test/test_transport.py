@@ -0,0 +1,71 @@
+"""Unit tests for shared-memory transport of data frames."""
+import os
+import pytest
+import numpy as np
+import pandas as pd
+from narcy.processors import OUTPUTS
+from narcy.transport import dump_frame, load_frame
+from narcy.transport import dump_frames, load_frames, release_frames
+from . import get_docs
+
+
+docs = get_docs()
+
+def _assert_equal_values(x, y):
+    if isinstance(x, np.ndarray):
+        assert np.array_equal(x, y)
+    elif x != x:    # pylint: disable=comparison-with-itself
+        assert y != y   # pylint: disable=comparison-with-itself
+    else:
+        assert x == y
+
+@pytest.mark.parametrize('doc', docs)
+@pytest.mark.parametrize('output', sorted(OUTPUTS))
+def test_dump_load_frame(doc, output, tmpdir):
+    df = OUTPUTS[output](doc)
+    descriptor = dump_frame(df, dirpath=str(tmpdir))
+    assert os.path.exists(descriptor.path)
+    result = load_frame(descriptor)
+    assert not os.path.exists(descriptor.path)
+    assert list(result.columns) == list(df.columns)
+    assert list(result.index) == list(df.index)
+    assert list(result.dtypes) == list(df.dtypes)
+    for column in df.columns:
+        for x, y in zip(df[column], result[column]):
+            _assert_equal_values(x, y)
+
+def test_dump_load_dtypes(tmpdir):
+    df = pd.DataFrame({
+        'text': pd.Series([ 'a', None, 'b', np.nan, 'a' ], dtype=object,
+                          index=list('vwxyz')),
+        'label': pd.Categorical([ 'x', 'y', None, 'x', 'y' ],
+                                categories=[ 'y', 'x' ], ordered=True),
+        'name': [ 'a', 'b', None, 'c', 'd' ],
+        'flag': [ True, False, True, True, False ],
+        'time': pd.date_range('2020-01-01', periods=5)
+    }, index=list('vwxyz'))
+    result = load_frame(dump_frame(df, dirpath=str(tmpdir)))
+    assert result.dtypes.equals(df.dtypes)
+    assert list(result.index) == list(df.index)
+    assert result['text'].tolist()[:2] == [ 'a', None ]
+    assert np.isnan(result['text'].iloc[3])
+    assert result['label'].dtype == df['label'].dtype
+    assert result.equals(df)
+
+def test_dump_frames_cleanup(tmpdir):
+    with pytest.raises(AttributeError):
+        dump_frames({ 'a': pd.DataFrame({ 'x': [ 1 ] }), 'b': None },
+                    dirpath=str(tmpdir))
+    assert not os.listdir(str(tmpdir))
+    descriptors = dump_frames({ 'a': pd.DataFrame({ 'x': [ 1 ] }) },
+                              dirpath=str(tmpdir))
+    release_frames(descriptors)
+    assert not os.listdir(str(tmpdir))
+    descriptors = dump_frames({
+        'a': pd.DataFrame({ 'x': [ 1 ] }),
+        'b': pd.DataFrame({ 'y': [ 2 ] })
+    }, dirpath=str(tmpdir))
+    os.unlink(descriptors['a'].path)
+    with pytest.raises(FileNotFoundError):
+        load_frames(descriptors)
+    assert not os.listdir(str(tmpdir))
@@ -0,0 +1,68 @@
+"""Unit tests for vector transformations."""
+import pytest
+import numpy as np
+from narcy.processors import OUTPUTS
+from narcy.vectors import VectorTransform
+
+
+text = "I recon he's very angry on you. This is not a spider's web."
+
+_VECTORS = {
+    'relations': ('head_vector', 'sub_vector'),
+    'reduced': ('head_vector', 'sub_vector'),
+    'svos': ('subj_vector', 'verb_vector', 'obj_vector'),
+    'tokens': ('vector',)
+}
+
+
+@pytest.mark.parametrize('output', list(OUTPUTS))
+def test_prefix_sum_vectors(output, make_doc):
+    doc = make_doc(text)
+    df = OUTPUTS[output](doc)
+    vdf = OUTPUTS[output](doc, vectors=VectorTransform())
+    assert vdf.shape == df.shape
+    for column in _VECTORS[output]:
+        norm = column + '_norm'
+        assert np.allclose(np.stack(vdf[column]), np.stack(df[column]), atol=1e-5)
+        assert np.allclose(vdf[norm], df[norm], atol=1e-4)
+
+@pytest.mark.parametrize('output', list(OUTPUTS))
+@pytest.mark.parametrize('vectors,dim', [
+    (VectorTransform(dtype='float16'), None),
+    (VectorTransform.random(k=8), 8),
+    (VectorTransform.random(k=8, dtype=np.float16), 8)
+])
+def test_transformed_vectors(output, vectors, dim, make_doc):
+    doc = make_doc(text)
+    df = OUTPUTS[output](doc)
+    vdf = OUTPUTS[output](doc, vectors=vectors)
+    for column in _VECTORS[output]:
+        matrix = np.stack(vdf[column])
+        assert matrix.dtype == vectors.dtype
+        assert matrix.shape[1] == (dim or np.stack(df[column]).shape[1])
+        assert np.allclose(vdf[column+'_norm'], df[column+'_norm'], atol=1e-4)
+
+def test_random_projection():
+    vectors = np.random.default_rng(1).standard_normal((10, 32))
+    projected = VectorTransform.random(k=4, seed=7).transform(vectors)
+    assert projected.shape == (10, 4)
+    assert np.array_equal(
+        projected, VectorTransform.random(k=4, seed=7).transform(vectors)
+    )
+
+def test_pca_projection():
+    rng = np.random.default_rng(1)
+    sample = rng.standard_normal((100, 2)) @ rng.standard_normal((2, 16))
+    vectors = VectorTransform.pca(sample, k=2)
+    projected = vectors.transform(sample)
+    assert projected.shape == (100, 2)
+    # Two components capture all variance of the rank-2 sample.
+    assert np.isclose(projected.var(axis=0).sum(), sample.var(axis=0).sum())
+
+def test_arrow_float16(make_doc):
+    pa = pytest.importorskip('pyarrow')
+    doc = make_doc(text)
+    table = OUTPUTS['tokens'](
+        doc, backend='arrow', vectors=VectorTransform(dtype='float16')
+    )
+    assert table.schema.field('vector').type.value_type == pa.float16()